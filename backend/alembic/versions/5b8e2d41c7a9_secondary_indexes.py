@@ -0,0 +1,48 @@
+"""secondary indexes
+
+Revision ID: 5b8e2d41c7a9
+Revises: 0a9ad6eaf2c2
+Create Date: 2026-10-16 09:12:44.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2d41c7a9'
+down_revision: Union[str, None] = '0a9ad6eaf2c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_conversations_user_id', 'conversations', ['user_id']),
+    ('ix_messages_conversation_id', 'messages', ['conversation_id']),
+    ('ix_messages_is_read_sender_id', 'messages', ['is_read', 'sender_id']),
+    ('ix_notifications_user_id', 'notifications', ['user_id']),
+    ('ix_purchases_user_id', 'purchases', ['user_id']),
+    ('ix_purchases_mpesa_checkout_request_id', 'purchases', ['mpesa_checkout_request_id']),
+    ('ix_purchases_card_payment_id', 'purchases', ['card_payment_id']),
+    ('ix_subscriptions_user_id_is_active_end_date', 'subscriptions', ['user_id', 'is_active', 'end_date']),
+    ('ix_subscriptions_mpesa_checkout_request_id', 'subscriptions', ['mpesa_checkout_request_id']),
+    ('ix_subscriptions_card_payment_id', 'subscriptions', ['card_payment_id']),
+    ('ix_robot_requests_user_id', 'robot_requests', ['user_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Build concurrently on Postgres so the payment tables stay writable
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
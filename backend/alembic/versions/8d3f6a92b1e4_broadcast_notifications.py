@@ -0,0 +1,53 @@
+"""broadcast notifications
+
+Revision ID: 8d3f6a92b1e4
+Revises: 5b8e2d41c7a9
+Create Date: 2026-10-16 11:47:03.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f6a92b1e4'
+down_revision: Union[str, None] = '5b8e2d41c7a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('broadcast_notifications',
+    sa.Column('id', sa.String(length=50), nullable=False),
+    sa.Column('audience', sa.String(length=20), nullable=False),
+    sa.Column('title', sa.String(length=100), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_broadcast_notifications_created_at'), 'broadcast_notifications', ['created_at'], unique=False)
+    op.create_table('notification_read_states',
+    sa.Column('user_id', sa.String(length=50), nullable=False),
+    sa.Column('broadcasts_read_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('broadcast_notification_reads',
+    sa.Column('user_id', sa.String(length=50), nullable=False),
+    sa.Column('broadcast_id', sa.String(length=50), nullable=False),
+    sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['broadcast_id'], ['broadcast_notifications.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'broadcast_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('broadcast_notification_reads')
+    op.drop_table('notification_read_states')
+    op.drop_index(op.f('ix_broadcast_notifications_created_at'), table_name='broadcast_notifications')
+    op.drop_table('broadcast_notifications')
@@ -0,0 +1,32 @@
+"""robot file hash
+
+Revision ID: a6d41f9c2e58
+Revises: f3c8a51d6b27
+Create Date: 2026-10-16 20:02:51.407316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d41f9c2e58'
+down_revision: Union[str, None] = 'f3c8a51d6b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('robots', sa.Column('file_name', sa.String(), nullable=True))
+    op.add_column('robots', sa.Column('file_sha256', sa.String(length=64), nullable=True))
+    op.add_column('robots', sa.Column('file_size', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('robots', 'file_size')
+    op.drop_column('robots', 'file_sha256')
+    op.drop_column('robots', 'file_name')
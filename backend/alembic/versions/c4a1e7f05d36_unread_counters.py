@@ -0,0 +1,47 @@
+"""unread counters
+
+Revision ID: c4a1e7f05d36
+Revises: 8d3f6a92b1e4
+Create Date: 2026-10-16 14:21:37.660412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a1e7f05d36'
+down_revision: Union[str, None] = '8d3f6a92b1e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('unread_counters',
+    sa.Column('user_id', sa.String(length=50), nullable=False),
+    sa.Column('notifications', sa.Integer(), nullable=False),
+    sa.Column('messages', sa.Integer(), nullable=False),
+    sa.Column('broadcasts_seen', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    broadcast_totals = op.create_table('broadcast_totals',
+    sa.Column('audience', sa.String(length=20), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('audience')
+    )
+    # Counter rows are computed per user on first read (or by reconciliation)
+    op.execute(broadcast_totals.insert().from_select(
+        ['audience', 'total'],
+        sa.text("SELECT audience, COUNT(*) FROM broadcast_notifications GROUP BY audience")
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('broadcast_totals')
+    op.drop_table('unread_counters')
@@ -0,0 +1,90 @@
+"""stable fts keys
+
+Revision ID: d8f2b6c4e1a9
+Revises: a6d41f9c2e58
+Create Date: 2026-10-17 09:12:40.558301
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f2b6c4e1a9'
+down_revision: Union[str, None] = 'a6d41f9c2e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> searchable columns. Mirrors app/services/search.py
+SEARCH_COLUMNS = {
+    'messages': ['content'],
+    'robot_requests': [
+        'bot_name', 'robot_type', 'trading_pairs', 'market',
+        'trading_strategy', 'entry_rules', 'exit_rules', 'risk_management',
+        'notes', 'additional_parameters',
+    ],
+}
+
+
+def _drop_triggers(table: str) -> None:
+    for suffix in ('ai', 'ad', 'au'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name != 'sqlite':
+        return
+
+    # The FTS5 tables pointed at the implicit rowid of tables with TEXT primary
+    # keys, which VACUUM may renumber. Each row now gets an INTEGER key of its
+    # own in <table>_fts_keys, and the FTS table keeps its own copy of the text.
+    for table, columns in SEARCH_COLUMNS.items():
+        names = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        key_of = "(SELECT key FROM {table}_fts_keys WHERE id = {row}.id)"
+
+        _drop_triggers(table)
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        op.execute(f"CREATE TABLE {table}_fts_keys (key INTEGER PRIMARY KEY, id VARCHAR NOT NULL UNIQUE)")
+        op.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5({names}, tokenize='porter unicode61')")
+        op.execute(f"CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+                   f"INSERT INTO {table}_fts_keys(id) VALUES (new.id); "
+                   f"INSERT INTO {table}_fts(rowid, {names}) VALUES ({key_of.format(table=table, row='new')}, {new_values}); END")
+        op.execute(f"CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+                   f"DELETE FROM {table}_fts WHERE rowid = {key_of.format(table=table, row='old')}; "
+                   f"DELETE FROM {table}_fts_keys WHERE id = old.id; END")
+        op.execute(f"CREATE TRIGGER {table}_fts_au AFTER UPDATE OF {names} ON {table} BEGIN "
+                   f"DELETE FROM {table}_fts WHERE rowid = {key_of.format(table=table, row='old')}; "
+                   f"INSERT INTO {table}_fts(rowid, {names}) VALUES ({key_of.format(table=table, row='new')}, {new_values}); END")
+        op.execute(f"INSERT INTO {table}_fts_keys(id) SELECT id FROM {table}")
+        op.execute(f"INSERT INTO {table}_fts(rowid, {names}) "
+                   f"SELECT k.key, {', '.join(f't.{column}' for column in columns)} "
+                   f"FROM {table} t JOIN {table}_fts_keys k ON k.id = t.id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name != 'sqlite':
+        return
+
+    # Back to the external-content tables of full_text_search
+    for table, columns in SEARCH_COLUMNS.items():
+        names = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+
+        _drop_triggers(table)
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts_keys")
+        op.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5({names}, "
+                   f"content='{table}', content_rowid='rowid', tokenize='porter unicode61')")
+        op.execute(f"CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+                   f"INSERT INTO {table}_fts(rowid, {names}) VALUES (new.rowid, {new_values}); END")
+        op.execute(f"CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+                   f"INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', old.rowid, {old_values}); END")
+        op.execute(f"CREATE TRIGGER {table}_fts_au AFTER UPDATE OF {names} ON {table} BEGIN "
+                   f"INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', old.rowid, {old_values}); "
+                   f"INSERT INTO {table}_fts(rowid, {names}) VALUES (new.rowid, {new_values}); END")
+        op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
@@ -0,0 +1,36 @@
+"""unread counter broadcasts sent
+
+Revision ID: e5c9a3f7b2d4
+Revises: d8f2b6c4e1a9
+Create Date: 2026-10-17 11:03:52.184976
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c9a3f7b2d4'
+down_revision: Union[str, None] = 'd8f2b6c4e1a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('unread_counters', sa.Column('broadcasts_sent', sa.Integer(), server_default='0', nullable=False))
+    # Copy each user's audience total into their counter row
+    op.execute("""
+        UPDATE unread_counters SET broadcasts_sent = (
+            SELECT COALESCE(SUM(bt.total), 0) FROM broadcast_totals bt, users u
+            WHERE u.id = unread_counters.user_id
+            AND (bt.audience = 'all' OR bt.audience = CASE WHEN u.is_admin THEN 'admins' ELSE 'users' END)
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('unread_counters', 'broadcasts_sent')
@@ -0,0 +1,36 @@
+"""message history index
+
+Revision ID: e7b2c9d4a813
+Revises: c4a1e7f05d36
+Create Date: 2026-10-16 16:05:12.284731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2c9d4a813'
+down_revision: Union[str, None] = 'c4a1e7f05d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The composite index also serves lookups by conversation_id alone
+    with op.get_context().autocommit_block():
+        op.create_index('ix_messages_conversation_id_created_at_id', 'messages',
+                        ['conversation_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_messages_conversation_id', table_name='messages', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_messages_conversation_id', 'messages', ['conversation_id'],
+                        unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_messages_conversation_id_created_at_id', table_name='messages',
+                      postgresql_concurrently=True)
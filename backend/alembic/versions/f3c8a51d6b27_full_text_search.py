@@ -0,0 +1,97 @@
+"""full text search
+
+Revision ID: f3c8a51d6b27
+Revises: e7b2c9d4a813
+Create Date: 2026-10-16 18:40:03.915522
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a51d6b27'
+down_revision: Union[str, None] = 'e7b2c9d4a813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> searchable columns by weight (A ranks highest). Mirrors app/services/search.py
+SEARCH_COLUMNS = {
+    'messages': {
+        'A': ['content'],
+    },
+    'robot_requests': {
+        'A': ['bot_name', 'robot_type', 'trading_pairs', 'market'],
+        'B': ['trading_strategy', 'entry_rules', 'exit_rules', 'risk_management'],
+        'C': ['notes', 'additional_parameters'],
+    },
+}
+
+
+def _tsvector(weights: dict) -> str:
+    """Weighted tsvector expression over a table's searchable columns"""
+    parts = []
+    for weight, columns in weights.items():
+        document = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+        parts.append(f"setweight(to_tsvector('english', {document}), '{weight}')")
+    return " || ".join(parts)
+
+
+def _upgrade_postgresql() -> None:
+    # Generated columns are kept current by Postgres on every insert and update
+    for table, weights in SEARCH_COLUMNS.items():
+        op.add_column(table, sa.Column(
+            'search_vector', postgresql.TSVECTOR(),
+            sa.Computed(_tsvector(weights), persisted=True), nullable=True
+        ))
+    with op.get_context().autocommit_block():
+        for table in SEARCH_COLUMNS:
+            op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False,
+                            postgresql_using='gin', postgresql_concurrently=True)
+
+
+def _upgrade_sqlite() -> None:
+    # External-content FTS5 tables, kept current by triggers on the source table
+    for table, weights in SEARCH_COLUMNS.items():
+        columns = [column for group in weights.values() for column in group]
+        names = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        op.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5({names}, "
+                   f"content='{table}', content_rowid='rowid', tokenize='porter unicode61')")
+        op.execute(f"CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+                   f"INSERT INTO {table}_fts(rowid, {names}) VALUES (new.rowid, {new_values}); END")
+        op.execute(f"CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+                   f"INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', old.rowid, {old_values}); END")
+        op.execute(f"CREATE TRIGGER {table}_fts_au AFTER UPDATE OF {names} ON {table} BEGIN "
+                   f"INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', old.rowid, {old_values}); "
+                   f"INSERT INTO {table}_fts(rowid, {names}) VALUES (new.rowid, {new_values}); END")
+        op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        _upgrade_postgresql()
+    elif dialect == 'sqlite':
+        _upgrade_sqlite()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            for table in SEARCH_COLUMNS:
+                op.drop_index(f'ix_{table}_search_vector', table_name=table, postgresql_concurrently=True)
+        for table in SEARCH_COLUMNS:
+            op.drop_column(table, 'search_vector')
+    elif dialect == 'sqlite':
+        for table in SEARCH_COLUMNS:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
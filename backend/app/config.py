@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 # ✅ Manually load .env from the current file's directory
@@ -8,6 +9,61 @@ load_dotenv(dotenv_path)
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # Derived from DATABASE_URL when not set
+
+    # Connection pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_SLOW_WAIT_MS: float = 100.0  # Log checkouts that wait longer than this
+
+    # Password hashing pool
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 32  # Calls waiting beyond this get a 429
+
+    # Verified token -> user cache (per process)
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_SIZE: int = 10000
+
+    # Per-request SQL metrics
+    SQL_QUERY_BUDGET: int = 20  # Log requests that issue more queries than this
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # Identical statements per request flagged as N+1
+    SQL_DEBUG_HEADERS: bool = False  # Return X-DB-* headers with query count and time
+
+    # List endpoint pagination
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 200
+
+    # Background notification fan-out
+    NOTIFICATION_FANOUT_CHUNK_SIZE: int = 1000  # Rows per INSERT / transaction
+
+    # Unread counter reconciliation
+    UNREAD_RECONCILE_INTERVAL_SECONDS: int = 3600  # 0 disables the periodic job
+
+    # Socket.IO delivery across workers
+    SOCKETIO_MESSAGE_QUEUE: Optional[str] = None  # Unset: in-process; "database", postgresql:// or redis://
+    SOCKETIO_CHANNEL: str = "socketio"
+
+    # Socket.IO connection limits (per worker, 0 = unlimited)
+    SOCKETIO_MAX_CONNECTIONS: int = 10000
+    SOCKETIO_MAX_SOCKETS_PER_USER: int = 10
+
+    # Robot catalog cache (per process)
+    ROBOT_CATALOG_TTL_SECONDS: int = 300  # Backstop should a change signal between workers be lost
+    ROBOT_CATALOG_CACHE_CONTROL: str = "public, max-age=0, must-revalidate"  # Clients revalidate with If-None-Match
+
+    # Robot bundle uploads
+    ROBOT_UPLOAD_DIR: str = "uploads"
+    ROBOT_UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    ROBOT_UPLOAD_MAX_BYTES: int = 500 * 1024 * 1024
+    ROBOT_UPLOAD_SESSION_TTL_SECONDS: int = 60 * 60 * 24  # Unfinished resumable uploads are removed after this
+
+    # Robot bundle downloads
+    ROBOT_DOWNLOAD_URL_TTL_SECONDS: int = 300  # Lifetime of signed download URLs
+    ROBOT_DOWNLOAD_ACCEL_PREFIX: Optional[str] = None  # nginx internal location aliased to ROBOT_UPLOAD_DIR, e.g. /protected-uploads/
+
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24
@@ -19,6 +75,26 @@ class Settings(BaseSettings):
     M_PESA_LIPA_NA_MPESA_SHORTCODE: str
     M_PESA_LIPA_NA_MPESA_SHORTCODE_LIPA: str
     M_PESA_LIPA_NA_MPESA_PASSKEY: str = ""
+    MPESA_TOKEN_REFRESH_MARGIN_SECONDS: int = 300  # Refresh in the background once less than this remains
+    MPESA_TOKEN_DEFAULT_TTL_SECONDS: int = 3599  # When Daraja omits expires_in
+    MPESA_TOKEN_RETRY_AFTER_SECONDS: int = 30  # No new fetch this long after a failed one
+    MPESA_POLL_INTERVAL_SECONDS: float = 6.0  # Between status queries for one checkout
+    MPESA_POLL_MAX_ATTEMPTS: int = 10  # Unanswered queries before a checkout is marked failed
+    MPESA_POLL_CONCURRENCY: int = 20  # Status queries in flight at once (one worker polls)
+    MPESA_POLL_RATE_PER_SECOND: float = 10.0  # Status queries started per second (one worker polls)
+    MPESA_POLL_BATCH_SIZE: int = 200  # Due checkouts checked against the database at once
+    MPESA_SIMULATE_PAYMENTS: bool = False  # Dev only: settle checkouts Daraja never confirms at random
+
+    # Payment provider HTTP clients
+    PROVIDER_HTTP_TIMEOUT_SECONDS: float = 15.0
+    PROVIDER_HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    PROVIDER_HTTP_MAX_CONNECTIONS: int = 50
+    PROVIDER_HTTP_MAX_KEEPALIVE: int = 10
+    PROVIDER_HTTP_RETRIES: int = 2  # Extra attempts after the first
+    PROVIDER_HTTP_BACKOFF_SECONDS: float = 0.25  # Base of the jittered exponential backoff
+    PROVIDER_HTTP_BACKOFF_MAX_SECONDS: float = 4.0
+    PROVIDER_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before failing fast
+    PROVIDER_CIRCUIT_RESET_SECONDS: float = 30.0
 
     API_BASE_URL: str = "http://localhost:8000"
     ADMIN_EMAILS: list[str] = ["admin@example.com"]
@@ -1,22 +1,158 @@
-from sqlalchemy import create_engine
+import hashlib
+from contextlib import asynccontextmanager
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.pool_metrics import InstrumentedAsyncPool
 
 # Database URL from config
 DATABASE_URL = settings.DATABASE_URL
 
-# Database connection
-engine = create_engine(DATABASE_URL)
+# Async drivers for the databases we run on
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Derive the async driver URL from a sync database URL.
+
+    Args:
+        database_url: A sync SQLAlchemy URL (e.g. postgresql+psycopg2://..., sqlite:///...).
+
+    Returns:
+        The same URL using the asyncpg / aiosqlite driver.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return database_url
+
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+
+    # asyncpg takes "ssl" instead of libpq's "sslmode"
+    if backend == "postgresql" and "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+
+    return url.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(DATABASE_URL)
+
+def get_pool_options(database_url: str) -> dict:
+    """
+    Build the connection pool arguments from settings.
+
+    In-memory SQLite uses a single static connection, so it gets none.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Sync connection (alembic, scripts)
+engine = create_engine(DATABASE_URL, **get_pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async connection used by the API, instrumented for pool metrics
+async_pool_options = get_pool_options(ASYNC_DATABASE_URL)
+if async_pool_options:
+    async_pool_options["poolclass"] = InstrumentedAsyncPool
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **async_pool_options)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Base class for models
 Base = declarative_base()
 
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def dialect_insert(db: AsyncSession, model):
+    """An INSERT for the session's database that supports ON CONFLICT"""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise RuntimeError(f"ON CONFLICT is not supported on {dialect}")
+
+def insert_or_ignore(db: AsyncSession, model):
+    """INSERT ... ON CONFLICT DO NOTHING, for the session's database"""
+    return dialect_insert(db, model).on_conflict_do_nothing()
+
+class AdvisoryLock:
+    """
+    The outcome of advisory_lock: true in the process holding the lock.
+
+    A session advisory lock lasts as long as its connection, so a holder
+    that keeps the lock for a long time should check it is still held.
+    """
+
+    def __init__(self, acquired: bool, conn=None):
+        self.acquired = acquired
+        self._conn = conn
+
+    def __bool__(self) -> bool:
+        return self.acquired
+
+    async def held(self) -> bool:
+        """Probe the lock's connection; False once it has dropped, and the lock with it"""
+        if not self.acquired:
+            return False
+        if self._conn is None:
+            return True
+        try:
+            await self._conn.scalar(text("SELECT 1"))
+            await self._conn.commit()
+        except Exception:
+            self.acquired = False
+        return self.acquired
+
+@asynccontextmanager
+async def advisory_lock(name: str):
+    """
+    Try to take a lock shared by every worker for the length of the block.
+
+    Yields an AdvisoryLock, true in the one process that holds it and false
+    in the others. On Postgres this is a session advisory lock on a
+    dedicated connection; other databases only ever have one process, so it
+    is always granted.
+    """
+    if async_engine.dialect.name != "postgresql":
+        yield AdvisoryLock(True)
+        return
+
+    key = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+    async with async_engine.connect() as conn:
+        acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})
+        # The lock outlives the transaction; don't sit idle in one
+        await conn.commit()
+        lock = AdvisoryLock(bool(acquired), conn)
+        try:
+            yield lock
+        finally:
+            # A dropped connection has released the lock already
+            if lock.acquired:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                await conn.commit()
@@ -0,0 +1,113 @@
+"""
+Index advisor.
+
+Runs EXPLAIN on the query shapes the routers issue and reports the ones
+that fall back to a full table scan.
+
+    python -m app.index_advisor
+
+Exits non-zero when a sequential scan is found, so it can gate CI or a
+deploy against a migrated database.
+"""
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import func, select, text
+
+from .database import engine
+from .models.chat import Conversation, Message
+from .models.notification import Notification
+from .models.purchase import Purchase
+from .models.robot_request import RobotRequest
+from .models.subscription import Subscription
+from .models.user import User
+
+EXPLAIN_PREFIX = {
+    "postgresql": "EXPLAIN (FORMAT JSON) ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+
+def query_shapes() -> list:
+    """The filters the routers use, with placeholder values"""
+    now = datetime.utcnow()
+    return [
+        ("login by email", select(User).where(User.email == "x")),
+        ("conversations by user", select(Conversation).where(Conversation.user_id == "x")),
+        ("messages by conversation", select(Message).where(Message.conversation_id == "x")),
+        ("message history window", select(Message).where(
+            Message.conversation_id == "x", Message.created_at < now).order_by(
+            Message.created_at.desc(), Message.id.desc()).limit(50)),
+        ("unread messages", select(func.count()).select_from(Message).where(
+            Message.is_read == False, Message.sender_id != "x")),
+        ("notifications by user", select(Notification).where(Notification.user_id == "x")),
+        ("purchases by user", select(Purchase).where(Purchase.user_id == "x")),
+        ("M-Pesa callback (purchase)", select(Purchase).where(Purchase.mpesa_checkout_request_id == "x")),
+        ("card verify (purchase)", select(Purchase).where(Purchase.card_payment_id == "x")),
+        ("active subscriptions", select(Subscription).where(
+            Subscription.user_id == "x", Subscription.is_active == True, Subscription.end_date > now)),
+        ("M-Pesa callback (subscription)", select(Subscription).where(Subscription.mpesa_checkout_request_id == "x")),
+        ("card verify (subscription)", select(Subscription).where(Subscription.card_payment_id == "x")),
+        ("robot requests by user", select(RobotRequest).where(RobotRequest.user_id == "x")),
+    ]
+
+def _postgresql_seq_scans(plan: dict) -> list:
+    """Relations read with a Seq Scan anywhere in a JSON plan"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_postgresql_seq_scans(child))
+    return found
+
+def find_seq_scans(conn, statement) -> list:
+    """
+    EXPLAIN a statement and list the tables it scans in full.
+
+    Args:
+        conn: A connection from the sync engine.
+        statement: The select to explain.
+
+    Returns:
+        Names of the tables read without an index.
+    """
+    sql = statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    rows = conn.exec_driver_sql(EXPLAIN_PREFIX[conn.dialect.name] + str(sql)).all()
+    if conn.dialect.name == "postgresql":
+        plan = rows[0][0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return _postgresql_seq_scans(plan[0]["Plan"])
+
+    # SQLite: "SCAN <table>" is a full scan, "SEARCH <table> USING INDEX" is not
+    scans = []
+    for row in rows:
+        detail = row[-1]
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            scans.append(detail.split()[1])
+    return scans
+
+def main() -> int:
+    problems = 0
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # Small tables are cheaper to scan; ask the planner whether an index exists at all
+            conn.execute(text("SET enable_seqscan = off"))
+        elif conn.dialect.name not in EXPLAIN_PREFIX:
+            print(f"Unsupported database: {conn.dialect.name}")
+            return 2
+
+        for name, statement in query_shapes():
+            scans = find_seq_scans(conn, statement)
+            if scans:
+                problems += 1
+                print(f"❌ {name}: sequential scan on {', '.join(scans)}")
+            else:
+                print(f"✅ {name}")
+        conn.rollback()
+
+    print(f"\n{problems} of {len(query_shapes())} query shapes need an index")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
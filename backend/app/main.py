@@ -1,20 +1,19 @@
 
+import asyncio
 import time
 import json
 import logging
 import os
-import socketio
 
 from fastapi import FastAPI, Request
 app = FastAPI()
 from fastapi.middleware.cors import CORSMiddleware
 
-# Create Socket.IO instance before importing routers
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
-socket_app = socketio.ASGIApp(sio)
+# Socket.IO server, its rooms and event handlers
+from .realtime import sio, socket_app
 
 # Then import routers
-from .routers import auth, user, robot, robot_request, purchase, ai_trading_signals, subscription, mpesa, card_payment, chat, notification
+from .routers import auth, user, robot, robot_request, purchase, ai_trading_signals, subscription, mpesa, card_payment, chat, notification, internal, search, download
 
 origins = ["*"]
 
@@ -24,19 +23,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Before-Cursor", "X-After-Cursor", "Link", "ETag", "Content-Range", "Accept-Ranges", "Content-Disposition"],
 )
 
-# Mount Socket.IO app
-app.mount('/socket.io', socket_app)
+# Per-request SQL query counting and N+1 detection
+from .database import async_engine
+from .query_metrics import install_query_listeners, query_metrics_middleware
+install_query_listeners(async_engine.sync_engine)
+app.middleware("http")(query_metrics_middleware)
 
-# Define Socket.IO events
-@sio.event
-async def connect(sid, environ):
-    print(f"Client connected: {sid}")
+# Oversized single-request robot uploads are refused before the body is read
+from .services.robot_files import upload_size_middleware
+app.middleware("http")(upload_size_middleware)
 
-@sio.event
-async def disconnect(sid):
-    print(f"Client disconnected: {sid}")
+# Mount Socket.IO app
+app.mount('/socket.io', socket_app)
 
 # Include routers with /api prefix
 app.include_router(auth.router, prefix="/api")
@@ -50,6 +51,48 @@ app.include_router(mpesa.router, prefix="/api")
 app.include_router(card_payment.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
 app.include_router(notification.router, prefix="/api")
+app.include_router(internal.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(download.router, prefix="/api")
+
+@app.on_event("startup")
+async def prepare_robot_file_store():
+    from .services.robot_files import robot_file_store
+    robot_file_store.prepare()
+
+@app.on_event("startup")
+async def start_socketio_manager():
+    from .realtime import start_client_manager
+    start_client_manager()
+
+@app.on_event("startup")
+async def start_unread_reconciliation():
+    from .config import settings
+    from .services.unread_counters import reconcile_periodically
+    if settings.UNREAD_RECONCILE_INTERVAL_SECONDS > 0:
+        app.state.unread_reconciler = asyncio.create_task(
+            reconcile_periodically(settings.UNREAD_RECONCILE_INTERVAL_SECONDS)
+        )
+
+@app.on_event("startup")
+async def start_payment_poller():
+    from .services.payment_poller import payment_poller
+    app.state.payment_poller = asyncio.create_task(payment_poller.run())
+
+@app.on_event("shutdown")
+async def dispose_database():
+    from .database import async_engine
+    reconciler = getattr(app.state, "unread_reconciler", None)
+    if reconciler:
+        reconciler.cancel()
+    poller = getattr(app.state, "payment_poller", None)
+    if poller:
+        poller.cancel()
+    from .services.provider_client import close_provider_clients
+    await close_provider_clients()
+    from .pool_metrics import pool_metrics
+    logging.getLogger(__name__).info("DB pool metrics at shutdown: %s", pool_metrics.snapshot(async_engine.pool))
+    await async_engine.dispose()
 
 # Add a health check endpoint
 @app.get("/health")
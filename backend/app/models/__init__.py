@@ -5,4 +5,5 @@ from .robot_request import RobotRequest
 from .purchase import Purchase
 from .subscription import Subscription, SubscriptionPlan
 from .chat import Conversation, Message
-from .notification import Notification
+from .notification import Notification, BroadcastNotification, NotificationReadState, BroadcastNotificationRead
+from .unread_counter import UnreadCounter, BroadcastTotal
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, Text, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, String, Text, Boolean, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 import datetime
 import uuid
@@ -10,7 +10,7 @@ class Conversation(Base):
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, nullable=False)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     
     # Relationships
@@ -33,6 +33,13 @@ class Message(Base):
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
     sender = relationship("User", back_populates="messages")
+
+    __table_args__ = (
+        # Unread counts filter on is_read and exclude the reader's own messages
+        Index("ix_messages_is_read_sender_id", "is_read", "sender_id"),
+        # History windows are range scans over one conversation in time order
+        Index("ix_messages_conversation_id_created_at_id", "conversation_id", "created_at", "id"),
+    )
     
     def __repr__(self):
         return f"<Message(id={self.id}, conversation_id={self.conversation_id})>"
@@ -8,11 +8,36 @@ class Notification(Base):
     __tablename__ = "notifications"
 
     id = Column(String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(50), ForeignKey("users.id"))
+    user_id = Column(String(50), ForeignKey("users.id"), index=True)
     title = Column(String(100), nullable=False)
     message = Column(Text, nullable=False)
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), default=func.now())
 
     # Relationship
-    user = relationship("User", back_populates="notifications")
\ No newline at end of file
+    user = relationship("User", back_populates="notifications")
+
+class BroadcastNotification(Base):
+    """One announcement shown to a whole audience instead of a row per user"""
+    __tablename__ = "broadcast_notifications"
+
+    id = Column(String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
+    audience = Column(String(20), nullable=False, default="all")  # all, users, admins
+    title = Column(String(100), nullable=False)
+    message = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=func.now(), index=True)
+
+class NotificationReadState(Base):
+    """Per-user watermark: broadcasts created at or before it count as read"""
+    __tablename__ = "notification_read_states"
+
+    user_id = Column(String(50), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    broadcasts_read_at = Column(DateTime(timezone=True), nullable=False)
+
+class BroadcastNotificationRead(Base):
+    """A single broadcast read ahead of the user's watermark"""
+    __tablename__ = "broadcast_notification_reads"
+
+    user_id = Column(String(50), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    broadcast_id = Column(String(50), ForeignKey("broadcast_notifications.id", ondelete="CASCADE"), primary_key=True)
+    read_at = Column(DateTime(timezone=True), default=func.now())
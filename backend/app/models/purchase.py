@@ -10,7 +10,7 @@ class Purchase(Base):
     __tablename__ = "purchases"
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     robot_id = Column(String(36), nullable=False)
     amount = Column(Float, nullable=False)
     currency = Column(String(3), nullable=False)
@@ -19,8 +19,8 @@ class Purchase(Base):
     created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), nullable=True, onupdate=datetime.utcnow)
     # Additional fields for payment tracking
-    mpesa_checkout_request_id = Column(String(50), nullable=True)
-    card_payment_id = Column(String(50), nullable=True)
+    mpesa_checkout_request_id = Column(String(50), nullable=True, index=True)
+    card_payment_id = Column(String(50), nullable=True, index=True)
     
     # Relationship back to user
     user = relationship("User", back_populates="purchases")
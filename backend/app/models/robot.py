@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, Float, DateTime, ARRAY, Text
+from sqlalchemy import BigInteger, Column, String, Float, DateTime, ARRAY, Text
 from sqlalchemy.sql import func
 import uuid
 from ..database import Base
@@ -18,6 +18,9 @@ class Robot(Base):
     image_url = Column(String, nullable=True)
     imageUrl = Column(String, nullable=True)  # Added to match frontend requirement
     download_url = Column(String, nullable=True)  # Added for robot download functionality
+    file_name = Column(String, nullable=True)  # Original name of the uploaded bundle
+    file_sha256 = Column(String(64), nullable=True)  # Content address in the robot file store
+    file_size = Column(BigInteger, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -9,7 +9,7 @@ class RobotRequest(Base):
     __tablename__ = "robot_requests"
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     robot_type = Column(String, nullable=False)
     trading_pairs = Column(String, nullable=False)
     timeframe = Column(String, nullable=False)
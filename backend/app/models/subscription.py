@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, String, Float, Boolean, DateTime, ForeignKey, Text, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -20,11 +20,16 @@ class Subscription(Base):
     created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), nullable=True, onupdate=datetime.utcnow)
     is_active = Column(Boolean, nullable=False, default=False)
-    mpesa_checkout_request_id = Column(String(50), nullable=True)
-    card_payment_id = Column(String(50), nullable=True)
+    mpesa_checkout_request_id = Column(String(50), nullable=True, index=True)
+    card_payment_id = Column(String(50), nullable=True, index=True)
     
     # Relationship
     user = relationship("User", back_populates="subscriptions")
+
+    __table_args__ = (
+        # Active subscription checks filter on all three
+        Index("ix_subscriptions_user_id_is_active_end_date", "user_id", "is_active", "end_date"),
+    )
     
 class SubscriptionPlan(Base):
     __tablename__ = "subscription_plans"
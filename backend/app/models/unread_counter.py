@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from ..database import Base
+
+class UnreadCounter(Base):
+    """
+    Denormalized badge counts for one user.
+
+    Unread broadcasts are broadcasts_sent minus broadcasts_seen, so the
+    badge is a read of this row alone.
+    """
+    __tablename__ = "unread_counters"
+
+    user_id = Column(String(50), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    notifications = Column(Integer, nullable=False, default=0)  # Unread personal notifications
+    messages = Column(Integer, nullable=False, default=0)  # Unread chat messages in the user's conversations
+    broadcasts_seen = Column(Integer, nullable=False, default=0)  # Broadcasts read or from before signup
+    broadcasts_sent = Column(Integer, nullable=False, default=0)  # Broadcasts sent to the user's audiences
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class BroadcastTotal(Base):
+    """Number of broadcasts sent to an audience"""
+    __tablename__ = "broadcast_totals"
+
+    audience = Column(String(20), primary_key=True)  # all, users, admins
+    total = Column(Integer, nullable=False, default=0)
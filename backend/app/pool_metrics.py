@@ -0,0 +1,121 @@
+import bisect
+import logging
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class PoolMetrics:
+    """
+    Process-wide counters for the API connection pool.
+
+    Tracks how long requests wait for a connection, how often the pool
+    has to open overflow connections and how often a checkout times out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.overflow_events = 0
+            self.peak_checked_out = 0
+            self.wait_count = 0
+            self.wait_sum_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def _observe_wait(self, wait_ms: float):
+        self.wait_count += 1
+        self.wait_sum_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    def record_checkout(self, wait_ms: float, checked_out: int, overflowed: bool, status: str):
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self._observe_wait(wait_ms)
+            if overflowed:
+                self.overflow_events += 1
+
+        if overflowed:
+            logger.warning("DB pool opened an overflow connection. %s", status)
+        if wait_ms >= settings.DB_POOL_SLOW_WAIT_MS:
+            logger.warning("DB pool checkout waited %.1f ms. %s", wait_ms, status)
+
+    def record_timeout(self, wait_ms: float, status: str):
+        with self._lock:
+            self.timeouts += 1
+            self._observe_wait(wait_ms)
+
+        logger.error("DB pool exhausted, checkout timed out after %.1f ms. %s", wait_ms, status)
+
+    def snapshot(self, pool=None) -> dict:
+        """
+        Get the current metrics.
+
+        Args:
+            pool: The pool to read live occupancy from, if any.
+
+        Returns:
+            A JSON-serializable dict of counters and the wait histogram.
+        """
+        with self._lock:
+            labels = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + ["le_inf"]
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "overflow_events": self.overflow_events,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "sum": round(self.wait_sum_ms, 3),
+                    "max": round(self.wait_max_ms, 3),
+                    "buckets": dict(zip(labels, self.wait_buckets)),
+                },
+            }
+
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            data.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return data
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that reports checkout waits to pool_metrics"""
+
+    def connect(self):
+        overflow_before = self.overflow()
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout((time.perf_counter() - start) * 1000, self.status())
+            raise
+
+        overflow_after = self.overflow()
+        pool_metrics.record_checkout(
+            (time.perf_counter() - start) * 1000,
+            checked_out=self.checkedout(),
+            overflowed=overflow_after > 0 and overflow_after > overflow_before,
+            status=self.status(),
+        )
+        return connection
@@ -0,0 +1,99 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Collapse expanded IN lists so "IN (?, ?)" and "IN (?, ?, ?)" share a fingerprint
+_PLACEHOLDER = r"(?:\?|\$\d+|%\(\w+\)s|%s|:\w+)"
+_IN_LIST = re.compile(r"\(\s*" + _PLACEHOLDER + r"(?:\s*,\s*" + _PLACEHOLDER + r")+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so repeats of the same query compare equal"""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("(...)", statement)
+
+class QueryStats:
+    """SQL statements issued while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement: str, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> list:
+        """Statements issued at least `threshold` times, most frequent first"""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def get_query_stats() -> Optional[QueryStats]:
+    """Get the stats for the request being handled, if any"""
+    return _current_stats.get()
+
+def install_query_listeners(engine):
+    """
+    Hook statement timing into an engine.
+
+    Args:
+        engine: A sync Engine (use AsyncEngine.sync_engine for async engines).
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_stats.get() is not None:
+            conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_stats.get()
+        starts = conn.info.get("query_start_time")
+        if stats is None or not starts:
+            return
+        stats.record(statement, (time.perf_counter() - starts.pop()) * 1000)
+
+async def query_metrics_middleware(request: Request, call_next):
+    """
+    Count the SQL issued by each request.
+
+    Logs requests over SQL_QUERY_BUDGET and statements repeated at least
+    SQL_N_PLUS_ONE_THRESHOLD times (probable N+1). With SQL_DEBUG_HEADERS
+    enabled, the numbers are also returned as X-DB-* response headers.
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_stats.reset(token)
+
+    endpoint = f"{request.method} {request.url.path}"
+    if stats.count > settings.SQL_QUERY_BUDGET:
+        logger.warning(
+            "%s issued %d queries (budget %d) in %.1f ms",
+            endpoint, stats.count, settings.SQL_QUERY_BUDGET, stats.total_ms,
+        )
+
+    repeated = stats.repeated(settings.SQL_N_PLUS_ONE_THRESHOLD)
+    for statement, times in repeated:
+        logger.warning("Probable N+1 in %s: statement ran %d times: %s", endpoint, times, statement[:300])
+
+    if settings.SQL_DEBUG_HEADERS:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+        response.headers["X-DB-Repeated-Statements"] = str(len(repeated))
+
+    return response
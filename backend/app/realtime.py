@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import time
+from typing import Iterable, Optional
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from jose import jwt
+from sqlalchemy import select
+
+from .config import settings
+from .database import AsyncSessionLocal
+from .models.chat import Conversation
+from .socketio_manager import WORKERS_NAMESPACE, create_client_manager, run_worker_signal
+from .utils.auth import resolve_user_from_token
+
+logger = logging.getLogger(__name__)
+
+# With several workers, emits go through SOCKETIO_MESSAGE_QUEUE so each
+# worker delivers them to the sockets it holds
+sio = socketio.AsyncServer(
+    async_mode='asgi',
+    cors_allowed_origins='*',
+    client_manager=create_client_manager(settings.SOCKETIO_MESSAGE_QUEUE, settings.SOCKETIO_CHANNEL),
+)
+socket_app = socketio.ASGIApp(sio)
+
+def start_client_manager():
+    """
+    Start the client manager's pub/sub listener now.
+
+    python-socketio only does this on the first socket connection, so an
+    API-only worker would otherwise never hear worker signals.
+    """
+    if not sio.manager_initialized:
+        sio.manager_initialized = True
+        sio.manager.initialize()
+
+ADMINS_ROOM = "admins"
+USERS_ROOM = "users"
+
+def user_room(user_id: str) -> str:
+    return f"user:{user_id}"
+
+def conversation_room(conversation_id: str) -> str:
+    return f"conversation:{conversation_id}"
+
+def audience_rooms(audience: str) -> list:
+    """Rooms reaching a broadcast audience (all, users, admins)"""
+    if audience == "admins":
+        return [ADMINS_ROOM]
+    if audience == "users":
+        return [USERS_ROOM]
+    return [ADMINS_ROOM, USERS_ROOM]
+
+class SocketTracker:
+    """
+    Live sockets on this worker, by user, with connection metrics.
+
+    Enforces the per-worker connection cap and the per-user socket limit.
+    """
+
+    def __init__(self, max_connections: int, max_per_user: int):
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self._users = {}  # sid -> user_id
+        self._sockets = {}  # user_id -> set of sids
+        self.accepted = 0
+        self.disconnected = 0
+        self.peak_connections = 0
+        self.rejected = {"unauthenticated": 0, "capacity": 0, "user_limit": 0}
+        self.expired = 0
+
+    @property
+    def connections(self) -> int:
+        return len(self._users)
+
+    def at_capacity(self) -> bool:
+        return 0 < self.max_connections <= self.connections
+
+    def reject(self, reason: str):
+        self.rejected[reason] += 1
+
+    def add(self, sid: str, user_id: str) -> Optional[str]:
+        """
+        Register an authenticated socket.
+
+        Returns:
+            None if it was added, otherwise the reason it was refused.
+        """
+        if self.at_capacity():
+            reason = "capacity"
+        elif 0 < self.max_per_user <= len(self._sockets.get(user_id, ())):
+            reason = "user_limit"
+        else:
+            self._users[sid] = user_id
+            self._sockets.setdefault(user_id, set()).add(sid)
+            self.accepted += 1
+            self.peak_connections = max(self.peak_connections, self.connections)
+            return None
+
+        self.reject(reason)
+        return reason
+
+    def remove(self, sid: str):
+        user_id = self._users.pop(sid, None)
+        if user_id is None:
+            return
+        sids = self._sockets[user_id]
+        sids.discard(sid)
+        if not sids:
+            del self._sockets[user_id]
+        self.disconnected += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "connections": self.connections,
+            "users": len(self._sockets),
+            "peak_connections": self.peak_connections,
+            "max_connections": self.max_connections,
+            "max_sockets_per_user": self.max_per_user,
+            "accepted": self.accepted,
+            "disconnected": self.disconnected,
+            "rejected": dict(self.rejected),
+            "expired": self.expired,
+        }
+
+socket_tracker = SocketTracker(settings.SOCKETIO_MAX_CONNECTIONS, settings.SOCKETIO_MAX_SOCKETS_PER_USER)
+
+def _handshake_token(environ: dict, auth: Optional[dict]) -> Optional[str]:
+    """The access token from the client's auth payload or Authorization header"""
+    token = (auth or {}).get("token") or environ.get("HTTP_AUTHORIZATION")
+    if token and token.startswith("Bearer "):
+        token = token[len("Bearer "):]
+    return token
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    # Cheapest check first: a full worker refuses before verifying anything
+    if socket_tracker.at_capacity():
+        socket_tracker.reject("capacity")
+        raise socketio.exceptions.ConnectionRefusedError("server at capacity")
+
+    token = _handshake_token(environ, auth)
+    if not token:
+        socket_tracker.reject("unauthenticated")
+        raise socketio.exceptions.ConnectionRefusedError("authentication required")
+
+    # The only database work for this socket: the user and the conversations
+    # they own. Later events authorize from the session alone.
+    try:
+        async with AsyncSessionLocal() as db:
+            user = await resolve_user_from_token(token, db)
+            conversation_ids = set((await db.scalars(
+                select(Conversation.id).where(Conversation.user_id == user.id)
+            )).all())
+    except HTTPException:
+        socket_tracker.reject("unauthenticated")
+        raise socketio.exceptions.ConnectionRefusedError("invalid token")
+
+    refused = socket_tracker.add(sid, user.id)
+    if refused == "capacity":
+        raise socketio.exceptions.ConnectionRefusedError("server at capacity")
+    if refused == "user_limit":
+        raise socketio.exceptions.ConnectionRefusedError("too many connections for this user")
+
+    await sio.save_session(sid, {
+        "user_id": user.id,
+        "is_admin": bool(user.is_admin),
+        "expires_at": jwt.get_unverified_claims(token).get("exp"),
+        "conversation_ids": conversation_ids,
+    })
+    await sio.enter_room(sid, user_room(user.id))
+    await sio.enter_room(sid, ADMINS_ROOM if user.is_admin else USERS_ROOM)
+    logger.debug("Socket %s connected as user %s", sid, user.id)
+
+@sio.event
+async def disconnect(sid):
+    socket_tracker.remove(sid)
+    logger.debug("Socket %s disconnected", sid)
+
+async def authorized_session(sid) -> Optional[dict]:
+    """
+    The socket's session, or None after disconnecting it if its token has
+    expired since the handshake.
+    """
+    session = await sio.get_session(sid)
+    expires_at = session.get("expires_at")
+    if expires_at is not None and expires_at <= time.time():
+        socket_tracker.expired += 1
+        await sio.disconnect(sid)
+        return None
+    return session
+
+@sio.event
+async def join_conversation(sid, data):
+    """Subscribe to a conversation's messages if the user may read it"""
+    session = await authorized_session(sid)
+    if session is None:
+        return {"ok": False, "error": "session expired"}
+    conversation_id = (data or {}).get("conversationId")
+    if not conversation_id:
+        return {"ok": False, "error": "conversationId is required"}
+
+    if not session["is_admin"] and conversation_id not in session["conversation_ids"]:
+        # Only a conversation created after the handshake gets here; ownership
+        # never changes, so it is looked up once and remembered
+        async with AsyncSessionLocal() as db:
+            owner_id = await db.scalar(select(Conversation.user_id).where(Conversation.id == conversation_id))
+        if owner_id != session["user_id"]:
+            return {"ok": False, "error": "not authorized"}
+        async with sio.session(sid) as stored:
+            stored["conversation_ids"].add(conversation_id)
+
+    await sio.enter_room(sid, conversation_room(conversation_id))
+    return {"ok": True}
+
+@sio.event
+async def leave_conversation(sid, data):
+    conversation_id = (data or {}).get("conversationId")
+    if conversation_id:
+        await sio.leave_room(sid, conversation_room(conversation_id))
+    return {"ok": True}
+
+# The chat screens announce themselves with these; sockets already joined
+# their user and role rooms at connect, so they only acknowledge
+@sio.event
+async def join_chat(sid, data):
+    return {"ok": True}
+
+@sio.event
+async def join_user_chat(sid, data):
+    return {"ok": True}
+
+@sio.event
+async def join_admin_chat(sid, data):
+    session = await authorized_session(sid)
+    return {"ok": bool(session and session["is_admin"])}
+
+@sio.event
+async def leave_chat(sid, data):
+    return {"ok": True}
+
+@sio.event
+async def leave_user_chat(sid, data):
+    return {"ok": True}
+
+@sio.event
+async def leave_admin_chat(sid, data):
+    return {"ok": True}
+
+async def emit(event: str, data, rooms: Iterable[str]):
+    """
+    Push an event to every socket in any of `rooms` (each socket once).
+
+    Call after the change is committed. Failures are logged, never raised,
+    so a push problem cannot fail the request that made the change.
+    """
+    rooms = list(rooms)
+    if not rooms:
+        return
+    try:
+        await sio.emit(event, jsonable_encoder(data), to=rooms)
+    except Exception:
+        logger.exception("Failed to emit %s to %d rooms", event, len(rooms))
+
+async def emit_to_users(event: str, data, user_ids: Iterable[str]):
+    await emit(event, data, [user_room(user_id) for user_id in user_ids])
+
+async def signal_workers(event: str, data=None):
+    """
+    Run the on_worker_signal handlers for `event` on every worker, this one
+    included. Failures are logged, never raised.
+    """
+    try:
+        if isinstance(sio.manager, AsyncPubSubManager):
+            await sio.manager.emit(event, data, namespace=WORKERS_NAMESPACE)
+        else:
+            await run_worker_signal(event, data)
+    except Exception:
+        logger.exception("Failed to signal workers: %s", event)
+
+_signals = set()
+
+def signal_workers_soon(event: str, data=None):
+    """signal_workers from synchronous code, e.g. session events; a no-op outside the event loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(signal_workers(event, data))
+    _signals.add(task)
+    task.add_done_callback(_signals.discard)
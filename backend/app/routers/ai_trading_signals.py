@@ -1,12 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, status
 from typing import List, Optional
 import random
 from datetime import datetime, timedelta
 
-from ..database import get_db
-from ..models.user import User
-from ..utils.auth import get_user_from_token
+from ..utils.auth import CurrentUser
 from ..config import settings
 
 # Updated router path to match frontend requests
@@ -58,22 +55,12 @@ def generate_mock_signals(market: str, timeframe: str, count: int = 10):
 
 @router.get("")
 async def get_trading_signals(
+    user: CurrentUser,
     market: str = "forex",
     timeframe: str = "1h",
-    count: int = 10,
-    db: Session = Depends(get_db),
-    current_user_id: str = Depends(get_user_from_token)
+    count: int = 10
 ):
     """Get AI trading signals with admin bypass"""
-    user = db.query(User).filter(User.id == current_user_id).first()
-    
-    # User authentication check
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
     # Global override check or admin check
     if settings.DISABLE_SUBSCRIPTION_CHECK or user.is_admin or (user.email in settings.ADMIN_EMAILS):
         try:
@@ -104,26 +91,11 @@ async def get_trading_signals(
 @router.get("/analyze")
 async def analyze_market(
     symbol: str,
-    timeframe: str = "1h",
-    db: Session = Depends(get_db),
-    current_user_id: str = Depends(get_user_from_token)
+    user: CurrentUser,
+    timeframe: str = "1h"
 ):
     """Analyze a specific market symbol"""
     # ... keep existing code (analyze_market function)
-    if not current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    # Fetch the user
-    user = db.query(User).filter(User.id == current_user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Global override check or admin check - admins always have access
     if settings.DISABLE_SUBSCRIPTION_CHECK or user.is_admin or (user.email in settings.ADMIN_EMAILS):
         # Continue with analysis - no subscription check for admins
@@ -1,7 +1,8 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from typing import Any, Dict
 from jose import jwt, JWTError
@@ -10,14 +11,15 @@ import uuid
 from ..database import get_db
 from ..schemas.user import UserCreate, UserLogin, UserResponse
 from ..models.user import User
-from ..utils.auth import create_access_token, get_password_hash, verify_password, get_current_user as get_user_from_token, SECRET_KEY, ALGORITHM
+from ..utils.auth import create_access_token, CurrentUser
+from ..utils.hash_password import hash_password_async, verify_password_async
 from ..config import settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 @router.post("/register", response_model=Dict[str, Any])
-def register_user(user_data: UserCreate, db: Session = Depends(get_db)) -> Any:
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)) -> Any:
     # Validate input data
     if not user_data.email or not user_data.password or not user_data.name:
         raise HTTPException(
@@ -33,16 +35,18 @@ def register_user(user_data: UserCreate, db: Session = Depends(get_db)) -> Any:
         )
         
     # Check if user already exists
-    user_exists = db.query(User).filter(User.email == user_data.email).first()
+    user_exists = await db.scalar(select(User).where(User.email == user_data.email))
     if user_exists:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
+    # Hash outside the try block so a saturated hashing pool surfaces as 429
+    hashed_password = await hash_password_async(user_data.password)
+
     try:
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
         new_user = User(
             id=str(uuid.uuid4()),
             email=user_data.email,
@@ -51,8 +55,8 @@ def register_user(user_data: UserCreate, db: Session = Depends(get_db)) -> Any:
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         # Return user data with success message
         user_response = UserResponse.from_orm(new_user)
@@ -62,7 +66,7 @@ def register_user(user_data: UserCreate, db: Session = Depends(get_db)) -> Any:
             "user": user_response
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Registration error: {str(e)}")  # Add logging for debugging
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -70,7 +74,7 @@ def register_user(user_data: UserCreate, db: Session = Depends(get_db)) -> Any:
         )
 
 @router.post("/login")
-def login(user_data: UserLogin, db: Session = Depends(get_db)) -> dict:
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)) -> dict:
     try:
         # Validate input data
         if not user_data.email or not user_data.password:
@@ -80,7 +84,7 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)) -> dict:
             )
             
         # Find user by email
-        user = db.query(User).filter(User.email == user_data.email).first()
+        user = await db.scalar(select(User).where(User.email == user_data.email))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -88,7 +92,7 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)) -> dict:
             )
         
         # Verify password
-        if not verify_password(user_data.password, user.password):
+        if not await verify_password_async(user_data.password, user.password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
@@ -123,50 +127,5 @@ def logout():
     return {"message": "Successfully logged out"}
 
 @router.get("/users/me", response_model=UserResponse)
-async def get_current_user(request: Request, db: Session = Depends(get_db)):
-    # Get the authorization header
-    authorization = request.headers.get("Authorization")
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # Extract the token from the Authorization header
-    if authorization.startswith("Bearer "):
-        token = authorization.replace("Bearer ", "")
-    else:
-        token = authorization
-    
-    from jose import jwt, JWTError
-    from ..utils.auth import SECRET_KEY, ALGORITHM
-    
-    try:
-        # Decode the JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        # Get the user from the database
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
-        return user
-    except JWTError as e:
-        print(f"JWT Error in /users/me: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+async def get_current_user(current_user: CurrentUser):
+    return current_user
@@ -1,15 +1,15 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
 import uuid
 from datetime import datetime, timedelta
 
 from ..database import get_db
-from ..models.user import User
 from ..models.purchase import Purchase
 from ..models.subscription import Subscription, SubscriptionPlan
-from ..utils.auth import get_user_from_token
+from ..utils.auth import CurrentUser
 from ..services.card_payment import process_card_payment, verify_card_payment
 
 router = APIRouter(prefix="/payments/card", tags=["card_payment"])
@@ -17,24 +17,10 @@ router = APIRouter(prefix="/payments/card", tags=["card_payment"])
 @router.post("/process")
 async def process_payment(
     payment_data: Dict[str, Any],
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Process a card payment"""
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    # Get the user
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Extract payment details
     card_details = payment_data.get("card_details")
     amount = payment_data.get("amount")
@@ -70,7 +56,7 @@ async def process_payment(
         # Create record based on payment type
         if payment_type == "subscription":
             # Get subscription plan details
-            plan = db.query(SubscriptionPlan).filter(SubscriptionPlan.id == item_id).first()
+            plan = await db.scalar(select(SubscriptionPlan).where(SubscriptionPlan.id == item_id))
             if not plan:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -88,7 +74,7 @@ async def process_payment(
             # Create new subscription record
             subscription = Subscription(
                 id=transaction_id,
-                user_id=user_id,
+                user_id=user.id,
                 plan_id=item_id,
                 amount=float(amount),
                 currency=currency,
@@ -105,7 +91,7 @@ async def process_payment(
             # Create purchase record for robot
             purchase = Purchase(
                 id=transaction_id,
-                user_id=user_id,
+                user_id=user.id,
                 robot_id=item_id,
                 amount=float(amount),
                 currency=currency,
@@ -115,7 +101,7 @@ async def process_payment(
             )
             db.add(purchase)
         
-        db.commit()
+        await db.commit()
         
         return {
             "success": True,
@@ -134,16 +120,10 @@ async def process_payment(
 @router.post("/verify/{payment_id}")
 async def verify_payment(
     payment_id: str,
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Verify a card payment status"""
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
     try:
         # Check payment status with payment provider
         verification = verify_card_payment(payment_id)
@@ -151,15 +131,15 @@ async def verify_payment(
         if verification.get("success"):
             # Update purchase or subscription status if needed
             # Find purchase with this payment ID
-            purchase = db.query(Purchase).filter(
+            purchase = await db.scalar(select(Purchase).where(
                 Purchase.card_payment_id == payment_id,
                 Purchase.status != "completed"
-            ).first()
+            ))
             
             if purchase:
                 purchase.status = "completed"
                 purchase.updated_at = datetime.utcnow()
-                db.commit()
+                await db.commit()
                 return {
                     "success": True,
                     "status": "completed",
@@ -169,16 +149,16 @@ async def verify_payment(
                 }
             
             # If not found in purchases, check subscriptions
-            subscription = db.query(Subscription).filter(
+            subscription = await db.scalar(select(Subscription).where(
                 Subscription.card_payment_id == payment_id,
                 Subscription.status != "active"
-            ).first()
+            ))
             
             if subscription:
                 subscription.status = "active"
                 subscription.is_active = True
                 subscription.updated_at = datetime.utcnow()
-                db.commit()
+                await db.commit()
                 return {
                     "success": True,
                     "status": "active",
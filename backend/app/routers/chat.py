@@ -1,11 +1,17 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from datetime import datetime, timezone
 from typing import List
 from ..database import get_db
 from ..models import chat, user
+from ..realtime import ADMINS_ROOM, conversation_room, emit, user_room
 from ..schemas import chat as chat_schema
-from ..utils.auth import get_current_user
+from ..services.unread_counters import adjust_unread, get_unread_counter
+from ..utils.auth import CurrentUser
+from ..utils.pagination import Window, fetch_window, keyset, keyset_position, sortable_time
 
 router = APIRouter(
     prefix="/api/chat",
@@ -14,10 +20,10 @@ router = APIRouter(
 )
 
 @router.post("/conversations", response_model=chat_schema.ConversationResponse)
-def create_conversation(
+async def create_conversation(
     conversation: chat_schema.ConversationCreate, 
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate that the current user is creating their own conversation
     if current_user.id != conversation.user_id:
@@ -32,31 +38,66 @@ def create_conversation(
         user_id=conversation.user_id
     )
     db.add(db_conversation)
-    db.commit()
-    db.refresh(db_conversation)
+    await db.commit()
+    await db.refresh(db_conversation)
     return db_conversation
 
-@router.get("/conversations", response_model=List[chat_schema.ConversationResponse])
-def get_conversations(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+def conversation_summary_query(viewer_id: str):
+    """
+    Select conversations with their last message, message count and the
+    viewer's unread count, aggregated in a single statement.
+    """
+    Conversation, Message = chat.Conversation, chat.Message
+
+    last = aliased(Message)
+    latest = select(last).where(
+        last.conversation_id == Conversation.id
+    ).order_by(last.created_at.desc(), last.id.desc()).limit(1).correlate(Conversation)
+
+    return select(
+        Conversation.id,
+        Conversation.title,
+        Conversation.user_id,
+        Conversation.created_at,
+        latest.with_only_columns(last.content).scalar_subquery().label("last_message"),
+        latest.with_only_columns(last.sender_id).scalar_subquery().label("last_message_sender_id"),
+        func.max(Message.created_at).label("last_message_time"),
+        func.count(Message.id).label("message_count"),
+        func.coalesce(func.sum(case(
+            ((Message.is_read == False) & (Message.sender_id != viewer_id), 1),
+            else_=0,
+        )), 0).label("unread_count"),
+    ).outerjoin(
+        Message, Message.conversation_id == Conversation.id
+    ).group_by(
+        Conversation.id, Conversation.title, Conversation.user_id, Conversation.created_at
+    )
+
+@router.get("/conversations", response_model=List[chat_schema.ConversationSummary])
+async def get_conversations(
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
-    # Get all conversations for the current user
-    conversations = db.query(chat.Conversation).filter(
-        chat.Conversation.user_id == current_user.id
-    ).all()
-    return conversations
+    # Get summaries of all conversations for the current user
+    rows = (await db.execute(
+        conversation_summary_query(current_user.id).where(
+            chat.Conversation.user_id == current_user.id
+        ).order_by(func.max(chat.Message.created_at).desc(), chat.Conversation.created_at.desc())
+    )).mappings().all()
+    return rows
 
-@router.get("/conversations/{conversation_id}", response_model=chat_schema.ConversationResponse)
-def get_conversation(
+@router.get("/conversations/{conversation_id}", response_model=chat_schema.ConversationSummary)
+async def get_conversation(
     conversation_id: str,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     # Get a specific conversation
-    conversation = db.query(chat.Conversation).filter(
-        chat.Conversation.id == conversation_id
-    ).first()
+    conversation = (await db.execute(
+        conversation_summary_query(current_user.id).where(
+            chat.Conversation.id == conversation_id
+        )
+    )).mappings().first()
     
     if not conversation:
         raise HTTPException(
@@ -65,7 +106,7 @@ def get_conversation(
         )
     
     # Verify the user has access to this conversation
-    if conversation.user_id != current_user.id:
+    if conversation["user_id"] != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view this conversation"
@@ -74,15 +115,15 @@ def get_conversation(
     return conversation
 
 @router.post("/messages", response_model=chat_schema.MessageResponse)
-def create_message(
+async def create_message(
     message: chat_schema.MessageCreate,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate conversation exists
-    conversation = db.query(chat.Conversation).filter(
+    conversation = await db.scalar(select(chat.Conversation).where(
         chat.Conversation.id == message.conversation_id
-    ).first()
+    ))
     
     if not conversation:
         raise HTTPException(
@@ -105,20 +146,28 @@ def create_message(
         is_read=message.is_read
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    if not db_message.is_read and db_message.sender_id != conversation.user_id:
+        await adjust_unread(db, conversation.user_id, messages=1)
+    await db.commit()
+    await db.refresh(db_message)
+    
+    # Push to the conversation, its owner and the support admins
+    await emit(
+        "new_message",
+        chat_schema.MessageResponse.model_validate(db_message),
+        [conversation_room(conversation.id), user_room(conversation.user_id), ADMINS_ROOM]
+    )
     return db_message
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[chat_schema.MessageResponse])
-def get_messages(
+async def get_messages(
     conversation_id: str,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: CurrentUser,
+    window: Window,
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate conversation exists
-    conversation = db.query(chat.Conversation).filter(
-        chat.Conversation.id == conversation_id
-    ).first()
+    conversation = await db.get(chat.Conversation, conversation_id)
     
     if not conversation:
         raise HTTPException(
@@ -133,23 +182,38 @@ def get_messages(
             detail="Not authorized to view messages in this conversation"
         )
     
-    # Get messages for the conversation
-    messages = db.query(chat.Message).filter(
-        chat.Message.conversation_id == conversation_id
-    ).order_by(chat.Message.created_at).all()
+    query = select(chat.Message).where(chat.Message.conversation_id == conversation_id)
+
+    # Jumping to a message centres the window on it
+    anchor = None
+    if window.around:
+        anchor = (await db.execute(
+            select(chat.Message.created_at, chat.Message.id).where(
+                chat.Message.id == window.around,
+                chat.Message.conversation_id == conversation_id
+            )
+        )).first()
+        if not anchor:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Message not found"
+            )
+    
+    # Get one window of the history, oldest first (the newest messages by default)
+    messages = await fetch_window(db, query, chat.Message, window, anchor=anchor and tuple(anchor))
     
     return messages
 
 @router.put("/messages/{message_id}/read")
-def mark_message_as_read(
+async def mark_message_as_read(
     message_id: str,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     # Find the message
-    message = db.query(chat.Message).filter(
+    message = await db.scalar(select(chat.Message).where(
         chat.Message.id == message_id
-    ).first()
+    ))
     
     if not message:
         raise HTTPException(
@@ -158,9 +222,9 @@ def mark_message_as_read(
         )
     
     # Verify the user has access to this message
-    conversation = db.query(chat.Conversation).filter(
+    conversation = await db.scalar(select(chat.Conversation).where(
         chat.Conversation.id == message.conversation_id
-    ).first()
+    ))
     
     if conversation.user_id != current_user.id:
         raise HTTPException(
@@ -168,30 +232,94 @@ def mark_message_as_read(
             detail="Not authorized to mark this message as read"
         )
     
-    # Update message
-    message.is_read = True
-    db.commit()
+    # Update message, counting it only if this request changed it
+    result = await db.execute(update(chat.Message).where(
+        chat.Message.id == message_id,
+        chat.Message.is_read == False
+    ).values({"is_read": True}))
+    if result.rowcount and message.sender_id != conversation.user_id:
+        await adjust_unread(db, conversation.user_id, messages=-1)
+    await db.commit()
     
     return {"detail": "Message marked as read"}
 
-@router.get("/messages/unread/count")
-def get_unread_message_count(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+@router.put("/conversations/{conversation_id}/read", response_model=chat_schema.ConversationReadResponse)
+async def mark_conversation_as_read(
+    conversation_id: str,
+    read: chat_schema.ConversationReadRequest,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
-    # Get conversations owned by the user
-    conversations = db.query(chat.Conversation).filter(
-        chat.Conversation.user_id == current_user.id
-    ).all()
+    conversation = await db.get(chat.Conversation, conversation_id)
+    
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
     
-    # Get conversation IDs
-    conversation_ids = [conversation.id for conversation in conversations]
+    # The owner reads support's replies; admins read the owner's messages
+    is_owner = conversation.user_id == current_user.id
+    if not is_owner and not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to mark messages in this conversation as read"
+        )
     
-    # Count unread messages
-    unread_count = db.query(chat.Message).filter(
-        chat.Message.conversation_id.in_(conversation_ids),
+    conditions = [
+        chat.Message.conversation_id == conversation_id,
         chat.Message.is_read == False,
-        chat.Message.sender_id != current_user.id
-    ).count()
+        chat.Message.sender_id != conversation.user_id if is_owner else chat.Message.sender_id == conversation.user_id,
+    ]
+    if read.up_to_message_id:
+        position = (await db.execute(
+            select(chat.Message.created_at, chat.Message.id).where(
+                chat.Message.id == read.up_to_message_id,
+                chat.Message.conversation_id == conversation_id
+            )
+        )).first()
+        if not position:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Message not found"
+            )
+        conditions.append(keyset(chat.Message) <= keyset_position(chat.Message, tuple(position)))
+    if read.up_to:
+        # created_at is naive UTC; compare in the same normalised form as the keyset
+        up_to = read.up_to
+        if up_to.tzinfo is not None:
+            up_to = up_to.astimezone(timezone.utc).replace(tzinfo=None)
+        conditions.append(
+            sortable_time(chat.Message.created_at) <= sortable_time(literal(up_to, chat.Message.created_at.type))
+        )
+    
+    # One set-based update; the counter moves in the same transaction
+    result = await db.execute(update(chat.Message).where(*conditions).values({"is_read": True}))
+    read_count = result.rowcount
+    if read_count and is_owner:
+        await adjust_unread(db, conversation.user_id, messages=-read_count)
+    await db.commit()
+    
+    receipt = chat_schema.ConversationReadResponse(
+        conversation_id=conversation_id,
+        reader_id=current_user.id,
+        read_count=read_count,
+        up_to_message_id=read.up_to_message_id,
+        up_to=read.up_to,
+        read_at=datetime.utcnow(),
+    )
+    if read_count:
+        # Tell the other side, and the reader's other tabs and devices
+        other_side = ADMINS_ROOM if is_owner else user_room(conversation.user_id)
+        await emit("messages_read", receipt, [conversation_room(conversation_id), other_side, user_room(current_user.id)])
+    return receipt
+
+@router.get("/messages/unread/count")
+async def get_unread_message_count(
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
+):
+    # Read the maintained counter instead of counting rows
+    counter = await get_unread_counter(db, current_user)
     
-    return {"unread_count": unread_count}
+    return {"unread_count": counter.messages}
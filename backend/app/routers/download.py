@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Query, Request
+
+from ..services.robot_downloads import file_response, verify_signed_url
+
+router = APIRouter(prefix="/downloads", tags=["downloads"])
+
+@router.get("/{path:path}")
+async def get_signed_download(
+    path: str,
+    request: Request,
+    name: str = Query(...),
+    exp: int = Query(...),
+    sig: str = Query(...),
+):
+    """Download a robot file through a signed URL (no login or database access)"""
+    verify_signed_url(path, name, exp, sig)
+    return file_response(request, path, name)
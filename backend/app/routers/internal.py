@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ..database import async_engine
+from ..models.user import User
+from ..pool_metrics import pool_metrics
+from ..realtime import socket_tracker
+from ..services.mpesa import access_token_cache
+from ..services.notification_fanout import notification_fanout
+from ..services.payment_poller import payment_poller
+from ..services.provider_client import provider_clients
+from ..services.robot_catalog import robot_catalog
+from ..services.unread_counters import reconcile_unread_counters
+from ..utils.auth import get_admin_user
+from ..utils.hash_password import hashing_executor
+from ..utils.user_cache import token_user_cache
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+@router.get("/db-pool")
+async def get_db_pool_metrics(admin_user: User = Depends(get_admin_user)):
+    """Get live connection pool metrics (admin only)"""
+    return pool_metrics.snapshot(async_engine.pool)
+
+@router.get("/hashing")
+async def get_hashing_metrics(admin_user: User = Depends(get_admin_user)):
+    """Get password hashing pool queue metrics (admin only)"""
+    return hashing_executor.snapshot()
+
+@router.get("/auth-cache")
+async def get_auth_cache_metrics(admin_user: User = Depends(get_admin_user)):
+    """Get verified token cache metrics (admin only)"""
+    return token_user_cache.stats()
+
+@router.get("/mpesa-token")
+async def get_mpesa_token_metrics(admin_user: User = Depends(get_admin_user)):
+    """Get M-Pesa access token cache metrics for this worker (admin only)"""
+    return access_token_cache.stats()
+
+@router.get("/mpesa-poller")
+async def get_mpesa_poller_metrics(admin_user: User = Depends(get_admin_user)):
+    """Get M-Pesa status polling metrics for this worker (admin only)"""
+    return payment_poller.stats()
+
+@router.get("/providers")
+async def get_provider_metrics(admin_user: User = Depends(get_admin_user)):
+    """Get payment provider client metrics and circuit states for this worker (admin only)"""
+    return {name: client.stats() for name, client in provider_clients.items()}
+
+@router.get("/robot-catalog")
+async def get_robot_catalog_metrics(admin_user: User = Depends(get_admin_user)):
+    """Get robot catalog cache metrics for this worker (admin only)"""
+    return robot_catalog.stats()
+
+@router.get("/sockets")
+async def get_socket_metrics(admin_user: User = Depends(get_admin_user)):
+    """Get Socket.IO connection metrics for this worker (admin only)"""
+    return socket_tracker.snapshot()
+
+@router.get("/fanout-jobs")
+async def get_fanout_jobs(admin_user: User = Depends(get_admin_user)):
+    """Get recent notification fan-out jobs (admin only)"""
+    return notification_fanout.jobs()
+
+@router.get("/fanout-jobs/{job_id}")
+async def get_fanout_job(job_id: str, admin_user: User = Depends(get_admin_user)):
+    """Get the progress of a notification fan-out job (admin only)"""
+    job = notification_fanout.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Fan-out job not found"
+        )
+    return job.to_dict()
+
+@router.post("/unread-counters/reconcile")
+async def reconcile_counters(admin_user: User = Depends(get_admin_user)):
+    """Recompute unread counters from the source tables and repair drift (admin only)"""
+    return await reconcile_unread_counters()
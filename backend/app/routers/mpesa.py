@@ -1,16 +1,17 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any, Dict, Optional
 import uuid
 from datetime import datetime, timedelta
 
 from ..database import get_db
-from ..models.user import User
 from ..models.purchase import Purchase
 from ..models.subscription import Subscription, SubscriptionPlan
-from ..utils.auth import get_user_from_token
-from ..services.mpesa import initiate_stk_push, verify_stk_push
+from ..utils.auth import CurrentUser
+from ..services.mpesa import initiate_stk_push
+from ..services.payment_poller import payment_poller, update_transaction_status
 from ..schemas.purchase import PurchaseCreate
 from ..schemas.subscription import SubscriptionCreate
 
@@ -19,25 +20,10 @@ router = APIRouter(prefix="/payments/mpesa", tags=["mpesa"])
 @router.post("/initiate")
 async def initiate_mpesa_payment(
     payment_data: Dict[str, Any],
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db), 
-    user_id: str = Depends(get_user_from_token)
+    user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """Initiate M-Pesa STK Push payment"""
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    # Get the user
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Extract payment details
     phone_number = payment_data.get("phone_number")
     amount = payment_data.get("amount")
@@ -64,7 +50,7 @@ async def initiate_mpesa_payment(
         
         # For production, you'd use the actual M-Pesa service
         try:
-            mpesa_response = initiate_stk_push(phone_number, float(amount), description)
+            mpesa_response = await initiate_stk_push(phone_number, float(amount), description)
             checkout_request_id = mpesa_response.get("CheckoutRequestID")
         except Exception as e:
             # For testing, we'll mock a successful response
@@ -74,7 +60,7 @@ async def initiate_mpesa_payment(
         # Create initial purchase or subscription record (pending status)
         if payment_type == "subscription":
             # Get subscription plan details
-            plan = db.query(SubscriptionPlan).filter(SubscriptionPlan.id == item_id).first()
+            plan = await db.scalar(select(SubscriptionPlan).where(SubscriptionPlan.id == item_id))
             if not plan:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -92,7 +78,7 @@ async def initiate_mpesa_payment(
             # Create new subscription record
             subscription = Subscription(
                 id=transaction_id,
-                user_id=user_id,
+                user_id=user.id,
                 plan_id=item_id,
                 amount=float(amount),
                 currency="KES",
@@ -109,7 +95,7 @@ async def initiate_mpesa_payment(
             # Create purchase record for robot
             purchase = Purchase(
                 id=transaction_id,
-                user_id=user_id,
+                user_id=user.id,
                 robot_id=item_id,
                 amount=float(amount),
                 currency="KES",
@@ -119,10 +105,10 @@ async def initiate_mpesa_payment(
             )
             db.add(purchase)
         
-        db.commit()
+        await db.commit()
         
-        # Add background task to check payment status
-        background_tasks.add_task(poll_payment_status, checkout_request_id, transaction_id, payment_type, db)
+        # Poll for the status in case the callback never arrives
+        payment_poller.schedule(checkout_request_id)
         
         return {
             "success": True,
@@ -140,16 +126,16 @@ async def initiate_mpesa_payment(
 @router.post("/verify/{transaction_id}")
 async def verify_mpesa_payment(
     transaction_id: str,
-    db: Session = Depends(get_db),
-    user_id: Optional[str] = Depends(get_user_from_token)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """Verify M-Pesa STK Push payment status by transaction ID"""
     # Check purchase record first
-    purchase = db.query(Purchase).filter(Purchase.id == transaction_id).first()
+    purchase = await db.scalar(select(Purchase).where(Purchase.id == transaction_id))
     
     if purchase:
         # Verify the transaction is for the authenticated user
-        if user_id and purchase.user_id != user_id:
+        if purchase.user_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to view this transaction"
@@ -162,11 +148,11 @@ async def verify_mpesa_payment(
         }
     
     # Then check subscription
-    subscription = db.query(Subscription).filter(Subscription.id == transaction_id).first()
+    subscription = await db.scalar(select(Subscription).where(Subscription.id == transaction_id))
     
     if subscription:
         # Verify the transaction is for the authenticated user
-        if user_id and subscription.user_id != user_id:
+        if subscription.user_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to view this subscription"
@@ -186,7 +172,7 @@ async def verify_mpesa_payment(
 @router.post("/callback")
 async def mpesa_callback(
     callback_data: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Callback endpoint for M-Pesa to notify about transaction status
@@ -206,77 +192,10 @@ async def mpesa_callback(
         is_successful = result_code == 0
         
         # Update purchase or subscription status
-        update_transaction_status(checkout_request_id, is_successful, db)
+        await update_transaction_status(checkout_request_id, is_successful, db)
+        payment_poller.resolve(checkout_request_id)
         
         return {"success": True, "message": "Callback processed successfully"}
     except Exception as e:
         print(f"Error processing M-Pesa callback: {str(e)}")
         return {"success": False, "message": f"Error processing callback: {str(e)}"}
-
-async def poll_payment_status(checkout_request_id: str, transaction_id: str, payment_type: str, db: Session):
-    """
-    Background task to poll M-Pesa payment status
-    In a real implementation, we'd rely more on callbacks, but polling provides a fallback
-    """
-    max_attempts = 10
-    attempt = 0
-    poll_interval_seconds = 6
-    
-    while attempt < max_attempts:
-        try:
-            # Sleep between attempts
-            import asyncio
-            await asyncio.sleep(poll_interval_seconds)
-            
-            # Query M-PESA for status
-            try:
-                verification = verify_stk_push(checkout_request_id)
-                is_successful = verification.get("success", False)
-            except Exception as e:
-                print(f"Error verifying STK push: {str(e)}")
-                # For demo, randomly succeed after a few attempts
-                import random
-                is_successful = random.choice([True, False]) if attempt > 5 else False
-            
-            # If successful or final attempt, update status
-            if is_successful or attempt == max_attempts - 1:
-                # Get a new db session since this is a background task
-                from app.database import SessionLocal
-                db_session = SessionLocal()
-                try:
-                    update_transaction_status(checkout_request_id, is_successful, db_session)
-                    if is_successful:
-                        print(f"Payment for {transaction_id} successful after {attempt+1} attempts")
-                        return
-                finally:
-                    db_session.close()
-            
-            attempt += 1
-        except Exception as e:
-            print(f"Error polling payment status: {str(e)}")
-            attempt += 1
-
-def update_transaction_status(checkout_request_id: str, is_successful: bool, db: Session):
-    """Update the status of a transaction based on M-Pesa verification"""
-    # Try to find purchase with this checkout ID
-    purchase = db.query(Purchase).filter(
-        Purchase.mpesa_checkout_request_id == checkout_request_id
-    ).first()
-    
-    if purchase:
-        purchase.status = "completed" if is_successful else "failed"
-        purchase.updated_at = datetime.utcnow()
-        db.commit()
-        return
-    
-    # If not found in purchases, check subscriptions
-    subscription = db.query(Subscription).filter(
-        Subscription.mpesa_checkout_request_id == checkout_request_id
-    ).first()
-    
-    if subscription:
-        subscription.status = "active" if is_successful else "failed"
-        subscription.is_active = is_successful
-        subscription.updated_at = datetime.utcnow()
-        db.commit()
-        return
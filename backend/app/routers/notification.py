@@ -1,11 +1,22 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import DateTime, String, and_, delete, exists, func, literal, or_, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from ..database import get_db
+from ..database import get_db, insert_or_ignore
 from ..models import notification
+from ..models.user import User
+from ..models.unread_counter import UnreadCounter
+from ..realtime import audience_rooms, emit, emit_to_users
 from ..schemas import notification as notification_schema
-from ..utils.auth import get_current_user
+from ..services.unread_counters import (
+    adjust_unread,
+    count_broadcast,
+    get_unread_notification_total,
+    user_audiences,
+)
+from ..utils.auth import AdminUser, CurrentUser
+from ..utils.pagination import Pagination, paginate
 
 router = APIRouter(
     prefix="/api/notifications",
@@ -13,11 +24,60 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+Broadcast = notification.BroadcastNotification
+
+def visible_broadcasts(user: User):
+    """Broadcasts addressed to the user's audience since they signed up"""
+    return and_(
+        Broadcast.audience.in_(user_audiences(user)),
+        Broadcast.created_at >= literal(user.created_at, DateTime(timezone=True)),
+    )
+
+def broadcast_is_read(user: User):
+    """Read when at or below the user's watermark, or read individually"""
+    watermark = func.coalesce(
+        select(notification.NotificationReadState.broadcasts_read_at).where(
+            notification.NotificationReadState.user_id == user.id
+        ).scalar_subquery(),
+        literal(user.created_at, DateTime(timezone=True)),
+    )
+    return or_(
+        Broadcast.created_at <= watermark,
+        exists().where(
+            notification.BroadcastNotificationRead.user_id == user.id,
+            notification.BroadcastNotificationRead.broadcast_id == Broadcast.id,
+        ),
+    )
+
+def notification_feed(user: User):
+    """The user's personal notifications and visible broadcasts as one subquery"""
+    personal = select(
+        notification.Notification.id,
+        notification.Notification.user_id,
+        notification.Notification.title,
+        notification.Notification.message,
+        notification.Notification.is_read,
+        notification.Notification.created_at,
+        literal("personal", String).label("kind"),
+    ).where(notification.Notification.user_id == user.id)
+
+    broadcast = select(
+        Broadcast.id,
+        literal(None, String).label("user_id"),
+        Broadcast.title,
+        Broadcast.message,
+        broadcast_is_read(user).label("is_read"),
+        Broadcast.created_at,
+        literal("broadcast", String).label("kind"),
+    ).where(visible_broadcasts(user))
+
+    return union_all(personal, broadcast).subquery("notification_feed")
+
 @router.post("/", response_model=notification_schema.NotificationResponse)
-def create_notification(
+async def create_notification(
     notification_data: notification_schema.NotificationCreate,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     # Only allow admins to create notifications for other users
     if notification_data.user_id != current_user.id and not current_user.is_admin:
@@ -30,57 +90,107 @@ def create_notification(
     db_notification = notification.Notification(
         user_id=notification_data.user_id,
         title=notification_data.title,
-        content=notification_data.content,
-        is_read=notification_data.is_read,
-        notification_type=notification_data.notification_type
+        message=notification_data.message,
+        is_read=notification_data.is_read
     )
     
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    if not db_notification.is_read:
+        await adjust_unread(db, db_notification.user_id, notifications=1)
+    await db.commit()
+    await db.refresh(db_notification)
+    
+    await emit_to_users(
+        "notification",
+        notification_schema.NotificationResponse.model_validate(db_notification),
+        [db_notification.user_id]
+    )
     return db_notification
 
 @router.get("/", response_model=List[notification_schema.NotificationResponse])
-def get_notifications(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+async def get_notifications(
+    current_user: CurrentUser,
+    page: Pagination,
+    db: AsyncSession = Depends(get_db)
 ):
-    # Get notifications for the current user
-    notifications = db.query(notification.Notification).filter(
-        notification.Notification.user_id == current_user.id
-    ).order_by(notification.Notification.created_at.desc()).all()
+    # Get personal notifications and broadcasts for the current user, newest first
+    feed = notification_feed(current_user)
+    notifications = await paginate(db, select(feed), feed.c, page, descending=True)
     
     return notifications
 
+@router.post("/broadcast", response_model=notification_schema.NotificationResponse)
+async def create_broadcast_notification(
+    broadcast_data: notification_schema.BroadcastNotificationCreate,
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
+):
+    # One row for the whole audience
+    db_broadcast = Broadcast(
+        audience=broadcast_data.audience,
+        title=broadcast_data.title,
+        message=broadcast_data.message
+    )
+    
+    db.add(db_broadcast)
+    await count_broadcast(db, db_broadcast.audience)
+    await db.commit()
+    await db.refresh(db_broadcast)
+    
+    response = notification_schema.NotificationResponse(
+        id=db_broadcast.id,
+        title=db_broadcast.title,
+        message=db_broadcast.message,
+        created_at=db_broadcast.created_at,
+        kind="broadcast"
+    )
+    await emit("notification", response, audience_rooms(db_broadcast.audience))
+    return response
+
 @router.get("/unread/count")
-def get_unread_notification_count(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+async def get_unread_notification_count(
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
-    # Count unread notifications
-    unread_count = db.query(notification.Notification).filter(
-        notification.Notification.user_id == current_user.id,
-        notification.Notification.is_read == False
-    ).count()
+    # Read the maintained counters instead of counting rows
+    unread_count = await get_unread_notification_total(db, current_user)
     
     return {"unread_count": unread_count}
 
 @router.put("/{notification_id}/read")
-def mark_notification_as_read(
+async def mark_notification_as_read(
     notification_id: str,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     # Find the notification
-    db_notification = db.query(notification.Notification).filter(
+    db_notification = await db.scalar(select(notification.Notification).where(
         notification.Notification.id == notification_id
-    ).first()
+    ))
     
     if not db_notification:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Notification not found"
-        )
+        # Not a personal notification; it may be a broadcast
+        is_read = await db.scalar(select(broadcast_is_read(current_user)).where(
+            Broadcast.id == notification_id,
+            visible_broadcasts(current_user)
+        ))
+        if is_read is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Notification not found"
+            )
+        
+        if not is_read:
+            # Concurrent requests both get here; only the one that inserts counts it
+            result = await db.execute(insert_or_ignore(db, notification.BroadcastNotificationRead).values(
+                user_id=current_user.id,
+                broadcast_id=notification_id
+            ))
+            if result.rowcount:
+                await adjust_unread(db, current_user.id, broadcasts_seen=1)
+            await db.commit()
+        
+        return {"detail": "Notification marked as read"}
     
     # Verify the user has access to this notification
     if db_notification.user_id != current_user.id:
@@ -89,23 +199,46 @@ def mark_notification_as_read(
             detail="Not authorized to mark this notification as read"
         )
     
-    # Update notification
-    db_notification.is_read = True
-    db.commit()
+    # Update notification, counting it only if this request changed it
+    result = await db.execute(update(notification.Notification).where(
+        notification.Notification.id == notification_id,
+        notification.Notification.is_read == False
+    ).values({"is_read": True}))
+    if result.rowcount:
+        await adjust_unread(db, current_user.id, notifications=-1)
+    await db.commit()
     
     return {"detail": "Notification marked as read"}
 
 @router.put("/read/all")
-def mark_all_notifications_read(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+async def mark_all_notifications_read(
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     # Update all notifications for this user
-    db.query(notification.Notification).filter(
+    await db.execute(update(notification.Notification).where(
         notification.Notification.user_id == current_user.id,
         notification.Notification.is_read == False
-    ).update({"is_read": True})
+    ).values({"is_read": True}))
+    
+    # Move the broadcast watermark up; individual reads below it are redundant
+    read_state = await db.get(notification.NotificationReadState, current_user.id)
+    if read_state:
+        read_state.broadcasts_read_at = func.now()
+    else:
+        db.add(notification.NotificationReadState(
+            user_id=current_user.id,
+            broadcasts_read_at=func.now()
+        ))
+    await db.execute(delete(notification.BroadcastNotificationRead).where(
+        notification.BroadcastNotificationRead.user_id == current_user.id
+    ))
+    
+    # Everything sent so far is now seen
+    await db.execute(update(UnreadCounter).where(
+        UnreadCounter.user_id == current_user.id
+    ).values(notifications=0, broadcasts_seen=UnreadCounter.broadcasts_sent))
     
-    db.commit()
+    await db.commit()
     
     return {"detail": "All notifications marked as read"}
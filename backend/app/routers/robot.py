@@ -1,91 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File, Form
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, List, Optional
 import uuid
 import os
-import shutil
-from pathlib import Path
 
+from ..config import settings
 from ..database import get_db
 from ..models.robot import Robot
-from ..models.user import User
-from ..schemas.robot import RobotCreate, RobotResponse, RobotUpdate
-from ..utils.auth import get_user_from_token
+from ..models.notification import BroadcastNotification
+from ..realtime import audience_rooms, emit
+from ..schemas.notification import NotificationResponse
+from ..schemas.robot import (
+    DownloadLink, RobotCreate, RobotFacets, RobotFileResponse, RobotResponse, RobotSort, RobotUpdate,
+    RobotUploadCreate, RobotUploadStatus,
+)
+from ..services.robot_catalog import CatalogFilters, etag_matches, robot_catalog, strong_etag
+from ..services.robot_downloads import can_download_robot, download_link, download_response
+from ..services.robot_files import StoredFile, check_extension, content_length, parse_content_range, robot_file_store
+from ..services.unread_counters import count_broadcast
+from ..utils.auth import AdminUser, CurrentUser
+from ..utils.pagination import Pagination
 
 router = APIRouter(prefix="/robots", tags=["robots"])
 
-# Ensure uploads directory exists
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+def catalog_response(request: Request, etag: str, body, headers: Optional[dict] = None) -> Response:
+    """200 with the cached body, or 304 when the client already has this ETag"""
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": settings.ROBOT_CATALOG_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body() if callable(body) else body, media_type="application/json", headers=headers)
+
+class RobotQueryParams:
+    """Marketplace filters and sort order, applied to the cached catalog"""
+
+    def __init__(
+        self,
+        category: Optional[str] = Query(None),
+        type: Optional[str] = Query(None),
+        currency: Optional[str] = Query(None),
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        features: List[str] = Query([], description="Robots must have every one of these features"),
+        q: Optional[str] = Query(None, max_length=200, description="Words to match in name, description and features"),
+        sort: RobotSort = Query(RobotSort.NEWEST),
+    ):
+        self.filters = CatalogFilters(
+            category=category,
+            type=type,
+            currency=currency,
+            min_price=min_price,
+            max_price=max_price,
+            features=features,
+            q=q,
+        )
+        self.sort = sort.value
+
+RobotQuery = Annotated[RobotQueryParams, Depends(RobotQueryParams)]
 
 @router.get("", response_model=List[RobotResponse])
-async def get_robots(db: Session = Depends(get_db)):
-    """Get all robots"""
-    robots = db.query(Robot).all()
-    return robots
+async def get_robots(page: Pagination, query: RobotQuery, db: AsyncSession = Depends(get_db)):
+    """Get robots, optionally filtered and sorted"""
+    # Served from the in-process catalog; the database is only read after a change
+    catalog = await robot_catalog.snapshot(db)
+    result = catalog.page(page.cursor, page.limit, query.filters, query.sort)
+
+    headers = {}
+    if result.next_cursor:
+        next_url = page.request.url.include_query_params(cursor=result.next_cursor, limit=page.limit)
+        headers["X-Next-Cursor"] = result.next_cursor
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return catalog_response(page.request, result.etag, lambda: result.body, headers)
+
+@router.get("/facets", response_model=RobotFacets)
+async def get_robot_facets(request: Request, query: RobotQuery, db: AsyncSession = Depends(get_db)):
+    """Get facet counts and the price range for the marketplace filters"""
+    catalog = await robot_catalog.snapshot(db)
+    etag = strong_etag(catalog.etag, "facets", query.filters.key())
+    return catalog_response(
+        request,
+        etag,
+        lambda: RobotFacets(**catalog.facets(query.filters)).model_dump_json().encode(),
+    )
 
 @router.get("/{robot_id}", response_model=RobotResponse)
-async def get_robot(robot_id: str, db: Session = Depends(get_db)):
+async def get_robot(robot_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """Get a specific robot by ID"""
-    robot = db.query(Robot).filter(Robot.id == robot_id).first()
-    if not robot:
+    catalog = await robot_catalog.snapshot(db)
+    cached = catalog.by_id.get(robot_id)
+    if not cached:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Robot not found"
         )
-    return robot
+    etag, body = cached
+    return catalog_response(request, etag, body)
 
 @router.post("", response_model=RobotResponse)
 async def create_robot(
     data: RobotCreate,
-    db: Session = Depends(get_db),
-    current_user_id: str = Depends(get_user_from_token)
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new robot (admin only)"""
-    # Get the current user
-    current_user = db.query(User).filter(User.id == current_user_id).first()
-    if not current_user or not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized"
-        )
-
     # Create the robot
     robot = Robot(
         id=str(uuid.uuid4()),
         name=data.name,
         description=data.description,
+        type=data.type,
         price=data.price,
+        currency=data.currency,
         category=data.category,
         features=data.features,
-        is_featured=data.is_featured,
-        image_url=data.image_url
+        image_url=data.image_url,
+        imageUrl=data.imageUrl,
+        download_url=data.download_url
     )
 
-    db.add(robot)
-    db.commit()
-    db.refresh(robot)
-
-    # Create notifications for all users
-    from ..models.notification import Notification
-    from ..models.user import User
-
-    # Get all users (non-admin)
-    users = db.query(User).filter(User.is_admin == False).all()
-
-    for user in users:
-        notification = Notification(
-            id=str(uuid.uuid4()),
-            user_id=user.id,
-            type='new_robot',
-            title=f"New robot available: {data.name}",
-            content=f"A new trading robot has been added to the marketplace: {data.description[:50]}...",
-            related_id=robot.id,
-            is_read=False
-        )
-        db.add(notification)
+    # Announce it to all non-admin users with a single broadcast row
+    announcement = BroadcastNotification(
+        audience="users",
+        title=f"New robot available: {data.name}",
+        message=f"A new trading robot has been added to the marketplace: {data.description[:50]}..."
+    )
 
-    db.commit()
+    db.add_all([robot, announcement])
+    await count_broadcast(db, announcement.audience)
+    await db.commit()
+    await db.refresh(robot)
+    await db.refresh(announcement)
+
+    await emit(
+        "notification",
+        NotificationResponse(
+            id=announcement.id,
+            title=announcement.title,
+            message=announcement.message,
+            created_at=announcement.created_at,
+            kind="broadcast"
+        ),
+        audience_rooms(announcement.audience)
+    )
 
     return robot
 
@@ -93,20 +149,12 @@ async def create_robot(
 async def update_robot(
     robot_id: str,
     robot: RobotUpdate,
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a robot (admin only)"""
-    # Check if user is admin
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or not user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to update robots"
-        )
-
     # Get the robot
-    db_robot = db.query(Robot).filter(Robot.id == robot_id).first()
+    db_robot = await db.scalar(select(Robot).where(Robot.id == robot_id))
     if not db_robot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -117,85 +165,159 @@ async def update_robot(
     for key, value in robot.dict(exclude_unset=True).items():
         setattr(db_robot, key, value)
 
-    db.commit()
-    db.refresh(db_robot)
+    await db.commit()
+    await db.refresh(db_robot)
 
     return db_robot
 
 @router.delete("/{robot_id}")
 async def delete_robot(
     robot_id: str,
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a robot (admin only)"""
-    # Check if user is admin
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or not user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to delete robots"
-        )
-
     # Get the robot
-    db_robot = db.query(Robot).filter(Robot.id == robot_id).first()
+    db_robot = await db.scalar(select(Robot).where(Robot.id == robot_id))
     if not db_robot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Robot not found"
         )
 
-    db.delete(db_robot)
-    db.commit()
+    await db.delete(db_robot)
+    await db.commit()
 
     return {"message": "Robot deleted successfully"}
 
-@router.post("/{robot_id}/upload")
+async def get_robot_or_404(db: AsyncSession, robot_id: str) -> Robot:
+    robot = await db.scalar(select(Robot).where(Robot.id == robot_id))
+    if not robot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Robot not found"
+        )
+    return robot
+
+async def attach_file(db: AsyncSession, robot: Robot, stored: StoredFile, filename: str) -> RobotFileResponse:
+    """Point a robot at a stored bundle"""
+    robot.file_name = filename
+    robot.file_sha256 = stored.sha256
+    robot.file_size = stored.size
+    robot.download_url = f"/uploads/{robot_file_store.relative_path(stored.sha256)}"
+    await db.commit()
+
+    return RobotFileResponse(
+        filename=filename,
+        download_url=robot.download_url,
+        sha256=stored.sha256,
+        size=stored.size,
+    )
+
+@router.post("/{robot_id}/upload", response_model=RobotFileResponse)
 async def upload_robot_file(
     robot_id: str,
+    admin_user: AdminUser,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Upload a robot file (admin only)"""
-    # Check if user is admin
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or not user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to upload robot files"
-        )
+    """Upload a robot file in one request (admin only)"""
+    db_robot = await get_robot_or_404(db, robot_id)
+    check_extension(file.filename)
 
-    # Get the robot
-    db_robot = db.query(Robot).filter(Robot.id == robot_id).first()
-    if not db_robot:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Robot not found"
-        )
+    async def chunks():
+        while chunk := await file.read(robot_file_store.chunk_size):
+            yield chunk
+
+    # Streamed and hashed off the event loop, stored once per distinct content
+    stored = await robot_file_store.save(chunks())
+    return await attach_file(db, db_robot, stored, file.filename)
+
+@router.post("/{robot_id}/uploads", response_model=RobotUploadStatus, status_code=status.HTTP_201_CREATED)
+async def create_robot_upload(
+    robot_id: str,
+    upload: RobotUploadCreate,
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
+):
+    """Start a resumable upload for a large robot file (admin only)"""
+    await get_robot_or_404(db, robot_id)
+    session = await robot_file_store.create_session(robot_id, upload.filename, upload.size)
+    return RobotUploadStatus(**session, chunk_size=robot_file_store.chunk_size)
+
+@router.get("/{robot_id}/uploads/{upload_id}", response_model=RobotUploadStatus)
+async def get_robot_upload(robot_id: str, upload_id: str, admin_user: AdminUser):
+    """Get how many bytes of a resumable upload have arrived (admin only)"""
+    session = await robot_file_store.get_session(robot_id, upload_id)
+    return RobotUploadStatus(**session, chunk_size=robot_file_store.chunk_size)
 
-    # Check file extension
-    file_extension = file.filename.split('.')[-1].lower()
-    if file_extension not in ['zip', 'xml']:
+@router.put("/{robot_id}/uploads/{upload_id}", response_model=RobotUploadStatus)
+async def put_robot_upload_range(
+    robot_id: str,
+    upload_id: str,
+    request: Request,
+    admin_user: AdminUser,
+):
+    """
+    Append a byte range to a resumable upload (admin only).
+
+    The raw request body is the range; Content-Range gives its start, which
+    must be the current offset. A Content-Length past the declared upload
+    size is refused before the body is read.
+    """
+    start = parse_content_range(request.headers.get("content-range"))
+    session = await robot_file_store.append(
+        robot_id, upload_id, start, request.stream(), length=content_length(request)
+    )
+    return RobotUploadStatus(**session, chunk_size=robot_file_store.chunk_size)
+
+@router.post("/{robot_id}/uploads/{upload_id}/complete", response_model=RobotFileResponse)
+async def complete_robot_upload(
+    robot_id: str,
+    upload_id: str,
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
+):
+    """Finish a resumable upload and attach the file to the robot (admin only)"""
+    db_robot = await get_robot_or_404(db, robot_id)
+    stored, filename = await robot_file_store.complete(robot_id, upload_id)
+    return await attach_file(db, db_robot, stored, filename)
+
+@router.delete("/{robot_id}/uploads/{upload_id}")
+async def abort_robot_upload(robot_id: str, upload_id: str, admin_user: AdminUser):
+    """Abandon a resumable upload (admin only)"""
+    await robot_file_store.abort(robot_id, upload_id)
+    return {"message": "Upload aborted"}
+
+async def entitled_robot(db: AsyncSession, user, robot_id: str) -> Robot:
+    robot = await get_robot_or_404(db, robot_id)
+    if not await can_download_robot(db, user, robot):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Only ZIP and XML files are allowed"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Purchase this robot to download it"
         )
+    return robot
 
-    # Create a unique filename
-    unique_filename = f"{robot_id}_{file.filename}"
-    file_path = UPLOAD_DIR / unique_filename
-
-    # Save the file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+def robot_filename(robot: Robot) -> str:
+    return robot.file_name or (robot.download_url or "").rsplit("/", 1)[-1] or f"{robot.name}.zip"
 
-    # Update robot with download URL
-    download_url = f"/uploads/{unique_filename}"
-    db_robot.download_url = download_url
-    db.commit()
+@router.get("/{robot_id}/download")
+async def download_robot(
+    robot_id: str,
+    request: Request,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
+):
+    """Download a robot's file (admins, free robots and buyers)"""
+    robot = await entitled_robot(db, current_user, robot_id)
+    return download_response(request, robot.download_url, robot_filename(robot))
 
-    return {
-        "filename": file.filename,
-        "download_url": download_url
-    }
\ No newline at end of file
+@router.get("/{robot_id}/download-url", response_model=DownloadLink)
+async def get_robot_download_url(
+    robot_id: str,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a short-lived signed URL for a robot's file; using it needs no further checks"""
+    robot = await entitled_robot(db, current_user, robot_id)
+    return download_link(robot.download_url, robot_filename(robot))
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Body
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 import uuid
@@ -7,44 +8,31 @@ import uuid
 from ..database import get_db
 from ..models.robot_request import RobotRequest
 from ..models.user import User
-from ..models.notification import Notification # Added import for Notification model
+from ..models.notification import Notification
+from ..realtime import ADMINS_ROOM, emit_to_users
+from ..schemas.notification import NotificationResponse
+from ..schemas.robot import DownloadLink
 from ..schemas.robot_request import RobotRequestCreate, RobotRequestResponse, RobotRequestUpdate, RobotRequestStatusUpdate # Added import for RobotRequestStatusUpdate
-from ..utils.auth import get_user_from_token
+from ..services.notification_fanout import notification_fanout
+from ..services.robot_downloads import can_download_request, download_link, download_response
+from ..services.unread_counters import adjust_unread
+from ..utils.auth import AdminUser, CurrentUser
+from ..utils.pagination import Pagination, paginate
 
 router = APIRouter(prefix="/robot-requests", tags=["robot-requests"])
 
 @router.post("", response_model=RobotRequestResponse)
 async def create_robot_request(
     request: RobotRequestCreate,
-    db: Session = Depends(get_db),
-    current_user_id: str = Depends(get_user_from_token)
+    user: CurrentUser,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new robot request"""
-    if not current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-
-    # Verify that the user exists
-    if not current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-
-    # Verify that the user exists - compare with string ID
-    user = db.query(User).filter(User.id == str(current_user_id)).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-
     # Create the robot request with all fields
     new_request = RobotRequest(
         id=str(uuid.uuid4()),
-        user_id=current_user_id,
+        user_id=user.id,
         robot_type=request.robot_type,
         trading_pairs=request.trading_pairs,
         timeframe=request.timeframe,
@@ -79,69 +67,46 @@ async def create_robot_request(
     user.has_requested_robot = True
 
     db.add(new_request)
-    db.commit()
-    db.refresh(new_request)
+    await db.commit()
+    await db.refresh(new_request)
 
     # Create notifications for admins
     user_name = user.name if user and user.name else user.email if user else "User"
 
-    # Send notification to all admins
-    admins = db.query(User).filter(User.is_admin == True).all()
-    for admin in admins:
-        notification = Notification(
-            id=str(uuid.uuid4()),
-            user_id=admin.id,
-            type='robot_request',
-            title=f"New robot request from {user_name}",
-            content=f"Request type: {request.robot_type}\nDescription: {request.description[:50]}...", # Using request.description for better content
-            related_id=new_request.id,
-            is_read=False
-        )
-        db.add(notification)
-
-    db.commit()
+    # Send notification to all admins in the background
+    title = f"New robot request from {user_name}"
+    job = notification_fanout.create_job(title)
+    background_tasks.add_task(
+        notification_fanout.run,
+        job,
+        select(User.id).where(User.is_admin == True),
+        title,
+        f"Request type: {request.robot_type}\nTrading pairs: {request.trading_pairs}\nTimeframe: {request.timeframe}",
+        [ADMINS_ROOM],
+    )
 
     return new_request
 
 @router.get("", response_model=List[RobotRequestResponse])
 async def get_all_robot_requests(
-    db: Session = Depends(get_db),
-    current_user_id: str = Depends(get_user_from_token)
+    admin_user: AdminUser,
+    page: Pagination,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all robot requests (admin only)"""
-    if not current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-
-    # Check if the user is an admin
-    current_user = db.query(User).filter(User.id == current_user_id).first()
-    if not current_user or not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-
     # Get all requests
-    requests = db.query(RobotRequest).all()
+    requests = await paginate(db, select(RobotRequest), RobotRequest, page)
     return requests
 
 @router.get("/{request_id}", response_model=RobotRequestResponse)
 async def get_robot_request(
     request_id: str,
-    db: Session = Depends(get_db),
-    current_user_id: str = Depends(get_user_from_token)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific robot request"""
-    if not current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-
     # Get the request
-    request = db.query(RobotRequest).filter(RobotRequest.id == request_id).first()
+    request = await db.scalar(select(RobotRequest).where(RobotRequest.id == request_id))
     if not request:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -149,8 +114,7 @@ async def get_robot_request(
         )
 
     # Check if the user is the owner or an admin
-    current_user = db.query(User).filter(User.id == current_user_id).first()
-    if current_user_id != request.user_id and not current_user.is_admin:
+    if current_user.id != request.user_id and not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view this request"
@@ -162,26 +126,12 @@ async def get_robot_request(
 async def update_robot_request(
     request_id: str,
     updates: RobotRequestUpdate,
-    db: Session = Depends(get_db),
-    current_user_id: str = Depends(get_user_from_token)
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a robot request (admin only)"""
-    if not current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-
-    # Check if the user is an admin
-    current_user = db.query(User).filter(User.id == current_user_id).first()
-    if not current_user or not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-
     # Get the request
-    request = db.query(RobotRequest).filter(RobotRequest.id == request_id).first()
+    request = await db.scalar(select(RobotRequest).where(RobotRequest.id == request_id))
     if not request:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -199,7 +149,7 @@ async def update_robot_request(
             request.progress = 100
 
             # Update user's robots_delivered status
-            user = db.query(User).filter(User.id == request.user_id).first()
+            user = await db.get(User, request.user_id)
             if user:
                 user.robots_delivered = True
 
@@ -212,23 +162,64 @@ async def update_robot_request(
     if updates.progress is not None:
         request.progress = updates.progress
 
-    db.commit()
-    db.refresh(request)
+    await db.commit()
+    await db.refresh(request)
 
     # Create notification for the user about status change
-    user = db.query(User).filter(User.id == request.user_id).first()
+    user = await db.get(User, request.user_id)
     if user:
         notification = Notification(
             id=str(uuid.uuid4()),
             user_id=user.id,
-            type='robot_request_update',
             title=f"Robot request '{request.bot_name if request.bot_name else request.id}' updated",
-            content=f"Status changed to: {request.status}" + (f"\nAdmin notes: {updates.notes}" if updates.notes else ""),
-            related_id=request_id,
+            message=f"Status changed to: {request.status}" + (f"\nAdmin notes: {updates.notes}" if updates.notes else ""),
             is_read=False
         )
         db.add(notification)
-        db.commit()
+        await adjust_unread(db, user.id, notifications=1)
+        await db.commit()
+        await db.refresh(notification)
+
+        await emit_to_users("notification", NotificationResponse.model_validate(notification), [user.id])
+
+    await emit_to_users("robot_request_update", RobotRequestResponse.model_validate(request), [request.user_id])
+
+    return request
+
+async def deliverable_request(db: AsyncSession, user: User, request_id: str) -> RobotRequest:
+    request = await db.scalar(select(RobotRequest).where(RobotRequest.id == request_id))
+    if not request:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Robot request not found"
+        )
+    if not can_download_request(user, request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This robot has not been delivered yet"
+        )
+    return request
+
+def request_filename(request: RobotRequest) -> str:
+    return (request.download_url or "").rsplit("/", 1)[-1] or f"{request.bot_name or request.id}.zip"
 
+@router.get("/{request_id}/download")
+async def download_robot_request(
+    request_id: str,
+    http_request: Request,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
+):
+    """Download the robot delivered for a request (owner once delivered, or admin)"""
+    request = await deliverable_request(db, current_user, request_id)
+    return download_response(http_request, request.download_url, request_filename(request))
 
-    return request
\ No newline at end of file
+@router.get("/{request_id}/download-url", response_model=DownloadLink)
+async def get_robot_request_download_url(
+    request_id: str,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a short-lived signed URL for a delivered robot; using it needs no further checks"""
+    request = await deliverable_request(db, current_user, request_id)
+    return download_link(request.download_url, request_filename(request))
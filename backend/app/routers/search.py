@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from ..database import get_db
+from ..models.chat import Conversation, Message
+from ..models.robot_request import RobotRequest
+from ..schemas.chat import MessageResponse
+from ..schemas.robot_request import RobotRequestResponse
+from ..schemas.search import MessageSearchResult, RobotRequestSearchResult
+from ..services.search import message_index, robot_request_index
+from ..utils.auth import CurrentUser
+from ..utils.pagination import Search
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/messages", response_model=List[MessageSearchResult])
+async def search_messages(
+    current_user: CurrentUser,
+    search: Search,
+    conversation_id: Optional[str] = Query(None, description="Only search this conversation"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search chat messages, best match first (admins search every conversation)"""
+    filters = []
+    if conversation_id:
+        filters.append(Message.conversation_id == conversation_id)
+    if not current_user.is_admin:
+        filters.append(Message.conversation_id.in_(
+            select(Conversation.id).where(Conversation.user_id == current_user.id)
+        ))
+
+    rows = await message_index.search(db, search, *filters)
+    return [
+        MessageSearchResult(**MessageResponse.model_validate(message).model_dump(), rank=rank, snippet=snippet)
+        for message, rank, snippet in rows
+    ]
+
+@router.get("/robot-requests", response_model=List[RobotRequestSearchResult])
+async def search_robot_requests(
+    current_user: CurrentUser,
+    search: Search,
+    status: Optional[str] = Query(None, description="Only requests with this status"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search robot requests, best match first (admins search every request)"""
+    filters = []
+    if status:
+        filters.append(RobotRequest.status == status)
+    if not current_user.is_admin:
+        filters.append(RobotRequest.user_id == current_user.id)
+
+    rows = await robot_request_index.search(db, search, *filters)
+    return [
+        RobotRequestSearchResult(**RobotRequestResponse.model_validate(request).model_dump(), rank=rank, snippet=snippet)
+        for request, rank, snippet in rows
+    ]
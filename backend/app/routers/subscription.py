@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta
@@ -8,7 +9,8 @@ from ..database import get_db
 from ..models.user import User
 from ..models.subscription import Subscription, SubscriptionPlan
 from ..models.robot import Robot # Assuming a Robot model exists
-from ..utils.auth import get_user_from_token, get_admin_user
+from ..utils.auth import AdminUser, CurrentUser
+from ..utils.pagination import Pagination, paginate
 from ..schemas.subscription import (
     SubscriptionPlanCreate, 
     SubscriptionPlanResponse, 
@@ -29,8 +31,8 @@ router = APIRouter(prefix="/subscription", tags=["subscription"]) # Removed the
 @router.post("/plans", response_model=SubscriptionPlanResponse)
 async def create_subscription_plan(
     plan: SubscriptionPlanCreate,
-    db: Session = Depends(get_db),
-    admin_user: User = Depends(get_admin_user)
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new subscription plan (admin only)"""
     new_plan = SubscriptionPlan(
@@ -43,20 +45,20 @@ async def create_subscription_plan(
         features=plan.features
     )
     db.add(new_plan)
-    db.commit()
-    db.refresh(new_plan)
+    await db.commit()
+    await db.refresh(new_plan)
     return new_plan
 
 @router.get("/plans", response_model=List[SubscriptionPlanResponse])
-async def get_subscription_plans(db: Session = Depends(get_db)):
+async def get_subscription_plans(db: AsyncSession = Depends(get_db)):
     """Get all subscription plans (public)"""
-    plans = db.query(SubscriptionPlan).all()
+    plans = (await db.scalars(select(SubscriptionPlan))).all()
     return plans
 
 @router.get("/plans/{plan_id}", response_model=SubscriptionPlanResponse)
-async def get_subscription_plan(plan_id: str, db: Session = Depends(get_db)):
+async def get_subscription_plan(plan_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific subscription plan by ID (public)"""
-    plan = db.query(SubscriptionPlan).filter(SubscriptionPlan.id == plan_id).first()
+    plan = await db.scalar(select(SubscriptionPlan).where(SubscriptionPlan.id == plan_id))
     if not plan:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -68,11 +70,11 @@ async def get_subscription_plan(plan_id: str, db: Session = Depends(get_db)):
 async def update_subscription_plan(
     plan_id: str,
     plan_update: SubscriptionPlanUpdate,
-    db: Session = Depends(get_db),
-    admin_user: User = Depends(get_admin_user)
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a subscription plan (admin only)"""
-    plan = db.query(SubscriptionPlan).filter(SubscriptionPlan.id == plan_id).first()
+    plan = await db.scalar(select(SubscriptionPlan).where(SubscriptionPlan.id == plan_id))
     if not plan:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -84,38 +86,38 @@ async def update_subscription_plan(
     for key, value in update_data.items():
         setattr(plan, key, value)
 
-    db.commit()
-    db.refresh(plan)
+    await db.commit()
+    await db.refresh(plan)
     return plan
 
 @router.delete("/plans/{plan_id}")
 async def delete_subscription_plan(
     plan_id: str,
-    db: Session = Depends(get_db),
-    admin_user: User = Depends(get_admin_user)
+    admin_user: AdminUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a subscription plan (admin only)"""
-    plan = db.query(SubscriptionPlan).filter(SubscriptionPlan.id == plan_id).first()
+    plan = await db.scalar(select(SubscriptionPlan).where(SubscriptionPlan.id == plan_id))
     if not plan:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Subscription plan not found"
         )
 
-    db.delete(plan)
-    db.commit()
+    await db.delete(plan)
+    await db.commit()
     return {"message": "Subscription plan deleted successfully"}
 
 # User subscriptions endpoints
 @router.post("/subscribe", response_model=SubscriptionResponse)
 async def create_subscription(
     subscription: SubscriptionCreate,
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new subscription for the authenticated user"""
     # Verify the plan exists
-    plan = db.query(SubscriptionPlan).filter(SubscriptionPlan.id == subscription.plan_id).first()
+    plan = await db.scalar(select(SubscriptionPlan).where(SubscriptionPlan.id == subscription.plan_id))
     if not plan:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -131,24 +133,24 @@ async def create_subscription(
         end_date = start_date + timedelta(days=365)
 
     # Check if user already has an active subscription for this plan
-    existing_sub = db.query(Subscription).filter(
-        Subscription.user_id == user_id,
+    existing_sub = await db.scalar(select(Subscription).where(
+        Subscription.user_id == current_user.id,
         Subscription.plan_id == subscription.plan_id,
         Subscription.is_active == True
-    ).first()
+    ))
 
     if existing_sub:
         # Extend the existing subscription
         existing_sub.end_date = end_date if existing_sub.end_date else (datetime.utcnow() + timedelta(days=30))
         existing_sub.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(existing_sub)
+        await db.commit()
+        await db.refresh(existing_sub)
         return existing_sub
 
     # Create new subscription
     new_subscription = Subscription(
         id=str(uuid.uuid4()),
-        user_id=user_id,
+        user_id=current_user.id,
         plan_id=subscription.plan_id,
         amount=subscription.amount,
         currency=subscription.currency,
@@ -160,68 +162,60 @@ async def create_subscription(
     )
 
     db.add(new_subscription)
-    db.commit()
-    db.refresh(new_subscription)
+    await db.commit()
+    await db.refresh(new_subscription)
     return new_subscription
 
 @router.get("/user/subscriptions", response_model=List[SubscriptionResponse])
 async def get_user_subscriptions(
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    current_user: CurrentUser,
+    page: Pagination,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all subscriptions for the authenticated user"""
-    subscriptions = db.query(Subscription).filter(Subscription.user_id == user_id).all()
+    subscriptions = await paginate(db, select(Subscription).where(Subscription.user_id == current_user.id), Subscription, page)
     return subscriptions
 
 @router.get("/user/active", response_model=List[SubscriptionResponse])
 async def get_active_subscriptions(
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get active subscriptions for the authenticated user"""
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-        
-    active_subs = db.query(Subscription).filter(
-        Subscription.user_id == str(user_id),
+    active_subs = (await db.scalars(select(Subscription).where(
+        Subscription.user_id == current_user.id,
         Subscription.is_active == True,
         Subscription.end_date > datetime.utcnow()
-    ).all()
+    ))).all()
     return active_subs
 
 @router.get("/check/{plan_id}")
 async def check_subscription(
     plan_id: str,
-    db: Session = Depends(get_db),
-    user_id: Optional[str] = Depends(get_user_from_token)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Check if the authenticated user has an active subscription for a specific plan"""
-    if not user_id:
-        return {"has_subscription": False}
-
-    active_sub = db.query(Subscription).filter(
-        Subscription.user_id == str(user_id),
+    active_sub = await db.scalar(select(Subscription).where(
+        Subscription.user_id == current_user.id,
         Subscription.plan_id == str(plan_id),
         Subscription.is_active == True,
         Subscription.end_date > datetime.utcnow()
-    ).first()
+    ))
 
     return {"has_subscription": active_sub is not None}
 
 @router.put("/cancel/{subscription_id}")
 async def cancel_subscription(
     subscription_id: str,
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_from_token)
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db)
 ):
     """Cancel a subscription for the authenticated user"""
-    subscription = db.query(Subscription).filter(
+    subscription = await db.scalar(select(Subscription).where(
         Subscription.id == subscription_id,
-        Subscription.user_id == user_id
-    ).first()
+        Subscription.user_id == current_user.id
+    ))
 
     if not subscription:
         raise HTTPException(
@@ -233,18 +227,18 @@ async def cancel_subscription(
     subscription.status = "cancelled"
     subscription.updated_at = datetime.utcnow()
 
-    db.commit()
+    await db.commit()
 
     return {"message": "Subscription cancelled successfully"}
 
 
 # Robot Request Endpoints
 @router.post("/robots", response_model=dict) # Using dict response for this example endpoint
-async def create_robot_request(robot_request: RobotRequestResponse, db: Session = Depends(get_db), user_id: str = Depends(get_user_from_token)):
+async def create_robot_request(robot_request: RobotRequestResponse, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
     # Add logic to create a robot request associated with the user.  This requires additional model and schema definitions.
     pass # Placeholder - needs implementation
 
 @router.get("/robots", response_model=List[dict]) # Using dict response for this example endpoint
-async def get_user_robots(db: Session = Depends(get_db), user_id: str = Depends(get_user_from_token)):
+async def get_user_robots(current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
     # Add logic to retrieve robots for the user.  This needs to consider the relationship between users and robots in the database.
     pass # Placeholder - needs implementation
\ No newline at end of file
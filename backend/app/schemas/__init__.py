@@ -6,3 +6,4 @@ from . import purchase
 from . import subscription
 from . import chat
 from . import notification
+from . import search
@@ -28,7 +28,27 @@ class ConversationCreate(ConversationBase):
 class ConversationResponse(ConversationBase):
     id: str
     created_at: datetime
-    messages: Optional[List[MessageResponse]] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ConversationSummary(ConversationResponse):
+    # Full history is served by the paginated messages endpoint
+    last_message: Optional[str] = None
+    last_message_time: Optional[datetime] = None
+    last_message_sender_id: Optional[str] = None
+    message_count: int = 0
+    unread_count: int = 0
+
+class ConversationReadRequest(BaseModel):
+    # Mark everything up to and including this message (or time); all when neither is given
+    up_to_message_id: Optional[str] = None
+    up_to: Optional[datetime] = None
+
+class ConversationReadResponse(BaseModel):
+    conversation_id: str
+    reader_id: str
+    read_count: int
+    up_to_message_id: Optional[str] = None
+    up_to: Optional[datetime] = None
+    read_at: datetime
@@ -1,21 +1,27 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 from uuid import UUID
 
 class NotificationBase(BaseModel):
     user_id: str
     title: str
-    content: str
+    message: str
     is_read: bool = False
-    notification_type: str = "general"  # general, alert, message, system
 
 class NotificationCreate(NotificationBase):
     pass
 
 class NotificationResponse(NotificationBase):
     id: str
+    user_id: Optional[str] = None  # None for broadcasts
     created_at: datetime
+    kind: str = "personal"  # personal, broadcast
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BroadcastNotificationCreate(BaseModel):
+    title: str
+    message: str
+    audience: Literal["all", "users", "admins"] = "all"
@@ -1,7 +1,8 @@
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
+from enum import Enum
 
 class RobotBase(BaseModel):
     name: str
@@ -23,9 +24,57 @@ class RobotUpdate(RobotBase):
 
 class RobotResponse(RobotBase):
     id: str
-    created_at: datetime
+    file_name: Optional[str] = None
+    file_sha256: Optional[str] = None
+    file_size: Optional[int] = None
+    created_at: Optional[datetime] = None  # The column is nullable
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class RobotFileResponse(BaseModel):
+    filename: str
+    download_url: str
+    sha256: str
+    size: int
+
+class DownloadLink(BaseModel):
+    url: str
+    expires_at: Optional[int] = None  # Unix time; None for external links
+
+class RobotUploadCreate(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0)
+
+class RobotUploadStatus(BaseModel):
+    # PUT the next range starting at `offset` until it reaches `size`, then complete
+    upload_id: str
+    filename: str
+    size: int
+    offset: int
+    chunk_size: int
+
+class RobotSort(str, Enum):
+    NEWEST = "newest"
+    OLDEST = "oldest"
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+    NAME = "name"
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceRange(BaseModel):
+    min: float
+    max: float
+
+class RobotFacets(BaseModel):
+    # Each facet is counted with all the other filters applied
+    total: int
+    price: Optional[PriceRange] = None
+    category: List[FacetCount] = []
+    type: List[FacetCount] = []
+    currency: List[FacetCount] = []
+    features: List[FacetCount] = []
@@ -0,0 +1,12 @@
+from typing import Optional
+
+from .chat import MessageResponse
+from .robot_request import RobotRequestResponse
+
+class MessageSearchResult(MessageResponse):
+    rank: float
+    snippet: Optional[str] = None  # Matching fragment with <mark> around the hits
+
+class RobotRequestSearchResult(RobotRequestResponse):
+    rank: float
+    snippet: Optional[str] = None  # Matching fragment with <mark> around the hits
@@ -1,20 +1,27 @@
 
-import requests
+import asyncio
 import base64
 import datetime
+import time
+from typing import Optional
+import httpx
 from app.config import settings
+from app.services.provider_client import ProviderClient, ProviderError
 import json
 
-def generate_access_token():
+# Pooled, retrying client shared by every M-Pesa call
+mpesa_client = ProviderClient("mpesa", settings.M_PESA_API_URL)
+
+async def fetch_access_token() -> tuple:
     """
-    Generates an OAuth access token for M-Pesa API calls.
-    
+    Request a new OAuth access token from Daraja.
+
     Returns:
-        str: The access token string.
+        (access_token, expires_in seconds), or (None, 0) on failure.
     """
     consumer_key = settings.M_PESA_CONSUMER_KEY
     consumer_secret = settings.M_PESA_CONSUMER_SECRET
-    api_url = f"{settings.M_PESA_API_URL}/oauth/v1/generate?grant_type=client_credentials"
+    api_url = "/oauth/v1/generate?grant_type=client_credentials"
     
     # Create auth string
     auth_string = f"{consumer_key}:{consumer_secret}"
@@ -27,15 +34,130 @@ def generate_access_token():
     }
     
     try:
-        response = requests.get(api_url, headers=headers)
+        response = await mpesa_client.get(api_url, headers=headers)
         response.raise_for_status()
         result = response.json()
-        return result.get("access_token")
+        # Daraja sends expires_in as a string, e.g. "3599"
+        return result.get("access_token"), int(result.get("expires_in") or settings.MPESA_TOKEN_DEFAULT_TTL_SECONDS)
     except Exception as e:
         print(f"Error generating access token: {str(e)}")
-        return None
+        return None, 0
+
+class AccessTokenCache:
+    """
+    Process-wide cache of the Daraja access token.
+
+    The token is reused until it expires (per `expires_in`). Once less than
+    `refresh_margin` seconds remain, callers keep getting the current token
+    while one background task fetches the next. When there is no usable
+    token, concurrent callers await a single fetch instead of each
+    requesting their own.
+
+    A failed fetch starts a cooldown of `retry_after` seconds with no new
+    fetches: the current token is served while it is still valid, and
+    without one callers get None at once instead of hammering Daraja.
+    """
+
+    def __init__(self, fetch, refresh_margin_seconds: int, retry_after_seconds: int = 0):
+        self.fetch = fetch
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._retry_after = 0.0  # No fetch before this (monotonic), after a failure
+        self._inflight: Optional[asyncio.Task] = None  # The one fetch in progress
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.cooled_down = 0
+
+    def _valid(self, now: float) -> bool:
+        return self._token is not None and now < self._expires_at
+
+    async def _store(self) -> Optional[str]:
+        token, expires_in = await self.fetch()
+        if token:
+            self._token = token
+            self._expires_at = time.monotonic() + expires_in
+            self._retry_after = 0.0
+            self.refreshes += 1
+        else:
+            self._retry_after = time.monotonic() + self.retry_after_seconds
+            self.failures += 1
+        return token
+
+    def _refresh(self) -> asyncio.Task:
+        """Start a fetch, or join the one already running"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._store())
+        return self._inflight
+
+    async def get(self) -> Optional[str]:
+        now = time.monotonic()
+        if self._valid(now):
+            self.hits += 1
+            if self._expires_at - now < self.refresh_margin_seconds and now >= self._retry_after:
+                self._refresh()
+            return self._token
+
+        self.misses += 1
+        if now < self._retry_after and (self._inflight is None or self._inflight.done()):
+            self.cooled_down += 1
+            return None
+        # Shielded so one caller's cancellation does not cancel the shared fetch
+        return await asyncio.shield(self._refresh())
+
+    def invalidate(self):
+        """Drop the token, e.g. after Daraja rejects it with 401"""
+        self._token = None
+        self._expires_at = 0.0
+
+    def stats(self) -> dict:
+        remaining = self._expires_at - time.monotonic()
+        return {
+            "has_token": self._token is not None,
+            "expires_in_seconds": round(remaining, 1) if self._token else None,
+            "refresh_margin_seconds": self.refresh_margin_seconds,
+            "retry_in_seconds": round(max(self._retry_after - time.monotonic(), 0.0), 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "cooled_down": self.cooled_down,
+        }
 
-def initiate_stk_push(phone_number: str, amount: float, description: str):
+access_token_cache = AccessTokenCache(
+    fetch_access_token,
+    settings.MPESA_TOKEN_REFRESH_MARGIN_SECONDS,
+    settings.MPESA_TOKEN_RETRY_AFTER_SECONDS,
+)
+
+async def generate_access_token():
+    """
+    Returns an OAuth access token for M-Pesa API calls, from the process-wide cache.
+    
+    Returns:
+        str: The access token string.
+    """
+    return await access_token_cache.get()
+
+async def post_with_token(url: str, payload: dict, idempotent: bool = False):
+    """POST to Daraja, fetching a new token once if the cached one is rejected"""
+    for attempt in range(2):
+        access_token = await generate_access_token()
+        if not access_token:
+            raise Exception("Failed to generate M-Pesa access token")
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+        response = await mpesa_client.post(url, json=payload, headers=headers, idempotent=idempotent)
+        if response.status_code != 401 or attempt:
+            return response
+        access_token_cache.invalidate()
+
+async def initiate_stk_push(phone_number: str, amount: float, description: str):
     """
     Initiates an STK push for M-Pesa payment using the Lipa na M-Pesa Online service.
 
@@ -47,10 +169,6 @@ def initiate_stk_push(phone_number: str, amount: float, description: str):
     Returns:
         dict: The response from the M-Pesa API as a JSON object.
     """
-    access_token = generate_access_token()
-    if not access_token:
-        raise Exception("Failed to generate M-Pesa access token")
-    
     # Format timestamp
     timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
     
@@ -67,12 +185,7 @@ def initiate_stk_push(phone_number: str, amount: float, description: str):
     password = base64.b64encode(password_string.encode()).decode('utf-8')
     
     # Prepare STK Push request
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    stk_url = f"{settings.M_PESA_API_URL}/mpesa/stkpush/v1/processrequest"
+    stk_url = "/mpesa/stkpush/v1/processrequest"
     
     payload = {
         "BusinessShortCode": shortcode,
@@ -89,16 +202,17 @@ def initiate_stk_push(phone_number: str, amount: float, description: str):
     }
     
     try:
-        response = requests.post(stk_url, json=payload, headers=headers)
+        # Not retried once sent: a repeated STK push would prompt the customer twice
+        response = await post_with_token(stk_url, payload)
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ProviderError) as e:
         print(f"STK Push request failed: {str(e)}")
-        if hasattr(e.response, 'text'):
+        if isinstance(e, httpx.HTTPStatusError):
             print(f"Response: {e.response.text}")
         raise Exception(f"Failed to initiate M-Pesa payment: {str(e)}")
 
-def verify_stk_push(checkout_request_id: str):
+async def verify_stk_push(checkout_request_id: str):
     """
     Verifies the status of an STK push transaction.
     
@@ -108,10 +222,6 @@ def verify_stk_push(checkout_request_id: str):
     Returns:
         dict: The response from the M-Pesa API with transaction status.
     """
-    access_token = generate_access_token()
-    if not access_token:
-        raise Exception("Failed to generate M-Pesa access token")
-    
     # Format timestamp
     timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
     
@@ -122,12 +232,7 @@ def verify_stk_push(checkout_request_id: str):
     password = base64.b64encode(password_string.encode()).decode('utf-8')
     
     # Prepare query request
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    query_url = f"{settings.M_PESA_API_URL}/mpesa/stkpushquery/v1/query"
+    query_url = "/mpesa/stkpushquery/v1/query"
     
     payload = {
         "BusinessShortCode": shortcode,
@@ -137,7 +242,7 @@ def verify_stk_push(checkout_request_id: str):
     }
     
     try:
-        response = requests.post(query_url, json=payload, headers=headers)
+        response = await post_with_token(query_url, payload, idempotent=True)
         response.raise_for_status()
         result = response.json()
         
@@ -146,8 +251,8 @@ def verify_stk_push(checkout_request_id: str):
             "success": result.get("ResultCode") == "0",
             "response": result
         }
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ProviderError) as e:
         print(f"STK Query request failed: {str(e)}")
-        if hasattr(e.response, 'text'):
+        if isinstance(e, httpx.HTTPStatusError):
             print(f"Response: {e.response.text}")
         raise Exception(f"Failed to verify M-Pesa payment: {str(e)}")
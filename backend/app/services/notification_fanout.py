@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import Select, func, insert, select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.notification import Notification
+from app.models.user import User
+from app.realtime import emit, emit_to_users
+from app.schemas.notification import NotificationResponse
+from app.services.unread_counters import adjust_unread
+
+logger = logging.getLogger(__name__)
+
+# User rooms per push when there is no audience room, so one relayed
+# message stays under the Postgres NOTIFY payload limit
+ROOMS_PER_EMIT = 100
+
+class FanoutJob:
+    """Progress of one notification fan-out"""
+
+    def __init__(self, title: str):
+        self.id = str(uuid.uuid4())
+        self.title = title
+        self.status = "queued"  # queued, running, completed, failed
+        self.total = 0
+        self.written = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.duration_ms: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "status": self.status,
+            "total": self.total,
+            "written": self.written,
+            "progress": round(self.written / self.total, 4) if self.total else (1.0 if self.status == "completed" else 0.0),
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "duration_ms": self.duration_ms,
+        }
+
+class NotificationFanout:
+    """
+    Write one notification per recipient outside the request.
+
+    Recipients are read in keyset chunks by user id and each chunk is
+    written with a single multi-row INSERT in its own short transaction, so
+    no request (or long transaction) waits on the whole audience.
+    """
+
+    def __init__(self, chunk_size: int, max_jobs: int = 100):
+        self.chunk_size = chunk_size
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict = OrderedDict()
+
+    def create_job(self, title: str) -> FanoutJob:
+        """Register a job so its id can be returned before it runs"""
+        job = FanoutJob(title)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[FanoutJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        """Recent jobs, newest first"""
+        return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    async def run(
+        self,
+        job: FanoutJob,
+        recipients: Select,
+        title: str,
+        message: str,
+        rooms: Optional[Iterable[str]] = None,
+    ):
+        """
+        Notify every user selected by `recipients`.
+
+        Every recipient gets the same push, so it is sent once rather than
+        per row: to `rooms` when the recipients are exactly their members
+        (e.g. ADMINS_ROOM), otherwise to each chunk's user rooms a hundred
+        at a time. Clients reload their notifications when it arrives.
+
+        Args:
+            job: The job returned by create_job.
+            recipients: A select of User.id with any filters applied.
+            title: Notification title.
+            message: Notification body.
+            rooms: Socket.IO rooms holding exactly the recipients, if any.
+        """
+        job.status = "running"
+        started = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                job.total = await db.scalar(
+                    select(func.count()).select_from(recipients.subquery())
+                )
+
+                now = datetime.utcnow()
+                # One payload for everyone; each recipient's row has its own id
+                push = NotificationResponse(id=job.id, title=title, message=message, created_at=now)
+
+                last_id = None
+                while True:
+                    chunk = recipients.order_by(User.id).limit(self.chunk_size)
+                    if last_id is not None:
+                        chunk = chunk.where(User.id > last_id)
+                    user_ids = (await db.scalars(chunk)).all()
+                    if not user_ids:
+                        break
+
+                    rows = [
+                        {
+                            "id": str(uuid.uuid4()),
+                            "user_id": user_id,
+                            "title": title,
+                            "message": message,
+                            "is_read": False,
+                            "created_at": now,
+                        }
+                        for user_id in user_ids
+                    ]
+                    await db.execute(insert(Notification), rows)
+                    await adjust_unread(db, user_ids, notifications=1)
+                    await db.commit()
+
+                    if rooms is None:
+                        for start in range(0, len(user_ids), ROOMS_PER_EMIT):
+                            await emit_to_users("notification", push, user_ids[start:start + ROOMS_PER_EMIT])
+
+                    job.written += len(user_ids)
+                    last_id = user_ids[-1]
+                    # Let request handlers run between chunks
+                    await asyncio.sleep(0)
+
+            if rooms is not None and job.written:
+                await emit("notification", push, rooms)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.exception("Notification fan-out %s failed after %d of %d", job.id, job.written, job.total)
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        logger.info(
+            "Notification fan-out %s %s: %d notifications in %.1f ms",
+            job.id, job.status, job.written, job.duration_ms,
+        )
+
+notification_fanout = NotificationFanout(settings.NOTIFICATION_FANOUT_CHUNK_SIZE)
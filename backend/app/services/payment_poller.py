@@ -0,0 +1,356 @@
+"""
+Status polling for M-Pesa STK pushes.
+
+Only one worker polls at a time: the one holding the poller's advisory
+lock. The others stand by and try to take the lock every interval, so the
+concurrency and rate limits apply to the whole deployment. The leader
+probes the lock's connection every interval and stands down as soon as it
+has dropped, since the lock went with it. The leader
+reloads the pending checkouts from the database every interval, which
+picks up the ones started on other workers and after a restart.
+
+Pending checkouts wait in a heap ordered by when they are next due. Due
+checkouts are taken in batches; each batch is first narrowed to the rows
+still pending in the database (one query), so a checkout settled by
+/callback on any worker is never queried again. STK queries then run under
+the concurrency and rate limits, and the outcomes are written back in one
+transaction.
+
+Daraja answers the query with an error until the customer responds, and
+with a ResultCode once the payment is final.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AdvisoryLock, AsyncSessionLocal, advisory_lock
+from app.models.purchase import Purchase
+from app.models.subscription import Subscription
+from app.services.mpesa import verify_stk_push
+
+logger = logging.getLogger(__name__)
+
+POLLER_LOCK = "mpesa_payment_poller"
+
+async def update_transaction_status(
+    checkout_request_id: str,
+    is_successful: bool,
+    db: AsyncSession,
+    only_pending: bool = False,
+    commit: bool = True,
+):
+    """
+    Update the purchase or subscription behind a checkout.
+
+    Args:
+        checkout_request_id: The CheckoutRequestID from the STK push.
+        is_successful: Whether the customer paid.
+        db: Session to write with.
+        only_pending: Leave rows that are already settled alone, so a late
+            poll never overrides the callback.
+        commit: Commit here; pass False to batch several updates.
+    """
+    # Try to find purchase with this checkout ID
+    query = select(Purchase).where(Purchase.mpesa_checkout_request_id == checkout_request_id)
+    if only_pending:
+        query = query.where(Purchase.status == "pending")
+    purchase = await db.scalar(query)
+
+    if purchase:
+        purchase.status = "completed" if is_successful else "failed"
+        purchase.updated_at = datetime.utcnow()
+        if commit:
+            await db.commit()
+        return
+
+    # If not found in purchases, check subscriptions
+    query = select(Subscription).where(Subscription.mpesa_checkout_request_id == checkout_request_id)
+    if only_pending:
+        query = query.where(Subscription.status == "pending")
+    subscription = await db.scalar(query)
+
+    if subscription:
+        subscription.status = "active" if is_successful else "failed"
+        subscription.is_active = is_successful
+        subscription.updated_at = datetime.utcnow()
+        if commit:
+            await db.commit()
+        return
+
+def pending_checkouts_query():
+    """Checkout IDs and creation times of every pending M-Pesa payment"""
+    return union_all(
+        select(Purchase.mpesa_checkout_request_id.label("checkout_request_id"), Purchase.created_at).where(
+            Purchase.status == "pending",
+            Purchase.mpesa_checkout_request_id.is_not(None),
+        ),
+        select(Subscription.mpesa_checkout_request_id, Subscription.created_at).where(
+            Subscription.status == "pending",
+            Subscription.mpesa_checkout_request_id.is_not(None),
+        ),
+    )
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart, across all callers"""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class PendingCheckout:
+    """A checkout waiting for its next status query"""
+
+    def __init__(self, attempts: int, due: Optional[float]):
+        self.attempts = attempts  # Queries made so far
+        self.due = due  # None while a query is in flight
+
+class PaymentPoller:
+    """
+    Scheduler of STK push status queries, active in the leader worker only.
+
+    A checkout is queried every `interval_seconds` until Daraja reports a
+    result, /callback settles it, or `max_attempts` queries have gone
+    unanswered, when it is marked failed. Heap entries are dropped lazily:
+    resolving a checkout only removes it from `_pending`.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        max_attempts: int,
+        concurrency: int,
+        rate_per_second: float,
+        batch_size: int,
+    ):
+        self.interval_seconds = interval_seconds
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._heap = []  # (due, seq, checkout_request_id)
+        self._seq = itertools.count()
+        self._pending = {}  # checkout_request_id -> PendingCheckout
+        self._wake = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = RateLimiter(rate_per_second)
+        self._batches = set()
+        self.leading = False
+        self.in_flight = 0
+        self.queries = 0
+        self.unanswered = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.resolved = 0
+        self.reloaded = 0
+
+    def schedule(self, checkout_request_id: str, delay: Optional[float] = None, attempts: int = 0):
+        """Query a checkout after `delay` seconds (one interval by default)"""
+        if not self.leading:
+            return  # The leader picks it up at its next reload
+        due = time.monotonic() + (self.interval_seconds if delay is None else delay)
+        self._pending[checkout_request_id] = PendingCheckout(attempts, due)
+        if not self._heap or due < self._heap[0][0]:
+            self._wake.set()
+        heapq.heappush(self._heap, (due, next(self._seq), checkout_request_id))
+
+    def resolve(self, checkout_request_id: str):
+        """Stop polling a checkout, e.g. once /callback has settled it"""
+        if self._pending.pop(checkout_request_id, None) is not None:
+            self.resolved += 1
+
+    async def load(self) -> int:
+        """Queue the pending checkouts in the database that are not queued yet"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(pending_checkouts_query())).all()
+
+        now = datetime.now(timezone.utc)
+        loaded = 0
+        for checkout_request_id, created_at in rows:
+            if checkout_request_id in self._pending:
+                continue
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            # Count the queries it would have had and keep its schedule;
+            # overdue ones get one last check now
+            elapsed = (now - created_at).total_seconds()
+            attempts = min(int(elapsed // self.interval_seconds), self.max_attempts - 1)
+            delay = max(self.interval_seconds * (attempts + 1) - elapsed, 0)
+            self.schedule(checkout_request_id, delay=delay, attempts=attempts)
+            loaded += 1
+        self.reloaded += loaded
+        return loaded
+
+    def _take_due(self) -> list:
+        now = time.monotonic()
+        batch = []
+        while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+            due, _, checkout_request_id = heapq.heappop(self._heap)
+            checkout = self._pending.get(checkout_request_id)
+            if checkout is not None and checkout.due == due:
+                checkout.due = None
+                batch.append(checkout_request_id)
+        return batch
+
+    async def _still_pending(self, checkout_request_ids: list) -> set:
+        query = pending_checkouts_query().subquery()
+        async with AsyncSessionLocal() as db:
+            return set((await db.scalars(
+                select(query.c.checkout_request_id).where(query.c.checkout_request_id.in_(checkout_request_ids))
+            )).all())
+
+    async def _query(self, checkout_request_id: str, attempts: int) -> Optional[bool]:
+        """True or False once the payment is final, None while it is still open"""
+        async with self._semaphore:
+            await self._limiter.wait()
+            self.in_flight += 1
+            self.queries += 1
+            try:
+                verification = await verify_stk_push(checkout_request_id)
+            except Exception as e:
+                self.unanswered += 1
+                logger.debug("STK query for %s unanswered: %s", checkout_request_id, e)
+                if settings.MPESA_SIMULATE_PAYMENTS and attempts > 5:
+                    return random.choice([True, False])
+                return None
+            finally:
+                self.in_flight -= 1
+
+        if verification["response"].get("ResultCode") is None:
+            return None
+        return verification["success"]
+
+    async def _run_batch(self, batch: list):
+        try:
+            still_pending = await self._still_pending(batch)
+            for checkout_request_id in batch:
+                if checkout_request_id not in still_pending:
+                    self.resolve(checkout_request_id)
+            batch = [checkout_request_id for checkout_request_id in batch if checkout_request_id in self._pending]
+
+            outcomes = await asyncio.gather(*(
+                self._query(checkout_request_id, self._pending[checkout_request_id].attempts)
+                for checkout_request_id in batch
+            ))
+
+            settled = []
+            for checkout_request_id, outcome in zip(batch, outcomes):
+                checkout = self._pending.get(checkout_request_id)
+                if checkout is None:
+                    continue  # Settled by /callback meanwhile
+                checkout.attempts += 1
+                if outcome is None and checkout.attempts < self.max_attempts:
+                    self.schedule(checkout_request_id, attempts=checkout.attempts)
+                else:
+                    settled.append((checkout_request_id, bool(outcome)))
+
+            if settled:
+                async with AsyncSessionLocal() as db:
+                    for checkout_request_id, is_successful in settled:
+                        await update_transaction_status(
+                            checkout_request_id, is_successful, db, only_pending=True, commit=False
+                        )
+                    await db.commit()
+                for checkout_request_id, is_successful in settled:
+                    self._pending.pop(checkout_request_id, None)
+                    if is_successful:
+                        self.confirmed += 1
+                    else:
+                        self.failed += 1
+        except Exception:
+            logger.exception("M-Pesa status batch failed; retrying next interval")
+            for checkout_request_id in batch:
+                checkout = self._pending.get(checkout_request_id)
+                if checkout is not None and checkout.due is None:
+                    self.schedule(checkout_request_id, attempts=checkout.attempts)
+
+    async def _lead(self, lock: AdvisoryLock):
+        next_load = time.monotonic()
+        while True:
+            if time.monotonic() >= next_load:
+                if not await lock.held():
+                    logger.warning("Lost the M-Pesa poller lock; standing by")
+                    return
+                try:
+                    count = await self.load()
+                    if count:
+                        logger.info("Polling %d more pending M-Pesa checkouts", count)
+                except Exception:
+                    logger.exception("Could not reload pending M-Pesa checkouts")
+                next_load = time.monotonic() + self.interval_seconds
+
+            batch = self._take_due()
+            if batch:
+                task = asyncio.create_task(self._run_batch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+                continue
+
+            self._wake.clear()
+            wake_at = min(self._heap[0][0], next_load) if self._heap else next_load
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(wake_at - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """Poll while this worker leads, otherwise stand by; started in every worker"""
+        while True:
+            try:
+                async with advisory_lock(POLLER_LOCK) as lock:
+                    if lock:
+                        self.leading = True
+                        logger.info("Polling M-Pesa checkouts from this worker")
+                        try:
+                            await self._lead(lock)
+                        finally:
+                            self.leading = False
+                            for task in self._batches:
+                                task.cancel()
+                            self._heap.clear()
+                            self._pending.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("M-Pesa poller stopped; retrying")
+            await asyncio.sleep(self.interval_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "leading": self.leading,
+            "pending": len(self._pending),
+            "queued": len(self._heap),
+            "in_flight": self.in_flight,
+            "batches": len(self._batches),
+            "concurrency": self.concurrency,
+            "queries": self.queries,
+            "unanswered": self.unanswered,
+            "confirmed": self.confirmed,
+            "failed": self.failed,
+            "resolved": self.resolved,
+            "reloaded": self.reloaded,
+        }
+
+payment_poller = PaymentPoller(
+    settings.MPESA_POLL_INTERVAL_SECONDS,
+    settings.MPESA_POLL_MAX_ATTEMPTS,
+    settings.MPESA_POLL_CONCURRENCY,
+    settings.MPESA_POLL_RATE_PER_SECOND,
+    settings.MPESA_POLL_BATCH_SIZE,
+)
@@ -0,0 +1,244 @@
+"""
+Async HTTP client for payment providers.
+
+Each provider gets one pooled httpx.AsyncClient (keep-alive, bounded
+connections, per-call timeouts), retries with full-jitter exponential
+backoff, and a circuit breaker that fails fast while the provider is down.
+
+Point a provider's base URL at a local stand-in server to exercise it, or
+pass an httpx transport (e.g. httpx.MockTransport) to the constructor.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Worth retrying: the provider is overloaded or briefly unavailable
+RETRY_STATUSES = {429, 502, 503, 504}
+
+class ProviderError(Exception):
+    """A provider call failed after retries"""
+
+class CircuitOpenError(ProviderError):
+    """The provider has been failing; calls are rejected without being sent"""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    fail fast for `reset_seconds`. Then one trial call is let through
+    (half-open): success closes the circuit, failure opens it again. A
+    trial that never reports back is given up on after another
+    `reset_seconds`, and a new one is let through. A cancelled call is not
+    a failure; a cancelled trial just frees the slot for the next call.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"  # closed, open, half_open
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = 0.0
+        self.rejected = 0
+
+    def before_call(self, name: str) -> bool:
+        """Raise CircuitOpenError if the call may not go ahead; True if it is the half-open trial"""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"{name} is unavailable; retry in a moment")
+            self.state = "half_open"
+            self.trial_started_at = time.monotonic()
+            return True
+        if self.state == "half_open":
+            # One trial at a time, unless the last one went missing
+            if time.monotonic() - self.trial_started_at < self.reset_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"{name} is unavailable; retry in a moment")
+            self.trial_started_at = time.monotonic()
+            return True
+        return False
+
+    def release_trial(self):
+        """Let the next call be the trial, e.g. after this one was cancelled"""
+        if self.state == "half_open":
+            self.trial_started_at = float("-inf")
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+class ProviderClient:
+    """
+    Pooled, retrying HTTP client for one payment provider.
+
+    Idempotent calls are retried on network errors, timeouts and 429/5xx.
+    Other calls (e.g. starting a payment) are only retried when the request
+    never reached the provider, so a customer is never charged twice.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        timeout: float = settings.PROVIDER_HTTP_TIMEOUT_SECONDS,
+        connect_timeout: float = settings.PROVIDER_HTTP_CONNECT_TIMEOUT_SECONDS,
+        max_connections: int = settings.PROVIDER_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = settings.PROVIDER_HTTP_MAX_KEEPALIVE,
+        retries: int = settings.PROVIDER_HTTP_RETRIES,
+        backoff_seconds: float = settings.PROVIDER_HTTP_BACKOFF_SECONDS,
+        backoff_max_seconds: float = settings.PROVIDER_HTTP_BACKOFF_MAX_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.breaker = breaker or CircuitBreaker(
+            settings.PROVIDER_CIRCUIT_FAILURE_THRESHOLD, settings.PROVIDER_CIRCUIT_RESET_SECONDS
+        )
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.calls = 0
+        self.retried = 0
+        self.errors = 0
+        provider_clients[name] = self
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use, inside the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+        return self._client
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max_seconds)
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_seconds * 2 ** attempt))
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        idempotent: Optional[bool] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Send a request, retrying and tripping the breaker as configured.
+
+        Args:
+            method: HTTP method.
+            url: Path relative to the base URL (or an absolute URL).
+            idempotent: Whether any failure may be retried. Defaults to
+                True for GET, HEAD and OPTIONS.
+            timeout: Overall timeout for this call, in seconds.
+            **kwargs: Passed to httpx (json, headers, params, ...).
+
+        Returns:
+            The response, which may still be a 4xx for the caller to handle.
+
+        Raises:
+            CircuitOpenError: The provider is failing; nothing was sent.
+            ProviderError: Every attempt failed.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "OPTIONS")
+        if timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(timeout, connect=min(timeout, self.timeout.connect))
+
+        self.calls += 1
+        for attempt in range(self.retries + 1):
+            trial = self.breaker.before_call(self.name)
+            response = None
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Never reached the provider: always safe to retry
+                error, retryable = e, True
+            except httpx.TransportError as e:
+                error, retryable = e, idempotent
+            except asyncio.CancelledError:
+                # Our caller gave up, which says nothing about the provider
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            except BaseException:
+                # Anything else (a bad URL, an undecodable body) still has to
+                # settle the breaker, or a half-open trial never ends
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code < 500 and response.status_code != 429:
+                    self.breaker.record_success()
+                    return response
+                error = ProviderError(f"{self.name} returned HTTP {response.status_code}")
+                retryable = idempotent and response.status_code in RETRY_STATUSES
+
+            self.breaker.record_failure()
+            if not retryable or attempt == self.retries:
+                self.errors += 1
+                if response is not None:
+                    # Let the caller read the provider's error body
+                    return response
+                raise ProviderError(f"{self.name} request failed: {error}") from error
+
+            self.retried += 1
+            delay = self._backoff(attempt, response)
+            logger.warning("%s %s %s failed (%s); retry %d in %.2fs", self.name, method, url, error, attempt + 1, delay)
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "calls": self.calls,
+            "retried": self.retried,
+            "errors": self.errors,
+            "circuit": self.breaker.snapshot(),
+        }
+
+# name -> client, for metrics and shutdown
+provider_clients = {}
+
+async def close_provider_clients():
+    for client in provider_clients.values():
+        await client.aclose()
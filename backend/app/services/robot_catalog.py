@@ -0,0 +1,366 @@
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, status
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.robot import Robot
+from app.realtime import signal_workers_soon
+from app.schemas.robot import RobotResponse
+from app.socketio_manager import on_worker_signal
+from app.utils.pagination import decode_cursor, encode_cursor
+
+def strong_etag(*parts) -> str:
+    """Quoted strong ETag over the given bytes/str parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header names `etag` (or is *).
+
+    If-None-Match uses the weak comparison, so W/"x" matches "x"; proxies
+    that compress a response weaken its ETag this way.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+class CatalogFilters:
+    """Marketplace filters; every one that is set must match"""
+
+    def __init__(
+        self,
+        category: Optional[str] = None,
+        type: Optional[str] = None,
+        currency: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        features: Sequence[str] = (),
+        q: Optional[str] = None,
+    ):
+        self.category = category
+        self.type = type
+        self.currency = currency
+        self.min_price = min_price
+        self.max_price = max_price
+        self.features = sorted({feature.casefold() for feature in features})
+        self.words = (q or "").casefold().split()
+
+    def key(self) -> str:
+        """Canonical form, for ETags"""
+        return json.dumps([
+            fold(self.category), fold(self.type), fold(self.currency),
+            self.min_price, self.max_price, self.features, self.words,
+        ])
+
+class CatalogPage:
+    """One page of the catalog, ready to send"""
+
+    def __init__(self, etag: str, items: list, next_cursor: Optional[str]):
+        self.etag = etag
+        self.items = items  # Pre-serialized robots
+        self.next_cursor = next_cursor
+
+    @property
+    def body(self) -> bytes:
+        return b"[" + b",".join(self.items) + b"]"
+
+def fold(value: Optional[str]) -> Optional[str]:
+    """Facet values match case-insensitively"""
+    return value.casefold() if value is not None else None
+
+# Faceted columns; features is a list, the others a single value
+FACETS = ("category", "type", "currency", "features")
+
+# sort -> (key columns, descending). The newest/oldest cursors are the same
+# (created_at, id) cursors as every other list endpoint.
+SORTS = {
+    "newest": (("created_at", "id"), True),
+    "oldest": (("created_at", "id"), False),
+    "price_asc": (("price", "id"), False),
+    "price_desc": (("price", "id"), True),
+    "name": (("name", "id"), False),
+}
+
+# Rows without a created_at sort as the oldest
+NO_CREATED_AT = datetime.min.replace(tzinfo=timezone.utc)
+
+def _sort_value(robot, column: str):
+    value = getattr(robot, column)
+    if column == "name":
+        return value.casefold()
+    if column == "created_at":
+        if value is None:
+            return NO_CREATED_AT
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return value
+
+def encode_sort_cursor(columns: tuple, key: tuple) -> str:
+    if columns[0] == "created_at":
+        return encode_cursor(*key)
+    payload = json.dumps(list(key))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_sort_cursor(columns: tuple, cursor: str) -> tuple:
+    if columns[0] == "created_at":
+        return decode_cursor(cursor)
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, id = json.loads(base64.urlsafe_b64decode(padded))
+        return (float(value) if columns[0] == "price" else str(value)), str(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+class CatalogSnapshot:
+    """
+    The robot catalog serialized and indexed once at load time.
+
+    Robots are numbered oldest first. Each facet value maps to a bitmask of
+    the robots that have it (an inverted index in a Python int), so a filter
+    is a few ANDs and a facet count is a popcount. Every sort keeps its own
+    ordering, so a keyset page is a bisect and a short walk. ETags are
+    content hashes, so every worker holding the same catalog hands out the
+    same tags.
+    """
+
+    def __init__(self, version: int, robots: list):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        robots = sorted(robots, key=lambda robot: (_sort_value(robot, "created_at"), robot.id))
+        self.items = [RobotResponse.model_validate(robot).model_dump_json().encode() for robot in robots]
+        self.by_id = {}
+        for robot, item in zip(robots, self.items):
+            self.by_id[robot.id] = (strong_etag(item), item)
+        self.etag = strong_etag(*self.items)
+        self.all = (1 << len(robots)) - 1
+
+        # Inverted index: facet -> folded value -> bitmask, plus display labels
+        self.index = {facet: {} for facet in FACETS}
+        self.labels = {facet: {} for facet in FACETS}
+        for position, robot in enumerate(robots):
+            for facet in FACETS:
+                values = getattr(robot, facet)
+                for value in ((values or []) if facet == "features" else [values]):
+                    if value is None:
+                        continue
+                    self.index[facet][fold(value)] = self.index[facet].get(fold(value), 0) | (1 << position)
+                    self.labels[facet].setdefault(fold(value), value)
+        self.prices = [robot.price for robot in robots]
+        self.texts = [
+            " ".join([robot.name, robot.description, robot.category, robot.type, *(robot.features or [])]).casefold()
+            for robot in robots
+        ]
+
+        # Positions and keys in ascending order for each sort
+        self.orders = {}
+        for columns, _ in SORTS.values():
+            if columns not in self.orders:
+                keyed = sorted(
+                    (tuple(_sort_value(robot, column) for column in columns), position)
+                    for position, robot in enumerate(robots)
+                )
+                self.orders[columns] = ([key for key, _ in keyed], [position for _, position in keyed])
+
+    def _bits(self, mask: int):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def match(self, filters: CatalogFilters, skip: Optional[str] = None) -> int:
+        """Bitmask of the robots matching `filters`, ignoring the `skip` facet"""
+        mask = self.all
+        for facet in ("category", "type", "currency"):
+            value = getattr(filters, facet)
+            if value is not None and facet != skip:
+                mask &= self.index[facet].get(fold(value), 0)
+        if skip != "features":
+            for feature in filters.features:
+                mask &= self.index["features"].get(feature, 0)
+
+        if filters.min_price is not None or filters.max_price is not None:
+            low = filters.min_price if filters.min_price is not None else float("-inf")
+            high = filters.max_price if filters.max_price is not None else float("inf")
+            mask &= sum(1 << position for position in self._bits(mask) if low <= self.prices[position] <= high)
+        if filters.words:
+            mask &= sum(
+                1 << position for position in self._bits(mask)
+                if all(word in self.texts[position] for word in filters.words)
+            )
+        return mask
+
+    def page(self, cursor: Optional[str], limit: Optional[int], filters: Optional[CatalogFilters] = None, sort: str = "newest") -> CatalogPage:
+        """
+        One keyset page of the robots matching `filters`.
+
+        Args:
+            cursor: X-Next-Cursor from the previous page, if any.
+            limit: Page size, or None for every match.
+            filters: Marketplace filters (none by default).
+            sort: One of SORTS.
+
+        Returns:
+            The page, its ETag and the cursor for the next page.
+        """
+        filters = filters or CatalogFilters()
+        mask = self.match(filters)
+        if limit is None:
+            limit = len(self.items)
+        columns, descending = SORTS[sort]
+        keys, positions = self.orders[columns]
+
+        if descending:
+            end = bisect.bisect_left(keys, decode_sort_cursor(columns, cursor)) if cursor else len(keys)
+            walk = range(end - 1, -1, -1)
+        else:
+            start = bisect.bisect_right(keys, decode_sort_cursor(columns, cursor)) if cursor else 0
+            walk = range(start, len(keys))
+
+        # Collect one extra match to know whether there is a next page
+        found = []
+        for index in walk:
+            if mask >> positions[index] & 1:
+                found.append(index)
+                if len(found) > limit:
+                    break
+
+        next_cursor = None
+        if len(found) > limit:
+            found = found[:limit]
+            next_cursor = encode_sort_cursor(columns, keys[found[-1]])
+        return CatalogPage(
+            strong_etag(self.etag, sort, filters.key(), cursor or "", limit),
+            [self.items[positions[index]] for index in found],
+            next_cursor,
+        )
+
+    def facets(self, filters: Optional[CatalogFilters] = None) -> dict:
+        """
+        Counts for each facet value and the price range of the matches.
+
+        Each facet is counted with every filter applied except its own, so
+        picking a category still shows how many robots the other categories
+        have.
+        """
+        filters = filters or CatalogFilters()
+        mask = self.match(filters)
+        prices = [self.prices[position] for position in self._bits(mask)]
+        result = {
+            "total": mask.bit_count(),
+            "price": {"min": min(prices), "max": max(prices)} if prices else None,
+        }
+        for facet in FACETS:
+            base = self.match(filters, skip=facet)
+            counts = [
+                {"value": self.labels[facet][value], "count": (bits & base).bit_count()}
+                for value, bits in self.index[facet].items()
+            ]
+            result[facet] = sorted(
+                (count for count in counts if count["count"]),
+                key=lambda count: (-count["count"], str(count["value"]).casefold()),
+            )
+        return result
+
+class RobotCatalog:
+    """
+    Per-process cache of the robot catalog.
+
+    Any committed insert, update or delete of a Robot bumps the version on
+    every worker (see the session events below), and the next read reloads
+    the whole catalog in one query. The TTL bounds staleness should a
+    signal between workers be lost.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def invalidate(self):
+        self.version += 1
+
+    def _fresh(self, snapshot: Optional[CatalogSnapshot]) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.version == self.version
+            and (self.ttl_seconds <= 0 or time.monotonic() - snapshot.loaded_at < self.ttl_seconds)
+        )
+
+    async def snapshot(self, db: AsyncSession) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if self._fresh(snapshot):
+            self.hits += 1
+            return snapshot
+
+        # One request reloads; the others wait for its snapshot
+        async with self._lock:
+            snapshot = self._snapshot
+            if self._fresh(snapshot):
+                self.hits += 1
+                return snapshot
+            version = self.version
+            robots = (await db.scalars(select(Robot))).all()
+            snapshot = CatalogSnapshot(version, robots)
+            self._snapshot = snapshot
+            self.loads += 1
+            return snapshot
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": self.version,
+            "size": len(snapshot.items) if snapshot else 0,
+            "etag": snapshot.etag if snapshot else None,
+            "fresh": self._fresh(snapshot),
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "loads": self.loads,
+        }
+
+robot_catalog = RobotCatalog(settings.ROBOT_CATALOG_TTL_SECONDS)
+
+# Robot writes are noted at flush and acted on only once committed. The
+# committing worker drops its snapshot straight away; the others hear about
+# it over the Socket.IO message bus (SOCKETIO_MESSAGE_QUEUE).
+CATALOG_CHANGED = "robot_catalog_changed"
+
+@event.listens_for(Session, "after_flush")
+def _collect_robot_changes(session, flush_context):
+    if any(isinstance(obj, Robot) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info["robots_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog(session):
+    if session.info.pop("robots_changed", False):
+        robot_catalog.invalidate()
+        signal_workers_soon(CATALOG_CHANGED)
+
+@on_worker_signal(CATALOG_CHANGED)
+def _catalog_changed_elsewhere(data):
+    robot_catalog.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_robot_changes(session):
+    session.info.pop("robots_changed", None)
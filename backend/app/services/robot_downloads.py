@@ -0,0 +1,141 @@
+"""
+Entitled downloads of robot bundles.
+
+A bundle can be fetched two ways:
+
+    GET /robots/{id}/download               checks entitlement in the database
+    GET /robots/{id}/download-url           checks it once and returns a signed URL
+    GET /downloads/<path>?exp=..&sig=..     serves the signed URL with no database work
+
+Files are sent zero-copy: through nginx (X-Accel-Redirect) when
+ROBOT_DOWNLOAD_ACCEL_PREFIX is set, otherwise as a FileResponse, which uses
+the ASGI pathsend extension where the server offers it. Range and If-Range
+are handled by FileResponse; If-None-Match is answered here from the
+content hash.
+"""
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+from urllib.parse import quote, urlencode
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.purchase import Purchase
+from app.models.robot import Robot
+from app.models.robot_request import RobotRequest
+from app.models.user import User
+from app.services.robot_catalog import etag_matches
+from app.services.robot_files import robot_file_store
+
+UPLOADS_PREFIX = "/uploads/"
+
+async def can_download_robot(db: AsyncSession, user: User, robot: Robot) -> bool:
+    """Admins, free robots, and buyers with a completed purchase"""
+    if user.is_admin or robot.category == "free":
+        return True
+    return await db.scalar(select(exists().where(
+        Purchase.user_id == user.id,
+        Purchase.robot_id == robot.id,
+        Purchase.status == "completed",
+    )))
+
+def can_download_request(user: User, request: RobotRequest) -> bool:
+    """Admins, and the owner once the request is delivered"""
+    return user.is_admin or (request.user_id == user.id and bool(request.is_delivered))
+
+def stored_path(download_url: Optional[str]) -> Optional[str]:
+    """
+    The store-relative path behind a /uploads/... download URL.
+
+    Returns None for external URLs and for anything outside the store.
+    """
+    if not download_url or not download_url.startswith(UPLOADS_PREFIX):
+        return None
+    relative = download_url[len(UPLOADS_PREFIX):]
+    root = robot_file_store.root.resolve()
+    path = (root / relative).resolve()
+    if root not in path.parents or path.is_relative_to(robot_file_store.tmp_dir.resolve()):
+        return None
+    return path.relative_to(root).as_posix()
+
+def _signature(path: str, filename: str, expires: int) -> str:
+    message = f"{path}\n{filename}\n{expires}".encode()
+    return hmac.new(settings.JWT_SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def signed_url(path: str, filename: str) -> dict:
+    """A short-lived URL for one stored file that needs no login or entitlement check"""
+    expires = int(time.time()) + settings.ROBOT_DOWNLOAD_URL_TTL_SECONDS
+    query = urlencode({"name": filename, "exp": expires, "sig": _signature(path, filename, expires)})
+    return {"url": f"/api/downloads/{quote(path)}?{query}", "expires_at": expires}
+
+def verify_signed_url(path: str, filename: str, expires: int, signature: str):
+    if expires < time.time() or not hmac.compare_digest(_signature(path, filename, expires), signature):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Download link is invalid or has expired"
+        )
+
+def content_hash(path: str) -> Optional[str]:
+    """SHA-256 of a content-addressed file, which is its name; None for legacy uploads"""
+    return path.rsplit("/", 1)[-1] if path.startswith("sha256/") else None
+
+def file_response(request: Request, path: str, filename: str) -> Response:
+    """
+    Send a stored file.
+
+    Args:
+        request: The download request (for If-None-Match).
+        path: Path relative to the robot file store.
+        filename: Name offered to the browser.
+    """
+    headers = {"Cache-Control": "private, no-cache"}
+    sha256 = content_hash(path)
+    if sha256:
+        headers["ETag"] = f'"{sha256}"'
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    full_path = robot_file_store.root / path
+    if not os.path.isfile(full_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
+    if settings.ROBOT_DOWNLOAD_ACCEL_PREFIX:
+        # nginx streams the file with sendfile and handles Range itself
+        headers["X-Accel-Redirect"] = settings.ROBOT_DOWNLOAD_ACCEL_PREFIX.rstrip("/") + "/" + quote(path)
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+        return Response(headers=headers, media_type="application/octet-stream")
+
+    return FileResponse(full_path, headers=headers, filename=filename, media_type="application/octet-stream")
+
+def download_response(request: Request, download_url: Optional[str], filename: str) -> Response:
+    """Serve a download URL: stored files directly, external links by redirect"""
+    path = stored_path(download_url)
+    if path:
+        return file_response(request, path, filename)
+    if download_url and download_url.startswith(("http://", "https://")):
+        return RedirectResponse(download_url)
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="No file available for download"
+    )
+
+def download_link(download_url: Optional[str], filename: str) -> dict:
+    """A signed URL for a stored file; external links are returned as they are"""
+    path = stored_path(download_url)
+    if path:
+        return signed_url(path, filename)
+    if download_url and download_url.startswith(("http://", "https://")):
+        return {"url": download_url, "expires_at": None}
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="No file available for download"
+    )
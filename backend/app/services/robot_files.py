@@ -0,0 +1,373 @@
+"""
+Content-addressed storage for robot bundles.
+
+    <ROBOT_UPLOAD_DIR>/
+        sha256/ab/abcdef...   one file per distinct bundle
+        tmp/<id>.part         upload in progress
+        tmp/<id>.json         resumable upload session
+
+Bytes are streamed to a temporary file and hashed as they arrive. The
+finished file is renamed into place, so a bundle is either complete under
+its hash or absent, and identical bundles are stored once. All disk work
+runs in worker threads, off the event loop.
+
+Appends to a resumable upload hold an exclusive flock on its partial file,
+so two workers (or two requests in one worker) can never write the same
+range at once.
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+ALLOWED_EXTENSIONS = ("zip", "xml")
+
+UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Room for the multipart framing around a single-request upload
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+SINGLE_UPLOAD_PATH = re.compile(r"/robots/[^/]+/upload$")
+
+class StoredFile:
+    """A bundle in the store"""
+
+    def __init__(self, sha256: str, size: int, path: Path):
+        self.sha256 = sha256
+        self.size = size
+        self.path = path
+
+def check_extension(filename: str):
+    """Reject anything but ZIP and XML bundles"""
+    if filename.rsplit(".", 1)[-1].lower() not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only ZIP and XML files are allowed"
+        )
+
+def _write_chunk(handle, hasher, chunk: bytes):
+    handle.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+def _open_locked(path: Path):
+    """
+    Open a partial file for appending under an exclusive lock, or None if
+    another writer holds it. Raises FileNotFoundError rather than creating it.
+    """
+    handle = os.fdopen(os.open(path, os.O_WRONLY | os.O_APPEND), "ab")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+    return handle
+
+def content_length(request: Request) -> Optional[int]:
+    """The declared body size, or None when the client did not send one"""
+    value = request.headers.get("content-length")
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Content-Length"
+        )
+    return int(value)
+
+def _hash_file(path: Path, chunk_size: int) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while chunk := handle.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+class RobotFileStore:
+    """
+    Streaming, deduplicating store for robot bundles.
+
+    Small bundles go through save() in one request. Large ones use a
+    resumable session: create it, append byte ranges in any number of
+    requests (resuming from offset() after a failure), then complete it.
+    Session state lives next to the partial file, so any worker sharing the
+    directory can continue it.
+    """
+
+    def __init__(self, root: str, chunk_size: int, max_bytes: int, session_ttl_seconds: int):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.session_ttl_seconds = session_ttl_seconds
+        self.tmp_dir = self.root / "tmp"
+        # upload id -> (offset, running hash) for sessions fed in order by this worker
+        self._hashers = {}
+
+    def prepare(self):
+        """Create the store's directories; run once at startup"""
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        (self.root / "sha256").mkdir(exist_ok=True)
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / "sha256" / sha256[:2] / sha256
+
+    def relative_path(self, sha256: str) -> str:
+        return self.path_for(sha256).relative_to(self.root).as_posix()
+
+    def _too_large(self):
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Robot files are limited to {self.max_bytes} bytes"
+        )
+
+    def _commit(self, part: Path, sha256: str, size: int) -> StoredFile:
+        """Move a finished file into place, or drop it if the bundle is already stored"""
+        path = self.path_for(sha256)
+        if path.exists():
+            part.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(part, path)
+        return StoredFile(sha256, size, path)
+
+    async def save(self, chunks: AsyncIterator[bytes]) -> StoredFile:
+        """
+        Stream one upload into the store.
+
+        Args:
+            chunks: The file's bytes, in order.
+
+        Returns:
+            The stored bundle, deduplicated by SHA-256.
+        """
+        part = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        hasher = hashlib.sha256()
+        size = 0
+        handle = await asyncio.to_thread(open, part, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise self._too_large()
+                await asyncio.to_thread(_write_chunk, handle, hasher, chunk)
+            await asyncio.to_thread(handle.close)
+            return await asyncio.to_thread(self._commit, part, hasher.hexdigest(), size)
+        except BaseException:
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(part.unlink, True)
+            raise
+
+    # Resumable sessions
+
+    def _session_paths(self, upload_id: str) -> tuple:
+        if not UPLOAD_ID.match(upload_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload not found"
+            )
+        return self.tmp_dir / f"{upload_id}.json", self.tmp_dir / f"{upload_id}.part"
+
+    def _remove_expired(self):
+        cutoff = time.time() - self.session_ttl_seconds
+        for meta in self.tmp_dir.glob("*.json"):
+            if meta.stat().st_mtime < cutoff:
+                meta.unlink(missing_ok=True)
+                meta.with_suffix(".part").unlink(missing_ok=True)
+
+    async def create_session(self, robot_id: str, filename: str, size: int) -> dict:
+        """Start a resumable upload of `size` bytes"""
+        check_extension(filename)
+        if size > self.max_bytes:
+            raise self._too_large()
+
+        session = {
+            "upload_id": uuid.uuid4().hex,
+            "robot_id": robot_id,
+            "filename": filename,
+            "size": size,
+            "offset": 0,
+        }
+        meta, part = self._session_paths(session["upload_id"])
+
+        def create():
+            self._remove_expired()
+            part.touch()
+            meta.write_text(json.dumps(session))
+
+        await asyncio.to_thread(create)
+        self._hashers[session["upload_id"]] = (0, hashlib.sha256())
+        return session
+
+    async def get_session(self, robot_id: str, upload_id: str) -> dict:
+        """A session with its current offset (bytes received so far)"""
+        meta, part = self._session_paths(upload_id)
+
+        def read():
+            if not meta.exists():
+                return None
+            session = json.loads(meta.read_text())
+            session["offset"] = part.stat().st_size if part.exists() else 0
+            return session
+
+        session = await asyncio.to_thread(read)
+        if not session or session["robot_id"] != robot_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload not found"
+            )
+        return session
+
+    async def append(
+        self,
+        robot_id: str,
+        upload_id: str,
+        start: int,
+        chunks: AsyncIterator[bytes],
+        length: Optional[int] = None,
+    ) -> dict:
+        """
+        Append bytes at `start`, which must equal the current offset.
+
+        Args:
+            length: The declared size of the range (Content-Length), checked
+                against the session before any of it is read.
+
+        Returns:
+            The session with its new offset. A mismatched start, or another
+            append in progress, is a 409 and the client resumes from the
+            offset in GET.
+        """
+        _, part = self._session_paths(upload_id)
+        try:
+            handle = await asyncio.to_thread(_open_locked, part)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload not found"
+            )
+        if handle is None:
+            await self.get_session(robot_id, upload_id)  # Another robot's upload is a 404
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Another range is being written to this upload"
+            )
+
+        try:
+            # Read under the lock, so the offset cannot move until we are done
+            session = await self.get_session(robot_id, upload_id)
+            if start != session["offset"]:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Expected a range starting at byte {session['offset']}"
+                )
+            if length is not None and start + length > session["size"]:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Range goes past the declared upload size"
+                )
+
+            # Keep hashing as we go when this worker has seen every byte so far
+            offset, hasher = self._hashers.get(upload_id, (None, None))
+            if offset != start:
+                hasher = None
+                self._hashers.pop(upload_id, None)
+
+            try:
+                offset = start
+                async for chunk in chunks:
+                    offset += len(chunk)
+                    if offset > session["size"]:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Range goes past the declared upload size"
+                        )
+                    await asyncio.to_thread(_write_chunk, handle, hasher, chunk)
+            except BaseException:
+                # Keep whole chunks already written; the running hash is no longer trusted
+                hasher = None
+                self._hashers.pop(upload_id, None)
+                raise
+        finally:
+            # Closing releases the lock
+            await asyncio.to_thread(handle.close)
+
+        if hasher is not None:
+            self._hashers[upload_id] = (offset, hasher)
+        session["offset"] = offset
+        return session
+
+    async def complete(self, robot_id: str, upload_id: str) -> tuple:
+        """
+        Finish a session once every byte has arrived.
+
+        Returns:
+            (stored file, original filename).
+        """
+        session = await self.get_session(robot_id, upload_id)
+        if session["offset"] != session["size"]:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload incomplete: {session['offset']} of {session['size']} bytes received"
+            )
+
+        meta, part = self._session_paths(upload_id)
+        offset, hasher = self._hashers.pop(upload_id, (None, None))
+        if offset == session["size"]:
+            sha256 = hasher.hexdigest()
+        else:
+            # Resumed on another worker or after a restart: hash the file once
+            sha256 = await asyncio.to_thread(_hash_file, part, self.chunk_size)
+
+        stored = await asyncio.to_thread(self._commit, part, sha256, session["size"])
+        await asyncio.to_thread(meta.unlink, True)
+        return stored, session["filename"]
+
+    async def abort(self, robot_id: str, upload_id: str):
+        """Drop a session and its partial file"""
+        await self.get_session(robot_id, upload_id)
+        meta, part = self._session_paths(upload_id)
+        self._hashers.pop(upload_id, None)
+        await asyncio.to_thread(part.unlink, True)
+        await asyncio.to_thread(meta.unlink, True)
+
+def parse_content_range(header: Optional[str]) -> int:
+    """
+    Start offset from a `Content-Range: bytes <start>-<end>/<total|*>` header.
+    """
+    match = re.match(r"^bytes (\d+)-(\d+)/(\d+|\*)$", (header or "").strip())
+    if not match or int(match.group(2)) < int(match.group(1)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Content-Range must look like 'bytes <start>-<end>/<total>'"
+        )
+    return int(match.group(1))
+
+async def upload_size_middleware(request: Request, call_next):
+    """
+    Refuse an oversized single-request upload from its Content-Length,
+    before Starlette spools the body to parse the form.
+    """
+    if request.method == "POST" and SINGLE_UPLOAD_PATH.search(request.url.path):
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > robot_file_store.max_bytes + MULTIPART_OVERHEAD_BYTES:
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": f"Robot files are limited to {robot_file_store.max_bytes} bytes"},
+            )
+    return await call_next(request)
+
+robot_file_store = RobotFileStore(
+    settings.ROBOT_UPLOAD_DIR,
+    settings.ROBOT_UPLOAD_CHUNK_BYTES,
+    settings.ROBOT_UPLOAD_MAX_BYTES,
+    settings.ROBOT_UPLOAD_SESSION_TTL_SECONDS,
+)
@@ -0,0 +1,129 @@
+import re
+from typing import Optional
+
+from sqlalchemy import Select, column, func, literal_column, select, table, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import Message
+from app.models.robot_request import RobotRequest
+from app.utils.pagination import SearchParams, decode_rank_cursor, encode_rank_cursor
+
+TEXT_SEARCH_CONFIG = "english"
+
+# Weight of each column group in relevance, highest first (Postgres setweight A/B/C)
+GROUP_WEIGHTS = {"A": 10.0, "B": 4.0, "C": 1.0}
+
+class SearchIndex:
+    """
+    The full-text index of one table.
+
+    On Postgres it is the generated `search_vector` tsvector column with a
+    GIN index; on SQLite an FTS5 table named `<table>_fts`, whose rowids are
+    the INTEGER keys given to each row in `<table>_fts_keys` (the tables'
+    own rowids are not stable across VACUUM). Both are created by the
+    migrations and updated by the database on every write.
+    """
+
+    def __init__(self, model, columns: dict):
+        self.model = model
+        self.table = model.__tablename__
+        self.columns = columns  # weight group -> column names
+
+    @property
+    def column_names(self) -> list:
+        return [name for names in self.columns.values() for name in names]
+
+    def _postgresql(self, terms: str, query: Select):
+        tsquery = func.websearch_to_tsquery(literal_column(f"'{TEXT_SEARCH_CONFIG}'::regconfig"), terms)
+        vector = literal_column(f"{self.table}.search_vector")
+        ranked = query.add_columns(
+            func.ts_rank_cd(vector, tsquery).label("rank")
+        ).where(vector.op("@@")(tsquery)).subquery()
+
+        # Headlines are only built for the rows on the page
+        document = func.concat_ws(" … ", *(getattr(self.model, name) for name in self.column_names))
+        snippet = func.ts_headline(
+            literal_column(f"'{TEXT_SEARCH_CONFIG}'::regconfig"), document, tsquery,
+            "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5",
+        )
+        return ranked, snippet
+
+    def _sqlite(self, terms: str, query: Select):
+        keys = table(f"{self.table}_fts_keys", column("key"), column("id"))
+        fts = table(f"{self.table}_fts", column("rowid"))
+        fts_name = literal_column(f"{self.table}_fts")
+        weights = [GROUP_WEIGHTS[group] for group, names in self.columns.items() for _ in names]
+        # bm25 is lower for better matches; negate it so both backends rank descending.
+        # Auxiliary functions only work in the FTS query itself, so the snippet is taken here
+        ranked = query.add_columns(
+            (-func.bm25(fts_name, *weights)).label("rank"),
+            func.snippet(fts_name, -1, "<mark>", "</mark>", "…", 16).label("snippet"),
+        ).join(
+            keys, keys.c.id == self.model.id
+        ).join(
+            fts, fts.c.rowid == keys.c.key
+        ).where(fts_name.op("MATCH")(fts5_query(terms))).subquery()
+        return ranked, ranked.c.snippet
+
+    async def search(self, db: AsyncSession, page: SearchParams, *filters) -> list:
+        """
+        Run a ranked full-text query, one keyset page at a time.
+
+        Args:
+            db: The session to run the query on.
+            page: The query text and pagination parameters.
+            *filters: Extra conditions on the model (e.g. access scoping).
+
+        Returns:
+            Up to page.limit rows of (entity, rank, snippet), best match first.
+            The next cursor is set on the response headers.
+        """
+        dialect = db.bind.dialect.name
+        query = select(self.model.id.label("id")).where(*filters)
+        if dialect == "postgresql":
+            ranked, snippet = self._postgresql(page.q, query)
+        elif dialect == "sqlite":
+            if not fts5_query(page.q):
+                return []
+            ranked, snippet = self._sqlite(page.q, query)
+        else:
+            raise RuntimeError(f"Full-text search is not supported on {dialect}")
+
+        statement = select(self.model, ranked.c.rank, snippet.label("snippet")).join(
+            ranked, ranked.c.id == self.model.id
+        )
+        key = tuple_(ranked.c.rank, ranked.c.id)
+        if page.cursor:
+            statement = statement.where(key < tuple_(*decode_rank_cursor(page.cursor)))
+        statement = statement.order_by(ranked.c.rank.desc(), ranked.c.id.desc())
+
+        # Fetch one extra row to know whether there is a next page
+        rows = (await db.execute(statement.limit(page.limit + 1))).all()
+        if len(rows) > page.limit:
+            rows = rows[:page.limit]
+            next_cursor = encode_rank_cursor(rows[-1].rank, rows[-1][0].id)
+            next_url = page.request.url.include_query_params(cursor=next_cursor, limit=page.limit)
+            page.response.headers["X-Next-Cursor"] = next_cursor
+            page.response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+        return rows
+
+def fts5_query(terms: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query matching all of its words.
+
+    Each word is quoted so punctuation in user input is never read as FTS5
+    syntax. Returns None when there are no words to search for.
+    """
+    words = re.findall(r"\w+", terms)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+# Keep in step with the full_text_search migration
+message_index = SearchIndex(Message, {"A": ["content"]})
+robot_request_index = SearchIndex(RobotRequest, {
+    "A": ["bot_name", "robot_type", "trading_pairs", "market"],
+    "B": ["trading_strategy", "entry_rules", "exit_rules", "risk_management"],
+    "C": ["notes", "additional_parameters"],
+})
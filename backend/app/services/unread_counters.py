@@ -0,0 +1,267 @@
+import asyncio
+import logging
+from typing import Iterable, Union
+
+from sqlalchemy import case, exists, func, literal, not_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, advisory_lock, dialect_insert, insert_or_ignore
+from app.models.chat import Conversation, Message
+from app.models.notification import (
+    BroadcastNotification,
+    BroadcastNotificationRead,
+    Notification,
+    NotificationReadState,
+)
+from app.models.unread_counter import BroadcastTotal, UnreadCounter
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+def user_audiences(user: User) -> tuple:
+    """Broadcast audiences a user belongs to"""
+    return ("all", "admins") if user.is_admin else ("all", "users")
+
+def audience_members(audience: str):
+    """Select the ids of the users a broadcast audience reaches"""
+    members = select(User.id)
+    if audience != "all":
+        members = members.where(User.is_admin == (audience == "admins"))
+    return members
+
+async def adjust_unread(
+    db: AsyncSession,
+    user_ids: Union[str, Iterable[str]],
+    notifications: int = 0,
+    messages: int = 0,
+    broadcasts_seen: int = 0,
+):
+    """
+    Add to users' counters in the caller's transaction.
+
+    Users without a counter row are skipped; their row is computed exactly
+    the first time it is read.
+
+    Args:
+        db: The session making the change being counted.
+        user_ids: One user id or several.
+        notifications: Change in unread personal notifications.
+        messages: Change in unread chat messages.
+        broadcasts_seen: Change in broadcasts seen.
+    """
+    if isinstance(user_ids, str):
+        user_ids = [user_ids]
+    values = {}
+    if notifications:
+        values["notifications"] = case(
+            (UnreadCounter.notifications + notifications < 0, 0),
+            else_=UnreadCounter.notifications + notifications,
+        )
+    if messages:
+        values["messages"] = case(
+            (UnreadCounter.messages + messages < 0, 0),
+            else_=UnreadCounter.messages + messages,
+        )
+    if broadcasts_seen:
+        values["broadcasts_seen"] = UnreadCounter.broadcasts_seen + broadcasts_seen
+    if not values:
+        return
+
+    await db.execute(update(UnreadCounter).where(UnreadCounter.user_id.in_(list(user_ids))).values(values))
+
+async def count_broadcast(db: AsyncSession, audience: str):
+    """
+    Record a new broadcast in the caller's transaction.
+
+    The audience's total goes up by one, or is counted from the broadcasts
+    when it has no row yet. It is one upsert, so concurrent first broadcasts
+    to an audience cannot both insert. The counters of everyone in the
+    audience go up in the same single statement.
+    """
+    await db.flush()
+    insert = dialect_insert(db, BroadcastTotal).from_select(
+        ["audience", "total"],
+        select(literal(audience), func.count()).select_from(BroadcastNotification).where(
+            BroadcastNotification.audience == audience
+        ),
+    )
+    await db.execute(insert.on_conflict_do_update(
+        index_elements=[BroadcastTotal.audience],
+        set_={"total": BroadcastTotal.total + 1},
+    ))
+    await db.execute(update(UnreadCounter).where(
+        UnreadCounter.user_id.in_(audience_members(audience))
+    ).values(broadcasts_sent=UnreadCounter.broadcasts_sent + 1))
+
+def exact_counts_query():
+    """Select each user's counter values computed from the source tables"""
+    audience = case((User.is_admin == True, "admins"), else_="users")
+    in_audience = or_(BroadcastNotification.audience == "all", BroadcastNotification.audience == audience)
+
+    watermark = func.coalesce(
+        select(NotificationReadState.broadcasts_read_at).where(
+            NotificationReadState.user_id == User.id
+        ).correlate(User).scalar_subquery(),
+        User.created_at,
+    )
+    unread_broadcasts = select(func.count()).select_from(BroadcastNotification).where(
+        in_audience,
+        BroadcastNotification.created_at >= User.created_at,
+        BroadcastNotification.created_at > watermark,
+        not_(exists().where(
+            BroadcastNotificationRead.user_id == User.id,
+            BroadcastNotificationRead.broadcast_id == BroadcastNotification.id,
+        ).correlate(User, BroadcastNotification)),
+    ).scalar_subquery()
+
+    sent = select(func.coalesce(func.sum(BroadcastTotal.total), 0)).where(
+        or_(BroadcastTotal.audience == "all", BroadcastTotal.audience == audience)
+    ).scalar_subquery()
+
+    notifications = select(func.count()).select_from(Notification).where(
+        Notification.user_id == User.id,
+        Notification.is_read == False,
+    ).scalar_subquery()
+
+    messages = select(func.count()).select_from(Message).join(
+        Conversation, Conversation.id == Message.conversation_id
+    ).where(
+        Conversation.user_id == User.id,
+        Message.is_read == False,
+        Message.sender_id != User.id,
+    ).scalar_subquery()
+
+    return select(
+        User.id.label("user_id"),
+        notifications.label("notifications"),
+        messages.label("messages"),
+        (sent - unread_broadcasts).label("broadcasts_seen"),
+        sent.label("broadcasts_sent"),
+    )
+
+async def get_unread_counter(db: AsyncSession, user: User) -> UnreadCounter:
+    """The user's counter row, computed and stored on first use"""
+    counter = await db.get(UnreadCounter, user.id)
+    if counter:
+        return counter
+
+    row = (await db.execute(exact_counts_query().where(User.id == user.id))).one()
+    counter = UnreadCounter(
+        user_id=user.id,
+        notifications=row.notifications,
+        messages=row.messages,
+        broadcasts_seen=row.broadcasts_seen,
+        broadcasts_sent=row.broadcasts_sent,
+    )
+    db.add(counter)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another request created it first
+        await db.rollback()
+        counter = await db.get(UnreadCounter, user.id)
+    return counter
+
+async def get_unread_notification_total(db: AsyncSession, user: User) -> int:
+    """Unread personal notifications plus unread broadcasts, from the counter row only"""
+    counter = await get_unread_counter(db, user)
+    return max(counter.notifications + counter.broadcasts_sent - counter.broadcasts_seen, 0)
+
+async def _reconcile(chunk_size: int) -> dict:
+    checked = repaired = created = 0
+    async with AsyncSessionLocal() as db:
+        # Broadcast totals first; seen counts are relative to them
+        await db.execute(select(BroadcastTotal.audience).order_by(BroadcastTotal.audience).with_for_update())
+        actual = select(func.count()).select_from(BroadcastNotification).where(
+            BroadcastNotification.audience == BroadcastTotal.audience
+        ).scalar_subquery()
+        await db.execute(update(BroadcastTotal).where(BroadcastTotal.total != actual).values(total=actual))
+        await db.execute(insert_or_ignore(db, BroadcastTotal).from_select(
+            ["audience", "total"],
+            select(BroadcastNotification.audience, func.count()).where(~exists().where(
+                BroadcastTotal.audience == BroadcastNotification.audience
+            )).group_by(BroadcastNotification.audience),
+        ))
+        await db.commit()
+
+        last_id = None
+        while True:
+            query = select(User.id).order_by(User.id).limit(chunk_size)
+            if last_id is not None:
+                query = query.where(User.id > last_id)
+            user_ids = (await db.scalars(query)).all()
+            if not user_ids:
+                break
+
+            # Lock the chunk's counters first. adjust_unread calls that got
+            # there before us are committed, so the counts below include
+            # their rows; later ones wait and apply on top of the result.
+            await db.execute(
+                select(UnreadCounter.user_id).where(UnreadCounter.user_id.in_(user_ids))
+                .order_by(UnreadCounter.user_id).with_for_update()
+            )
+            exact = exact_counts_query().where(User.id.in_(user_ids)).subquery()
+            result = await db.execute(update(UnreadCounter).where(
+                UnreadCounter.user_id == exact.c.user_id,
+                or_(
+                    UnreadCounter.notifications != exact.c.notifications,
+                    UnreadCounter.messages != exact.c.messages,
+                    UnreadCounter.broadcasts_seen != exact.c.broadcasts_seen,
+                    UnreadCounter.broadcasts_sent != exact.c.broadcasts_sent,
+                ),
+            ).values(
+                notifications=exact.c.notifications,
+                messages=exact.c.messages,
+                broadcasts_seen=exact.c.broadcasts_seen,
+                broadcasts_sent=exact.c.broadcasts_sent,
+            ))
+            repaired += result.rowcount
+            result = await db.execute(insert_or_ignore(db, UnreadCounter).from_select(
+                ["user_id", "notifications", "messages", "broadcasts_seen", "broadcasts_sent"],
+                select(
+                    exact.c.user_id, exact.c.notifications, exact.c.messages,
+                    exact.c.broadcasts_seen, exact.c.broadcasts_sent,
+                ).where(
+                    ~exists().where(UnreadCounter.user_id == exact.c.user_id)
+                ),
+            ))
+            created += result.rowcount
+            await db.commit()
+
+            checked += len(user_ids)
+            last_id = user_ids[-1]
+
+    if repaired:
+        logger.warning("Repaired %d drifted unread counters", repaired)
+    return {"checked": checked, "repaired": repaired, "created": created, "skipped": False}
+
+async def reconcile_unread_counters(chunk_size: int = 1000) -> dict:
+    """
+    Recompute broadcast totals and every user's counters from the source
+    tables, fixing rows that drifted and creating missing ones.
+
+    Counters are recomputed and written in one statement per chunk while
+    their rows are locked, so writes made during the run are not lost.
+    Only one process reconciles at a time; the others skip.
+
+    Returns:
+        The number of users checked and counters repaired and created.
+    """
+    async with advisory_lock("reconcile_unread_counters") as leader:
+        if not leader:
+            return {"checked": 0, "repaired": 0, "created": 0, "skipped": True}
+        return await _reconcile(chunk_size)
+
+async def reconcile_periodically(interval_seconds: int):
+    """Run reconcile_unread_counters forever, every interval_seconds"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await reconcile_unread_counters()
+        except Exception:
+            logger.exception("Unread counter reconciliation failed")
+
+if __name__ == "__main__":
+    # For cron, with UNREAD_RECONCILE_INTERVAL_SECONDS=0 in the workers
+    print(asyncio.run(reconcile_unread_counters()))
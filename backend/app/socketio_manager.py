@@ -0,0 +1,204 @@
+"""
+Socket.IO client managers.
+
+A client manager decides how an emit reaches sockets. With one worker the
+default in-process manager is enough; with several gunicorn workers (or
+nodes) each emit has to go through a message bus so every worker delivers
+it to the sockets it holds.
+
+    SOCKETIO_MESSAGE_QUEUE unset            in-process (single worker)
+    SOCKETIO_MESSAGE_QUEUE=database         Postgres LISTEN/NOTIFY on DATABASE_URL
+    SOCKETIO_MESSAGE_QUEUE=postgresql://... Postgres LISTEN/NOTIFY on that server
+    SOCKETIO_MESSAGE_QUEUE=redis://...      Redis pub/sub
+
+The same bus carries worker signals: emits to WORKERS_NAMESPACE, which no
+client can join, run the handlers registered with on_worker_signal on every
+worker instead of reaching sockets.
+"""
+import asyncio
+import base64
+import logging
+import zlib
+from typing import Optional
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from sqlalchemy.engine import make_url
+
+from .config import settings
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7999
+# Payloads above this are sent zlib-compressed
+COMPRESS_THRESHOLD = 1024
+COMPRESSED_PREFIX = "z:"
+
+# Namespace for messages between workers; handled in-process, never delivered to sockets
+WORKERS_NAMESPACE = "/_workers"
+
+_worker_handlers = {}  # event -> handlers
+
+def on_worker_signal(event: str):
+    """Register a handler run on every worker when `event` is signalled"""
+    def register(handler):
+        _worker_handlers.setdefault(event, []).append(handler)
+        return handler
+    return register
+
+async def run_worker_signal(event: str, data=None):
+    """Run this worker's handlers for a signal"""
+    for handler in _worker_handlers.get(event, ()):
+        try:
+            result = handler(data)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            logger.exception("Worker signal handler for %s failed", event)
+
+class WorkerSignalMixin:
+    """Routes emits to WORKERS_NAMESPACE to the signal handlers"""
+
+    async def _handle_emit(self, message):
+        if message.get("namespace") != WORKERS_NAMESPACE:
+            return await super()._handle_emit(message)
+        data = message.get("data") or [None]
+        await run_worker_signal(message["event"], data[0])
+
+def asyncpg_dsn(url: str) -> str:
+    """A libpq-style DSN for asyncpg from any SQLAlchemy Postgres URL"""
+    url = make_url(url).set(drivername="postgresql")
+    query = dict(url.query)
+    if "ssl" in query and "sslmode" not in query:
+        query["sslmode"] = query.pop("ssl")
+    return url.set(query=query).render_as_string(hide_password=False)
+
+class AsyncPostgresManager(WorkerSignalMixin, AsyncPubSubManager):
+    """
+    Client manager that relays emits between workers with Postgres
+    LISTEN/NOTIFY, so no broker beyond the database is needed.
+
+    Each worker keeps one connection for publishing and one listening on
+    the channel. Both reconnect with exponential backoff after a failure.
+    """
+    name = "asyncpg"
+
+    def __init__(self, url: str, channel: str = "socketio", write_only: bool = False, logger=None):
+        if asyncpg is None:
+            raise RuntimeError("asyncpg is required for a Postgres SOCKETIO_MESSAGE_QUEUE")
+        self.dsn = asyncpg_dsn(url)
+        self._publish_conn = None
+        self._publish_lock = asyncio.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _encode(self, data) -> Optional[str]:
+        payload = self.json.dumps(data)
+        if len(payload.encode()) > COMPRESS_THRESHOLD:
+            payload = COMPRESSED_PREFIX + base64.b64encode(zlib.compress(payload.encode())).decode()
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            return None
+        return payload
+
+    def _decode(self, payload: str) -> str:
+        if payload.startswith(COMPRESSED_PREFIX):
+            return zlib.decompress(base64.b64decode(payload[len(COMPRESSED_PREFIX):])).decode()
+        return payload
+
+    async def _publish(self, data):
+        payload = self._encode(data)
+        if payload is None:
+            # Sockets on this worker already got it; the others cannot
+            logger.error(
+                "Socket.IO %s message too large for NOTIFY, not sent to other workers",
+                data.get("event") if isinstance(data, dict) else "",
+            )
+            return
+
+        retry = True
+        async with self._publish_lock:
+            while True:
+                try:
+                    if self._publish_conn is None or self._publish_conn.is_closed():
+                        self._publish_conn = await asyncpg.connect(self.dsn)
+                    await self._publish_conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+                    return
+                except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                    self._publish_conn = None
+                    if retry:
+                        logger.error("Cannot publish to Postgres, retrying")
+                        retry = False
+                    else:
+                        logger.exception("Cannot publish to Postgres, giving up")
+                        return
+
+    async def _listen(self):
+        retry_sleep = 1
+        connect = False
+        while True:
+            conn = None
+            try:
+                if connect:
+                    await asyncio.sleep(retry_sleep)
+                    retry_sleep = min(retry_sleep * 2, 60)
+
+                messages: asyncio.Queue = asyncio.Queue()
+                closed = asyncio.Event()
+                conn = await asyncpg.connect(self.dsn)
+                conn.add_termination_listener(lambda _conn: closed.set())
+                await conn.add_listener(
+                    self.channel, lambda _conn, _pid, _channel, payload: messages.put_nowait(payload)
+                )
+                retry_sleep = 1
+
+                while True:
+                    get = asyncio.ensure_future(messages.get())
+                    lost = asyncio.ensure_future(closed.wait())
+                    done, _ = await asyncio.wait({get, lost}, return_when=asyncio.FIRST_COMPLETED)
+                    if get not in done:
+                        get.cancel()
+                        raise ConnectionError("listener connection closed")
+                    lost.cancel()
+                    yield self._decode(get.result())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.error("Postgres listener disconnected, retrying in %d seconds", retry_sleep)
+                connect = True
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+class AsyncRedisManager(WorkerSignalMixin, socketio.AsyncRedisManager):
+    """python-socketio's Redis manager, carrying worker signals too"""
+
+def create_client_manager(message_queue: Optional[str], channel: str = "socketio"):
+    """
+    Build the client manager for a SOCKETIO_MESSAGE_QUEUE setting.
+
+    Args:
+        message_queue: None for in-process delivery, "database" for the app's
+            own Postgres, or a postgresql:// or redis:// URL.
+        channel: Pub/sub channel shared by all workers.
+
+    Returns:
+        A client manager for socketio.AsyncServer.
+    """
+    if not message_queue:
+        return socketio.AsyncManager()
+
+    if message_queue == "database":
+        message_queue = settings.DATABASE_URL
+
+    backend = make_url(message_queue).get_backend_name() if "://" in message_queue else ""
+    if backend == "postgresql":
+        return AsyncPostgresManager(message_queue, channel=channel)
+    if message_queue.startswith(("redis://", "rediss://", "unix://")):
+        return AsyncRedisManager(message_queue, channel=channel)
+
+    raise ValueError(f"Unsupported SOCKETIO_MESSAGE_QUEUE: {message_queue}")
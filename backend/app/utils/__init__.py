@@ -1,4 +1,4 @@
 
-from .auth import verify_password, get_password_hash, create_access_token, get_user_from_token, get_admin_user
-from .hash_password import hash_password, verify_password
+from .auth import verify_password, get_password_hash, create_access_token, get_user_from_token, get_admin_user, CurrentUser, AdminUser, OwnerOrAdmin
+from .hash_password import hash_password, verify_password, hash_password_async, verify_password_async
 
@@ -1,16 +1,18 @@
 import os
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Annotated, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
 from ..database import get_db
 from ..models.user import User
+from .user_cache import token_user_cache
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -36,17 +38,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def resolve_user_from_token(token: str, db: AsyncSession) -> User:
+    """
+    Verify an access token and load its user into the given session.
+
+    Verified tokens are cached with a snapshot of their user, so a cache hit
+    skips both the JWT decode and the users query.
+
+    Raises:
+        HTTPException: 401 if the token is invalid or the user no longer exists.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        # Clean the token if it includes 'Bearer '
-        if token and token.startswith("Bearer "):
-            token = token.replace("Bearer ", "")
+    # Clean the token if it includes 'Bearer '
+    if token and token.startswith("Bearer "):
+        token = token.replace("Bearer ", "")
+
+    snapshot = token_user_cache.get(token)
+    if snapshot is not None:
+        return await db.merge(snapshot, load=False)
 
+    try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
@@ -55,33 +70,67 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         print(f"JWT Error: {str(e)}")
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user is None:
         raise credentials_exception
+
+    token_user_cache.put(token, user, payload.get("exp"))
+    return user
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    # Resolve the user once per request, however many dependencies ask for it
+    memo = getattr(request.state, "current_user", None)
+    if memo is not None and memo[0] == token:
+        return memo[1]
+
+    user = await resolve_user_from_token(token, db)
+    request.state.current_user = (token, user)
     return user
 
 # Alias for compatibility with existing code
 get_user_from_token = get_current_user
 
-async def get_admin_user(authorization: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_admin_user(current_user: User = Depends(get_current_user)):
     """
     Get the admin user from the Authorization header token.
 
     Args:
-        authorization: The Authorization header value.
-        db: The database session.
+        current_user: The user resolved from the token.
 
     Returns:
         The admin user if the token is valid and the user is an admin, raises an exception otherwise.
     """
-    # Get the user ID from the token
-    user = await get_current_user(authorization=authorization, db=db)
-
-    # Check if the user is an admin
-    if not user.is_admin:
+    if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized - admin access required"
         )
 
-    return user
\ No newline at end of file
+    return current_user
+
+# Typed dependencies for routers
+CurrentUser = Annotated[User, Depends(get_current_user)]
+AdminUser = Annotated[User, Depends(get_admin_user)]
+
+def OwnerOrAdmin(path_param: str = "user_id"):
+    """
+    Dependency type for routes scoped to one user, e.g. /users/{user_id}/...
+
+    Resolves the current user and allows the request only if they own the
+    resource named by the path parameter or are an admin.
+
+    Args:
+        path_param: The path parameter holding the owner's user ID.
+
+    Returns:
+        An annotated User type usable as a route parameter annotation.
+    """
+    async def owner_or_admin(request: Request, current_user: CurrentUser) -> User:
+        if current_user.id != request.path_params.get(path_param) and not current_user.is_admin:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this user's resources"
+            )
+        return current_user
+
+    return Annotated[User, Depends(owner_or_admin)]
@@ -1,5 +1,12 @@
 
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
+from fastapi import HTTPException, status
+
+from ..config import settings
 
 def hash_password(password: str) -> str:
     """
@@ -35,3 +42,87 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     
     # Check if the passwords match
     return bcrypt.checkpw(plain_password_bytes, hashed_password_bytes)
+
+class HashingExecutor:
+    """
+    Bounded worker pool for bcrypt work.
+
+    bcrypt releases the GIL while hashing, so a small thread pool keeps the
+    event loop free. Once all workers are busy and the queue is full, new
+    calls are rejected with 429 instead of piling up behind a login storm.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+
+    async def run(self, func, *args):
+        """
+        Run a hashing function on the pool.
+
+        Raises:
+            HTTPException: 429 when the pool and its queue are saturated.
+        """
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many authentication requests, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.total_ms += (time.perf_counter() - start) * 1000
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_limit": self.max_queue,
+            "in_flight": min(self.pending, self.max_workers),
+            "queue_depth": max(self.pending - self.max_workers, 0),
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_ms / self.completed, 3) if self.completed else 0.0,
+        }
+
+hashing_executor = HashingExecutor(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_SIZE)
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a password on the hashing pool.
+
+    Args:
+        password: The plain text password to hash.
+
+    Returns:
+        The hashed password as a string.
+    """
+    return await hashing_executor.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against its hash on the hashing pool.
+
+    Args:
+        plain_password: The plain text password to check.
+        hashed_password: The hashed password to check against.
+
+    Returns:
+        True if the password matches the hash, False otherwise.
+    """
+    return await hashing_executor.run(verify_password, plain_password, hashed_password)
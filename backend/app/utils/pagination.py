@@ -0,0 +1,269 @@
+import base64
+import json
+from datetime import datetime
+from typing import Annotated, Optional
+
+from fastapi import Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import DateTime, Select, func, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from ..config import settings
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    """
+    Encode a keyset position as an opaque cursor.
+
+    Args:
+        created_at: Creation time of the last row on the page.
+        id: Primary key of the last row, breaking ties on created_at.
+
+    Returns:
+        A URL-safe token for the next page.
+    """
+    payload = json.dumps([created_at.isoformat() if created_at else None, id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_cursor back into (created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded))
+        return (datetime.fromisoformat(created_at) if created_at else None), str(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+class sortable_time(FunctionElement):
+    """
+    A timestamp in a form that compares in time order on every database.
+
+    SQLite keeps timestamps as text: func.now() stores 'YYYY-MM-DD HH:MM:SS'
+    while bound datetimes are written with '.ffffff', so the same instant
+    compares as two different strings. There both sides are normalised with
+    strftime; elsewhere the column is used as it is, so indexes still apply.
+    """
+    type = DateTime()
+    name = "sortable_time"
+    inherit_cache = True
+
+@compiles(sortable_time)
+def _compile_sortable_time(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+@compiles(sortable_time, "sqlite")
+def _compile_sortable_time_sqlite(element, compiler, **kw):
+    return compiler.process(func.strftime("%Y-%m-%d %H:%M:%f", *element.clauses), **kw)
+
+def keyset(model):
+    """The (created_at, id) sort key of a model or subquery"""
+    return tuple_(sortable_time(model.created_at), model.id)
+
+def keyset_position(model, position: tuple):
+    """A (created_at, id) position, e.g. a decoded cursor, comparable with keyset(model)"""
+    created_at, id = position
+    return tuple_(sortable_time(literal(created_at, model.created_at.type)), id)
+
+class PageParams:
+    """
+    Cursor and page size for a list endpoint.
+
+    The cursor for the following page is returned in the X-Next-Cursor
+    header (and as a rel="next" Link) so response bodies stay plain lists.
+    Without a cursor or a limit the whole list is returned, as it was before
+    pagination, so clients that do not follow cursors see every row.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+        limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_SIZE_MAX, description="Page size; omit with cursor for the whole list"),
+    ):
+        self.request = request
+        self.response = response
+        self.cursor = cursor
+        # A cursor without a limit continues with the default page size
+        self.limit = settings.PAGE_SIZE_DEFAULT if limit is None and cursor is not None else limit
+
+Pagination = Annotated[PageParams, Depends(PageParams)]
+
+async def paginate(db: AsyncSession, query: Select, model, page: PageParams, descending: bool = False) -> list:
+    """
+    Run a select one keyset page at a time, ordered by (created_at, id).
+
+    Args:
+        db: The session to run the query on.
+        query: A select of `model` with any filters already applied.
+        model: The mapped class, or the `.c` of a subquery, with `created_at`
+            and `id` columns.
+        page: The request's pagination parameters.
+        descending: Newest first, or oldest first (default).
+
+    Returns:
+        Up to page.limit rows (entities when a single entity is selected), or
+        every row when page.limit is None. The next cursor is set on the
+        response headers.
+    """
+    key = keyset(model)
+    if page.cursor:
+        position = keyset_position(model, decode_cursor(page.cursor))
+        query = query.where(key < position if descending else key > position)
+
+    created_at = sortable_time(model.created_at)
+    if descending:
+        query = query.order_by(created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(created_at, model.id)
+
+    # Fetch one extra row to know whether there is a next page
+    if page.limit is not None:
+        query = query.limit(page.limit + 1)
+    result = await db.execute(query)
+    rows = (result.scalars() if len(query.column_descriptions) == 1 else result).all()
+    if page.limit is not None and len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        next_url = page.request.url.include_query_params(cursor=next_cursor, limit=page.limit)
+        page.response.headers["X-Next-Cursor"] = next_cursor
+        page.response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+    return rows
+
+class WindowParams:
+    """
+    A window of a time-ordered history, e.g. chat messages.
+
+    Without a cursor the window is the newest `limit` rows. `before` and
+    `after` take the cursors returned in X-Before-Cursor / X-After-Cursor to
+    move through older or newer rows; `around` centres the window on one
+    row. Rows are always returned oldest first.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        before: Optional[str] = Query(None, description="Cursor from X-Before-Cursor: load older rows"),
+        after: Optional[str] = Query(None, description="Cursor from X-After-Cursor: load newer rows"),
+        around: Optional[str] = Query(None, description="Id of the row to centre the window on"),
+        limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    ):
+        if sum(value is not None for value in (before, after, around)) > 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Use only one of before, after and around"
+            )
+        self.request = request
+        self.response = response
+        self.before = before
+        self.after = after
+        self.around = around
+        self.limit = limit
+
+Window = Annotated[WindowParams, Depends(WindowParams)]
+
+async def fetch_window(db: AsyncSession, query: Select, model, window: WindowParams, anchor: Optional[tuple] = None) -> list:
+    """
+    Load one window of rows ordered by (created_at, id).
+
+    Each direction is a single keyset range scan of at most limit + 1 rows,
+    so the cost does not grow with the length of the history.
+
+    Args:
+        db: The session to run the query on.
+        query: A select of `model` with any filters already applied.
+        model: The mapped class with `created_at` and `id` columns.
+        window: The request's window parameters.
+        anchor: (created_at, id) of the `around` row, resolved by the caller.
+
+    Returns:
+        Up to window.limit entities, oldest first. Cursors for older and newer
+        rows are set on the response headers when more exist.
+    """
+    key = keyset(model)
+    newest_first = (sortable_time(model.created_at).desc(), model.id.desc())
+    oldest_first = (sortable_time(model.created_at), model.id)
+
+    async def older(position, count):
+        q = query if position is None else query.where(key < keyset_position(model, position))
+        rows = (await db.scalars(q.order_by(*newest_first).limit(count + 1))).all()
+        return list(reversed(rows[:count])), len(rows) > count
+
+    async def newer(position, count, inclusive=False):
+        q = query.where(key >= keyset_position(model, position) if inclusive else key > keyset_position(model, position))
+        rows = (await db.scalars(q.order_by(*oldest_first).limit(count + 1))).all()
+        return list(rows[:count]), len(rows) > count
+
+    limit = window.limit
+    if window.before:
+        rows, more_before = await older(decode_cursor(window.before), limit)
+        more_after = True
+    elif window.after:
+        rows, more_after = await newer(decode_cursor(window.after), limit)
+        more_before = True
+    elif anchor is not None:
+        before_rows, more_before = await older(anchor, limit // 2)
+        after_rows, more_after = await newer(anchor, limit - limit // 2, inclusive=True)
+        rows = before_rows + after_rows
+    else:
+        rows, more_before = await older(None, limit)
+        more_after = False
+
+    links = []
+    if rows and more_before:
+        cursor = encode_cursor(rows[0].created_at, rows[0].id)
+        window.response.headers["X-Before-Cursor"] = cursor
+        url = window.request.url.remove_query_params(["after", "around"]).include_query_params(before=cursor, limit=limit)
+        links.append(f'<{url}>; rel="prev"')
+    if rows and more_after:
+        cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        window.response.headers["X-After-Cursor"] = cursor
+        url = window.request.url.remove_query_params(["before", "around"]).include_query_params(after=cursor, limit=limit)
+        links.append(f'<{url}>; rel="next"')
+    if links:
+        window.response.headers["Link"] = ", ".join(links)
+
+    return rows
+
+def encode_rank_cursor(rank: float, id: str) -> str:
+    """Encode the (rank, id) of the last ranked search hit as an opaque cursor"""
+    payload = json.dumps([rank, id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_rank_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_rank_cursor back into (rank, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), str(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+class SearchParams(PageParams):
+    """
+    A full-text query and one page of its ranked hits.
+
+    Hits are ordered by relevance; the cursor for the next page is returned
+    in X-Next-Cursor like the other list endpoints.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        q: str = Query(..., min_length=1, max_length=200, description="Words to search for"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+        limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    ):
+        super().__init__(request, response, cursor, limit)
+        self.q = q
+
+Search = Annotated[SearchParams, Depends(SearchParams)]
@@ -0,0 +1,68 @@
+"""
+Test setup: a throwaway SQLite database and the real app.
+
+Settings are read at import time, so the environment is set before
+anything under app/ is imported.
+"""
+import os
+import tempfile
+
+DB_DIR = tempfile.mkdtemp(prefix="tradewizard-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/test.db"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_DIR}/test.db"
+os.environ["SQL_DEBUG_HEADERS"] = "true"
+os.environ["ROBOT_UPLOAD_DIR"] = os.path.join(DB_DIR, "uploads")
+for name in (
+    "JWT_SECRET_KEY",
+    "M_PESA_API_URL",
+    "M_PESA_CONSUMER_KEY",
+    "M_PESA_CONSUMER_SECRET",
+    "M_PESA_SHORTCODE",
+    "M_PESA_LIPA_NA_MPESA_SHORTCODE",
+    "M_PESA_LIPA_NA_MPESA_SHORTCODE_LIPA",
+):
+    os.environ.setdefault(name, "test")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.models.robot import Robot
+from app.models.user import User
+from app.utils.auth import create_access_token
+from app.utils.user_cache import token_user_cache
+
+# robots.features is a Postgres ARRAY; nothing under test needs the table on SQLite
+TABLES = [table for table in Base.metadata.sorted_tables if table is not Robot.__table__]
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.create_all(engine, tables=TABLES)
+    token_user_cache.clear()
+    yield
+    Base.metadata.drop_all(engine, tables=TABLES)
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+@pytest.fixture
+def client():
+    # No lifespan: the background jobs started at startup stay off
+    return TestClient(app)
+
+def make_user(db, name: str = "Trader", is_admin: bool = False) -> User:
+    user = User(name=name, email=f"{name.lower().replace(' ', '.')}@example.com", password="x", is_admin=is_admin)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+
+def query_count(response) -> int:
+    """SQL statements the request issued, as counted by app.query_metrics"""
+    return int(response.headers["X-DB-Query-Count"])
@@ -0,0 +1,65 @@
+"""Marking a conversation read up to a message or a time"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.main import app
+from app.models.chat import Conversation, Message
+
+from conftest import auth_headers, make_user
+
+def support_thread(db):
+    """A user's conversation with three replies from support, one minute apart"""
+    user = make_user(db)
+    admin = make_user(db, "Support", is_admin=True)
+    conversation = Conversation(title="Support", user_id=user.id)
+    db.add(conversation)
+    db.flush()
+    replies = [
+        Message(conversation_id=conversation.id, sender_id=admin.id, content=f"Reply {minute}",
+                created_at=datetime(2026, 1, 1, 10, minute, 0))
+        for minute in range(3)
+    ]
+    db.add_all(replies)
+    db.commit()
+    # As written by func.now() on SQLite: no fractional seconds
+    db.execute(text("UPDATE messages SET created_at = strftime('%Y-%m-%d %H:%M:%S', created_at)"))
+    db.commit()
+    return user, conversation, replies
+
+def read_ids(db, conversation) -> set:
+    db.expire_all()
+    return {message.id for message in db.query(Message).filter_by(conversation_id=conversation.id, is_read=True)}
+
+def test_read_up_to_message(client, db):
+    user, conversation, replies = support_thread(db)
+
+    response = client.put(
+        app.url_path_for("mark_conversation_as_read", conversation_id=conversation.id),
+        json={"up_to_message_id": replies[1].id}, headers=auth_headers(user),
+    )
+    assert response.status_code == 200
+    assert response.json()["read_count"] == 2
+    assert read_ids(db, conversation) == {replies[0].id, replies[1].id}
+
+def test_read_up_to_time_with_offset(client, db):
+    user, conversation, replies = support_thread(db)
+
+    # 13:01+03:00 is 10:01 UTC: the second reply exactly, not all three
+    response = client.put(
+        app.url_path_for("mark_conversation_as_read", conversation_id=conversation.id),
+        json={"up_to": "2026-01-01T13:01:00+03:00"}, headers=auth_headers(user),
+    )
+    assert response.status_code == 200
+    assert response.json()["read_count"] == 2
+    assert read_ids(db, conversation) == {replies[0].id, replies[1].id}
+
+def test_read_up_to_naive_time(client, db):
+    user, conversation, replies = support_thread(db)
+
+    response = client.put(
+        app.url_path_for("mark_conversation_as_read", conversation_id=conversation.id),
+        json={"up_to": "2026-01-01T10:00:00"}, headers=auth_headers(user),
+    )
+    assert response.json()["read_count"] == 1
+    assert read_ids(db, conversation) == {replies[0].id}
@@ -0,0 +1,53 @@
+"""Conversation summaries: last message, counts and unread, in one query"""
+from datetime import datetime
+
+from app.main import app
+from app.models.chat import Conversation, Message
+
+from conftest import auth_headers, make_user
+
+def test_summaries_carry_last_message_and_unread_count(client, db):
+    user = make_user(db)
+    admin = make_user(db, "Support", is_admin=True)
+    quiet = Conversation(title="Quiet", user_id=user.id, created_at=datetime(2026, 1, 1, 9))
+    busy = Conversation(title="Busy", user_id=user.id, created_at=datetime(2026, 1, 1, 8))
+    empty = Conversation(title="Empty", user_id=user.id, created_at=datetime(2026, 1, 1, 7))
+    db.add_all([quiet, busy, empty])
+    db.flush()
+    db.add_all([
+        Message(conversation_id=quiet.id, sender_id=user.id, content="Hello", created_at=datetime(2026, 1, 1, 9, 30)),
+        Message(conversation_id=busy.id, sender_id=user.id, content="Question", created_at=datetime(2026, 1, 1, 10)),
+        Message(conversation_id=busy.id, sender_id=admin.id, content="Answer", created_at=datetime(2026, 1, 1, 11)),
+        Message(conversation_id=busy.id, sender_id=admin.id, content="Follow-up", created_at=datetime(2026, 1, 1, 12)),
+    ])
+    db.commit()
+
+    response = client.get(app.url_path_for("get_conversations"), headers=auth_headers(user))
+    assert response.status_code == 200
+    summaries = response.json()
+    assert [summary["title"] for summary in summaries] == ["Busy", "Quiet", "Empty"]
+
+    busy_summary, quiet_summary, empty_summary = summaries
+    assert busy_summary["last_message"] == "Follow-up"
+    assert busy_summary["last_message_sender_id"] == admin.id
+    assert busy_summary["message_count"] == 3
+    # The user's own message does not count as unread for them
+    assert busy_summary["unread_count"] == 2
+    assert quiet_summary["unread_count"] == 0
+    assert empty_summary["last_message"] is None
+    assert empty_summary["message_count"] == 0
+
+def test_single_summary_is_for_the_owner_only(client, db):
+    user = make_user(db)
+    other = make_user(db, "Other")
+    conversation = Conversation(title="Mine", user_id=user.id)
+    db.add(conversation)
+    db.flush()
+    db.add(Message(conversation_id=conversation.id, sender_id=user.id, content="Hi"))
+    db.commit()
+
+    url = app.url_path_for("get_conversation", conversation_id=conversation.id)
+    response = client.get(url, headers=auth_headers(user))
+    assert response.status_code == 200
+    assert response.json()["message_count"] == 1
+    assert client.get(url, headers=auth_headers(other)).status_code == 403
@@ -0,0 +1,40 @@
+"""The async database layer the routers run on"""
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_database_url, get_db
+from app.models.user import User
+
+from conftest import auth_headers, make_user
+
+def test_async_url_uses_async_drivers():
+    assert get_async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert get_async_database_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert get_async_database_url("postgresql+psycopg2://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+def test_async_url_passes_sslmode_as_ssl():
+    url = get_async_database_url("postgresql://u:p@db/app?sslmode=require")
+    assert url == "postgresql+asyncpg://u:p@db/app?ssl=require"
+
+def test_get_db_yields_an_async_session(db):
+    user = make_user(db)
+
+    async def scenario():
+        sessions = get_db()
+        session = await sessions.__anext__()
+        try:
+            assert isinstance(session, AsyncSession)
+            return await session.scalar(select(User.name).where(User.id == user.id))
+        finally:
+            await sessions.aclose()
+
+    assert asyncio.run(scenario()) == "Trader"
+
+def test_router_reads_and_writes_through_the_async_session(client, db):
+    user = make_user(db)
+    response = client.put(f"/api/users/{user.id}", json={"name": "Renamed"}, headers=auth_headers(user))
+    assert response.status_code == 200
+    db.expire_all()
+    assert db.get(User, user.id).name == "Renamed"
@@ -0,0 +1,53 @@
+"""bcrypt runs on a bounded pool and sheds load with 429"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.user import User
+from app.utils.hash_password import HashingExecutor, hash_password, hashing_executor
+
+def test_saturated_pool_rejects_with_429():
+    executor = HashingExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        # One call hashing, one queued behind it
+        running = [asyncio.create_task(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            await executor.run(release.wait)
+        snapshot = executor.snapshot()
+        release.set()
+        await asyncio.gather(*running)
+        return error.value, snapshot
+
+    error, snapshot = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert error.headers["Retry-After"] == "1"
+    assert snapshot["in_flight"] == 1
+    assert snapshot["queue_depth"] == 1
+    assert snapshot["rejected"] == 1
+    assert executor.snapshot()["completed"] == 2
+
+def test_login_verifies_on_the_pool(client, db):
+    db.add(User(name="Trader", email="trader@example.com", password=hash_password("secret")))
+    db.commit()
+    completed = hashing_executor.completed
+    response = client.post("/api/auth/login", json={"email": "trader@example.com", "password": "secret"})
+    assert response.status_code == 200
+    assert hashing_executor.completed == completed + 1
+
+def test_login_returns_429_when_the_pool_is_full(client, db, monkeypatch):
+    db.add(User(name="Trader", email="trader@example.com", password=hash_password("secret")))
+    db.commit()
+    monkeypatch.setattr(hashing_executor, "pending", hashing_executor.max_workers + hashing_executor.max_queue)
+    response = client.post("/api/auth/login", json={"email": "trader@example.com", "password": "secret"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+def test_register_returns_429_when_the_pool_is_full(client, monkeypatch):
+    monkeypatch.setattr(hashing_executor, "pending", hashing_executor.max_workers + hashing_executor.max_queue)
+    response = client.post("/api/auth/register", json={"name": "New", "email": "new@example.com", "password": "secret"})
+    assert response.status_code == 429
@@ -0,0 +1,32 @@
+"""The index advisor flags query shapes that scan a whole table"""
+from sqlalchemy import select, text
+
+from app.database import engine
+from app.index_advisor import _postgresql_seq_scans, find_seq_scans, main, query_shapes
+from app.models.purchase import Purchase
+
+def test_every_query_shape_uses_an_index(capsys):
+    assert main() == 0
+    assert f"0 of {len(query_shapes())} query shapes need an index" in capsys.readouterr().out
+
+def test_missing_index_is_reported():
+    statement = select(Purchase).where(Purchase.mpesa_checkout_request_id == "x")
+    index = next(index for index in Purchase.__table__.indexes if "mpesa_checkout_request_id" in index.columns)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(f"DROP INDEX {index.name}"))
+            assert find_seq_scans(conn, statement) == ["purchases"]
+            conn.rollback()
+    finally:
+        # sqlite3 caches statements per connection, EXPLAIN output included
+        engine.dispose()
+
+def test_postgresql_plans_are_searched_for_seq_scans():
+    plan = {
+        "Node Type": "Nested Loop",
+        "Plans": [
+            {"Node Type": "Index Scan", "Relation Name": "users"},
+            {"Node Type": "Hash", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "messages"}]},
+        ],
+    }
+    assert _postgresql_seq_scans(plan) == ["messages"]
@@ -0,0 +1,78 @@
+"""Chat history windows: newest by default, then before, after and around"""
+from datetime import datetime, timedelta
+
+from app.main import app
+from app.models.chat import Conversation, Message
+
+from conftest import auth_headers, make_user
+
+def history(client, db, count: int = 10):
+    """A conversation with `count` messages one minute apart, and a getter for its windows"""
+    user = make_user(db)
+    conversation = Conversation(title="Support", user_id=user.id)
+    db.add(conversation)
+    db.flush()
+    messages = [
+        Message(conversation_id=conversation.id, sender_id=user.id, content=f"Message {number}",
+                created_at=datetime(2026, 1, 1) + timedelta(minutes=number))
+        for number in range(count)
+    ]
+    db.add_all(messages)
+    db.commit()
+    url = app.url_path_for("get_messages", conversation_id=conversation.id)
+
+    def get(**params):
+        response = client.get(url, headers=auth_headers(user), params=params)
+        assert response.status_code == 200, response.text
+        return [row["content"] for row in response.json()], response.headers
+
+    return [message.id for message in messages], get
+
+def contents(numbers) -> list:
+    return [f"Message {number}" for number in numbers]
+
+def test_default_window_is_the_newest_messages_oldest_first(client, db):
+    _, get = history(client, db)
+    rows, headers = get(limit=3)
+    assert rows == contents(range(7, 10))
+    assert "X-Before-Cursor" in headers
+    assert "X-After-Cursor" not in headers
+
+def test_before_and_after_move_through_the_history(client, db):
+    _, get = history(client, db)
+    _, headers = get(limit=3)
+    older, headers = get(limit=3, before=headers["X-Before-Cursor"])
+    assert older == contents(range(4, 7))
+
+    newer, headers = get(limit=3, after=headers["X-After-Cursor"])
+    assert newer == contents(range(7, 10))
+    assert "X-After-Cursor" not in headers
+
+def test_around_centres_the_window_on_a_message(client, db):
+    ids, get = history(client, db)
+    rows, headers = get(limit=4, around=ids[5])
+    assert rows == contents(range(3, 7))
+    assert 'rel="prev"' in headers["Link"] and 'rel="next"' in headers["Link"]
+
+def test_around_an_unknown_message_is_404(client, db):
+    _, get = history(client, db, count=1)
+    user = make_user(db, "Other")
+    conversation = Conversation(title="Other", user_id=user.id)
+    db.add(conversation)
+    db.commit()
+    url = app.url_path_for("get_messages", conversation_id=conversation.id)
+    assert client.get(url, headers=auth_headers(user), params={"around": "missing"}).status_code == 404
+
+def test_whole_history_in_one_window_has_no_cursors(client, db):
+    _, get = history(client, db, count=2)
+    rows, headers = get(limit=5)
+    assert rows == contents(range(2))
+    assert "Link" not in headers
+
+def test_only_one_direction_at_a_time(client, db):
+    response = client.get(
+        app.url_path_for("get_messages", conversation_id="any"),
+        params={"before": "a", "after": "b"},
+        headers=auth_headers(make_user(db)),
+    )
+    assert response.status_code == 400
@@ -0,0 +1,46 @@
+"""The Daraja token cache backs off after a failed fetch"""
+import asyncio
+
+from app.services import mpesa
+from app.services.mpesa import AccessTokenCache
+
+class FakeFetch:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.results.pop(0)
+
+def test_failed_fetch_is_not_retried_during_cooldown():
+    fetch = FakeFetch((None, 0), ("fresh", 3600))
+    cache = AccessTokenCache(fetch, refresh_margin_seconds=60, retry_after_seconds=30)
+
+    async def scenario():
+        assert await cache.get() is None
+        assert await cache.get() is None
+        return fetch.calls
+
+    assert asyncio.run(scenario()) == 1
+    assert cache.stats()["cooled_down"] == 1
+
+def test_valid_token_is_served_while_refresh_is_cooling_down(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(mpesa.time, "monotonic", lambda: clock[0])
+    fetch = FakeFetch(("old", 100), (None, 0), ("new", 3600))
+    cache = AccessTokenCache(fetch, refresh_margin_seconds=60, retry_after_seconds=30)
+
+    async def scenario():
+        assert await cache.get() == "old"
+        clock[0] += 50  # Inside the refresh margin: the background refresh fails
+        assert await cache.get() == "old"
+        await cache._inflight
+        clock[0] += 10  # Still cooling down: no new fetch, the old token is still good
+        assert await cache.get() == "old"
+        assert fetch.calls == 2
+        clock[0] += 45  # Cooldown over, token expired
+        assert await cache.get() == "new"
+        return fetch.calls
+
+    assert asyncio.run(scenario()) == 3
@@ -0,0 +1,52 @@
+"""Fan-out writes a row per recipient but pushes once per chunk or audience"""
+import asyncio
+
+from sqlalchemy import func, select
+
+import app.services.notification_fanout as fanout_module
+from app.models.notification import Notification
+from app.models.user import User
+from app.realtime import ADMINS_ROOM
+from app.services.notification_fanout import ROOMS_PER_EMIT, NotificationFanout
+
+from conftest import make_user
+
+def record_pushes(monkeypatch) -> list:
+    pushes = []
+
+    async def emit(event, data, rooms):
+        pushes.append((event, list(rooms)))
+
+    async def emit_to_users(event, data, user_ids):
+        pushes.append((event, list(user_ids)))
+
+    monkeypatch.setattr(fanout_module, "emit", emit)
+    monkeypatch.setattr(fanout_module, "emit_to_users", emit_to_users)
+    return pushes
+
+def test_pushes_to_user_rooms_once_per_slice(monkeypatch, db):
+    pushes = record_pushes(monkeypatch)
+    for index in range(ROOMS_PER_EMIT + 20):
+        make_user(db, f"Trader {index}")
+
+    fanout = NotificationFanout(chunk_size=ROOMS_PER_EMIT * 2)
+    job = fanout.create_job("Hello")
+    asyncio.run(fanout.run(job, select(User.id), "Hello", "World"))
+
+    assert job.status == "completed"
+    assert job.written == ROOMS_PER_EMIT + 20
+    assert db.scalar(select(func.count()).select_from(Notification)) == ROOMS_PER_EMIT + 20
+    assert [len(user_ids) for _, user_ids in pushes] == [ROOMS_PER_EMIT, 20]
+
+def test_pushes_once_to_audience_room(monkeypatch, db):
+    pushes = record_pushes(monkeypatch)
+    for index in range(5):
+        make_user(db, f"Admin {index}", is_admin=True)
+    make_user(db, "Trader")
+
+    fanout = NotificationFanout(chunk_size=2)
+    job = fanout.create_job("New request")
+    asyncio.run(fanout.run(job, select(User.id).where(User.is_admin == True), "New request", "Details", [ADMINS_ROOM]))
+
+    assert job.written == 5
+    assert pushes == [("notification", [ADMINS_ROOM])]
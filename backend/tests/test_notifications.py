@@ -0,0 +1,44 @@
+"""Marking a broadcast read is idempotent and counted once"""
+import asyncio
+from datetime import datetime, timedelta
+
+from app.database import AsyncSessionLocal, insert_or_ignore
+from app.main import app
+from app.models.notification import BroadcastNotificationRead
+from app.models.unread_counter import UnreadCounter
+
+from conftest import auth_headers, make_user
+
+async def insert_read(user_id: str, broadcast_id: str) -> int:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(insert_or_ignore(session, BroadcastNotificationRead).values(
+            user_id=user_id, broadcast_id=broadcast_id
+        ))
+        await session.commit()
+        return result.rowcount
+
+def test_broadcast_read_is_counted_once(client, db):
+    admin = make_user(db, "Admin", is_admin=True)
+    user = make_user(db)
+    user.created_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+    headers = auth_headers(user)
+
+    # Create the counter row before the broadcast so reads adjust it
+    client.get(app.url_path_for("get_unread_notification_count"), headers=headers)
+    broadcast_id = client.post(
+        app.url_path_for("create_broadcast_notification"),
+        json={"title": "Maintenance", "message": "Tonight", "audience": "all"},
+        headers=auth_headers(admin),
+    ).json()["id"]
+
+    url = app.url_path_for("mark_notification_as_read", notification_id=broadcast_id)
+    assert client.put(url, headers=headers).status_code == 200
+    assert client.put(url, headers=headers).status_code == 200
+    # A request that raced past the is-read check inserts nothing
+    assert asyncio.run(insert_read(user.id, broadcast_id)) == 0
+
+    db.expire_all()
+    assert db.get(UnreadCounter, user.id).broadcasts_seen == 1
+    response = client.get(app.url_path_for("get_unread_notification_count"), headers=headers)
+    assert response.json()["unread_count"] == 0
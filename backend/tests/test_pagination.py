@@ -0,0 +1,75 @@
+"""Keyset pagination walks every row exactly once, whatever the stored time format"""
+from datetime import datetime, timedelta
+
+from app.main import app
+from app.models.chat import Conversation, Message
+from app.models.notification import Notification
+
+from conftest import auth_headers, make_user
+
+def walk(client, url: str, headers: dict, cursor_header: str = "X-Next-Cursor", cursor_param: str = "cursor") -> list:
+    """Follow cursors one row at a time and return every id seen"""
+    ids, params = [], {"limit": 1}
+    for _ in range(50):
+        response = client.get(url, headers=headers, params=params)
+        assert response.status_code == 200
+        ids += [row["id"] for row in response.json()]
+        cursor = response.headers.get(cursor_header)
+        if not cursor:
+            return ids
+        params = {"limit": 1, cursor_param: cursor}
+    raise AssertionError(f"{url} did not finish paging: {ids}")
+
+def test_users_page_through_at_limit_one(client, db):
+    # users.created_at is filled by the database (func.now()), without fractional seconds
+    admin = make_user(db, "Admin", is_admin=True)
+    users = [admin] + [make_user(db, f"Trader {index}") for index in range(4)]
+
+    ids = walk(client, "/api/users", auth_headers(admin))
+    assert sorted(ids) == sorted(user.id for user in users)
+    assert len(ids) == len(set(ids))
+
+def test_notifications_page_through_at_limit_one(client, db):
+    user = make_user(db)
+    for index in range(4):
+        db.add(Notification(user_id=user.id, title=f"Notice {index}", message="Hello"))
+    db.commit()
+
+    ids = walk(client, app.url_path_for("get_notifications"), auth_headers(user))
+    assert len(ids) == 4
+    assert len(set(ids)) == 4
+
+def test_message_window_pages_back_at_limit_one(client, db):
+    user = make_user(db)
+    conversation = Conversation(title="Support", user_id=user.id)
+    db.add(conversation)
+    db.flush()
+    for number in range(4):
+        db.add(Message(conversation_id=conversation.id, sender_id=user.id, content=f"Message {number}"))
+    db.commit()
+
+    url = app.url_path_for("get_messages", conversation_id=conversation.id)
+    ids = walk(client, url, auth_headers(user), cursor_header="X-Before-Cursor", cursor_param="before")
+    assert len(ids) == 4
+    assert len(set(ids)) == 4
+
+def test_lists_without_cursor_or_limit_return_every_row_oldest_first(client, db):
+    admin = make_user(db, "Admin", is_admin=True)
+    users = [admin] + [make_user(db, f"Trader {index}") for index in range(60)]
+    start = datetime(2026, 1, 1)
+    for index, user in enumerate(users):
+        user.created_at = start + timedelta(minutes=index)
+    db.commit()
+
+    response = client.get("/api/users", headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()] == [user.id for user in users]
+    assert "X-Next-Cursor" not in response.headers
+
+    # Asking for a page still pages, and a cursor alone continues at the default size
+    response = client.get("/api/users", headers=auth_headers(admin), params={"limit": 10})
+    assert [row["id"] for row in response.json()] == [user.id for user in users[:10]]
+    response = client.get("/api/users", headers=auth_headers(admin),
+                          params={"cursor": response.headers["X-Next-Cursor"]})
+    assert [row["id"] for row in response.json()] == [user.id for user in users[10:60]]
+    assert "X-Next-Cursor" in response.headers
@@ -0,0 +1,110 @@
+"""The payment poller settles a batch of checkouts in one transaction"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import AdvisoryLock
+from app.models.purchase import Purchase
+from app.services import payment_poller as poller_module
+from app.services.payment_poller import PaymentPoller
+
+from conftest import make_user
+
+def add_purchase(db, user, checkout_request_id: str, age_seconds: float) -> Purchase:
+    purchase = Purchase(
+        user_id=user.id, robot_id="robot", amount=100.0, currency="KES", payment_method="M-PESA",
+        status="pending", mpesa_checkout_request_id=checkout_request_id,
+        created_at=datetime.utcnow() - timedelta(seconds=age_seconds),
+    )
+    db.add(purchase)
+    db.commit()
+    return purchase
+
+def test_due_checkouts_settle_in_one_commit(db, monkeypatch):
+    user = make_user(db)
+    for index in range(3):
+        add_purchase(db, user, f"ws_CO_{index}", age_seconds=120)
+
+    async def verify_stk_push(checkout_request_id):
+        return {"success": checkout_request_id != "ws_CO_2", "response": {"ResultCode": "0"}}
+    monkeypatch.setattr(poller_module, "verify_stk_push", verify_stk_push)
+
+    commits = []
+    listener = lambda session: commits.append(session)
+    event.listen(Session, "after_commit", listener)
+    try:
+        poller = PaymentPoller(6.0, 10, concurrency=5, rate_per_second=0, batch_size=10)
+        poller.leading = True
+
+        async def scenario():
+            assert await poller.load() == 3
+            # Older than max_attempts intervals, so each is due for one last check now
+            batch = poller._take_due()
+            assert sorted(batch) == ["ws_CO_0", "ws_CO_1", "ws_CO_2"]
+            await poller._run_batch(batch)
+
+        asyncio.run(scenario())
+    finally:
+        event.remove(Session, "after_commit", listener)
+
+    assert len(commits) == 1
+    db.expire_all()
+    statuses = {purchase.mpesa_checkout_request_id: purchase.status for purchase in db.query(Purchase)}
+    assert statuses == {"ws_CO_0": "completed", "ws_CO_1": "completed", "ws_CO_2": "failed"}
+    assert poller.stats()["pending"] == 0
+
+def test_only_the_leader_schedules():
+    poller = PaymentPoller(6.0, 10, concurrency=5, rate_per_second=0, batch_size=10)
+    poller.schedule("ws_CO_standby")
+    assert poller.stats()["pending"] == 0
+
+    poller.leading = True
+    poller.schedule("ws_CO_leader")
+    assert poller.stats()["pending"] == 1
+
+class FlakyConnection:
+    """A lock connection that drops after `alive` probes"""
+
+    def __init__(self, alive: int):
+        self.alive = alive
+
+    async def scalar(self, statement):
+        if self.alive <= 0:
+            raise ConnectionResetError("connection lost")
+        self.alive -= 1
+        return 1
+
+    async def commit(self):
+        pass
+
+def test_leader_stands_down_when_the_lock_connection_drops(monkeypatch):
+    lock = AdvisoryLock(True, FlakyConnection(alive=1))
+    stood_down = asyncio.Event()
+
+    @asynccontextmanager
+    async def advisory_lock(name):
+        yield lock
+        stood_down.set()
+    monkeypatch.setattr(poller_module, "advisory_lock", advisory_lock)
+
+    poller = PaymentPoller(0.05, 10, concurrency=5, rate_per_second=0, batch_size=10)
+
+    async def load():
+        poller.schedule("ws_CO_queued", delay=60)
+        return 1
+    monkeypatch.setattr(poller, "load", load)
+
+    async def scenario():
+        task = asyncio.create_task(poller.run())
+        try:
+            await asyncio.wait_for(stood_down.wait(), 1)
+        finally:
+            task.cancel()
+
+    asyncio.run(scenario())
+    assert not lock
+    assert poller.stats()["leading"] is False
+    assert poller.stats()["pending"] == 0
@@ -0,0 +1,64 @@
+"""Connection pool settings and checkout metrics"""
+import asyncio
+
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import get_pool_options
+from app.pool_metrics import InstrumentedAsyncPool, pool_metrics
+
+from conftest import auth_headers, make_user
+
+@pytest.fixture
+def metrics():
+    pool_metrics.reset()
+    yield pool_metrics
+    pool_metrics.reset()
+
+def small_engine(tmp_path, max_overflow: int):
+    return create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/pool.db",
+        poolclass=InstrumentedAsyncPool, pool_size=1, max_overflow=max_overflow, pool_timeout=0.1,
+    )
+
+def test_in_memory_sqlite_gets_no_pool_options():
+    assert get_pool_options("sqlite://") == {}
+    assert get_pool_options("sqlite:///:memory:") == {}
+    assert "pool_size" in get_pool_options("postgresql://u:p@db/app")
+
+def test_overflow_and_waits_are_counted(tmp_path, metrics):
+    engine = small_engine(tmp_path, max_overflow=1)
+
+    async def scenario():
+        async with engine.connect() as first, engine.connect() as second:
+            await first.execute(text("SELECT 1"))
+            await second.execute(text("SELECT 1"))
+            return metrics.snapshot(engine.pool)
+
+    snapshot = asyncio.run(scenario())
+    asyncio.run(engine.dispose())
+    assert snapshot["checkouts"] == 2
+    assert snapshot["overflow_events"] == 1
+    assert snapshot["peak_checked_out"] == 2
+    assert snapshot["wait_ms"]["count"] == 2
+    assert snapshot["pool_size"] == 1
+
+def test_exhausted_pool_counts_a_timeout(tmp_path, metrics):
+    engine = small_engine(tmp_path, max_overflow=0)
+
+    async def scenario():
+        async with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+    asyncio.run(scenario())
+    asyncio.run(engine.dispose())
+    assert metrics.snapshot()["timeouts"] == 1
+
+def test_metrics_endpoint_is_admin_only(client, db):
+    assert client.get("/api/internal/db-pool", headers=auth_headers(make_user(db))).status_code == 403
+    response = client.get("/api/internal/db-pool", headers=auth_headers(make_user(db, "Admin", is_admin=True)))
+    assert response.status_code == 200
+    assert "wait_ms" in response.json()
@@ -0,0 +1,80 @@
+"""The circuit breaker's half-open trial always settles"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.provider_client import CircuitBreaker, CircuitOpenError, ProviderClient
+
+def half_open_client(handler) -> ProviderClient:
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()  # Open; with no reset time the next call is the trial
+    return ProviderClient("test", "http://provider.test", retries=0, breaker=breaker,
+                          transport=httpx.MockTransport(handler))
+
+def test_unclassified_error_reopens_half_open_circuit():
+    def handler(request):
+        raise httpx.DecodingError("bad gzip")
+    client = half_open_client(handler)
+
+    with pytest.raises(httpx.DecodingError):
+        asyncio.run(client.get("/status"))
+    assert client.breaker.state == "open"
+
+def test_cancelled_trial_frees_the_slot_without_a_failure():
+    answers = []
+
+    async def handler(request):
+        if not answers:
+            answers.append("slow")
+            await asyncio.sleep(10)
+        return httpx.Response(200)
+    client = half_open_client(handler)
+    client.breaker.reset_seconds = 60
+    client.breaker.opened_at -= 60
+    failures = client.breaker.failures
+
+    async def scenario():
+        task = asyncio.create_task(client.get("/status"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert client.breaker.state == "half_open"
+        assert client.breaker.failures == failures
+        # The next call is the new trial, and it closes the circuit
+        return await client.get("/status")
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert client.breaker.state == "closed"
+
+def test_cancellations_do_not_open_a_closed_circuit():
+    async def handler(request):
+        await asyncio.sleep(10)
+    client = ProviderClient("test", "http://provider.test", retries=0,
+                            breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60),
+                            transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        for _ in range(3):
+            task = asyncio.create_task(client.get("/status"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(scenario())
+    assert client.breaker.state == "closed"
+    assert client.breaker.failures == 0
+
+def test_lost_trial_is_replaced_after_reset_time():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    breaker.opened_at -= 60
+    breaker.before_call("test")  # The trial, which never reports back
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("test")
+
+    breaker.trial_started_at -= 60
+    breaker.before_call("test")
+    assert breaker.state == "half_open"
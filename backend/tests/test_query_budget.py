@@ -0,0 +1,72 @@
+"""
+Query budgets for hot endpoints.
+
+Each endpoint's statement count is fixed; a change that adds a query (an
+N+1, a re-fetch of the current user) fails here instead of in production.
+"""
+from app.main import app
+from app.models.chat import Conversation, Message
+from app.models.notification import Notification
+
+from conftest import auth_headers, make_user, query_count
+
+def test_me_cold_token_loads_user_once(client, db):
+    user = make_user(db)
+    response = client.get("/api/users/me", headers=auth_headers(user))
+    assert response.status_code == 200
+    assert query_count(response) == 1
+
+def test_me_cached_token_issues_no_queries(client, db):
+    headers = auth_headers(make_user(db))
+    client.get("/api/users/me", headers=headers)
+    response = client.get("/api/users/me", headers=headers)
+    assert response.status_code == 200
+    assert query_count(response) == 0
+
+def test_get_own_user_uses_current_user(client, db):
+    user = make_user(db)
+    headers = auth_headers(user)
+    client.get("/api/users/me", headers=headers)
+    response = client.get(f"/api/users/{user.id}", headers=headers)
+    assert response.status_code == 200
+    assert query_count(response) == 0
+
+def test_admin_get_user_loads_target_once(client, db):
+    admin = make_user(db, "Admin", is_admin=True)
+    user = make_user(db)
+    headers = auth_headers(admin)
+    client.get("/api/users/me", headers=headers)
+    response = client.get(f"/api/users/{user.id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == user.id
+    assert query_count(response) == 1
+
+def test_conversation_list_is_one_query(client, db):
+    user = make_user(db)
+    for index in range(5):
+        conversation = Conversation(title=f"Conversation {index}", user_id=user.id)
+        db.add(conversation)
+        db.flush()
+        for number in range(3):
+            db.add(Message(conversation_id=conversation.id, sender_id=user.id, content=f"Message {number}"))
+    db.commit()
+
+    headers = auth_headers(user)
+    client.get("/api/users/me", headers=headers)
+    response = client.get(app.url_path_for("get_conversations"), headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert query_count(response) == 1
+
+def test_notification_list_is_one_query(client, db):
+    user = make_user(db)
+    for index in range(5):
+        db.add(Notification(user_id=user.id, title=f"Notice {index}", message="Hello"))
+    db.commit()
+
+    headers = auth_headers(user)
+    client.get("/api/users/me", headers=headers)
+    response = client.get(app.url_path_for("get_notifications"), headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert query_count(response) == 1
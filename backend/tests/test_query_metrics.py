@@ -0,0 +1,61 @@
+"""Per-request SQL counting and N+1 detection"""
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.query_metrics import QueryStats, fingerprint, query_metrics_middleware
+
+from conftest import make_user
+
+def test_fingerprint_ignores_whitespace_and_in_list_length():
+    assert fingerprint("SELECT *\n  FROM users WHERE id IN (?, ?)") == "SELECT * FROM users WHERE id IN (...)"
+    assert fingerprint("SELECT * FROM users WHERE id IN ($1, $2, $3)") == fingerprint("SELECT * FROM users WHERE id IN (?, ?)")
+    assert fingerprint("SELECT * FROM users WHERE id = ?") != fingerprint("SELECT * FROM users WHERE id IN (?, ?)")
+
+def test_repeated_statements_are_reported_most_frequent_first():
+    stats = QueryStats()
+    for _ in range(3):
+        stats.record("SELECT * FROM messages WHERE id = ?", 1.0)
+    stats.record("SELECT 1", 1.0)
+    assert stats.count == 4
+    assert stats.total_ms == 4.0
+    assert stats.repeated(2) == [("SELECT * FROM messages WHERE id = ?", 3)]
+
+def make_app(queries: int) -> FastAPI:
+    app = FastAPI()
+    app.middleware("http")(query_metrics_middleware)
+
+    @app.get("/users")
+    async def users():
+        names = []
+        async with AsyncSessionLocal() as db:
+            for _ in range(queries):
+                names.append(await db.scalar(select(User.name)))
+        return names
+
+    return app
+
+def test_n_plus_one_is_logged_and_counted_in_headers(db, monkeypatch, caplog):
+    make_user(db)
+    monkeypatch.setattr(settings, "SQL_QUERY_BUDGET", 3)
+    with caplog.at_level(logging.WARNING, logger="app.query_metrics"):
+        response = TestClient(make_app(settings.SQL_N_PLUS_ONE_THRESHOLD)).get("/users")
+
+    assert response.headers["X-DB-Query-Count"] == str(settings.SQL_N_PLUS_ONE_THRESHOLD)
+    assert response.headers["X-DB-Repeated-Statements"] == "1"
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("budget 3" in message for message in messages)
+    assert any("Probable N+1 in GET /users" in message for message in messages)
+
+def test_requests_within_budget_log_nothing(db, caplog):
+    make_user(db)
+    with caplog.at_level(logging.WARNING, logger="app.query_metrics"):
+        response = TestClient(make_app(1)).get("/users")
+    assert response.headers["X-DB-Query-Count"] == "1"
+    assert response.headers["X-DB-Repeated-Statements"] == "0"
+    assert caplog.records == []
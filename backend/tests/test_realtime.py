@@ -0,0 +1,76 @@
+"""Changes are pushed to Socket.IO rooms after they are committed"""
+import asyncio
+
+import pytest
+
+from app import realtime
+from app.main import app
+from app.models.chat import Conversation
+from app.realtime import ADMINS_ROOM, USERS_ROOM, conversation_room, emit, user_room
+
+from conftest import auth_headers, make_user
+
+class RecordingServer:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.emits = []
+
+    async def emit(self, event, data, to):
+        if self.fail:
+            raise ConnectionError("queue unreachable")
+        self.emits.append((event, data, to))
+
+@pytest.fixture
+def server(monkeypatch):
+    server = RecordingServer()
+    monkeypatch.setattr(realtime, "sio", server)
+    return server
+
+def test_new_message_is_pushed_to_its_rooms(client, db, server):
+    user = make_user(db)
+    conversation = Conversation(title="Support", user_id=user.id)
+    db.add(conversation)
+    db.commit()
+
+    response = client.post(
+        app.url_path_for("create_message"),
+        json={"conversation_id": conversation.id, "sender_id": user.id, "content": "Hello"},
+        headers=auth_headers(user),
+    )
+    assert response.status_code == 200
+    event, data, rooms = server.emits[-1]
+    assert event == "new_message"
+    assert data["id"] == response.json()["id"]
+    assert rooms == [conversation_room(conversation.id), user_room(user.id), ADMINS_ROOM]
+
+def test_notification_is_pushed_to_its_user(client, db, server):
+    admin = make_user(db, "Admin", is_admin=True)
+    user = make_user(db)
+    response = client.post(
+        app.url_path_for("create_notification"),
+        json={"user_id": user.id, "title": "Hi", "message": "There"},
+        headers=auth_headers(admin),
+    )
+    assert response.status_code == 200
+    assert server.emits == [("notification", response.json(), [user_room(user.id)])]
+
+def test_broadcast_is_pushed_once_to_its_audience(client, db, server):
+    admin = make_user(db, "Admin", is_admin=True)
+    for audience, rooms in (("users", [USERS_ROOM]), ("all", [ADMINS_ROOM, USERS_ROOM])):
+        response = client.post(
+            app.url_path_for("create_broadcast_notification"),
+            json={"title": "Maintenance", "message": "Tonight", "audience": audience},
+            headers=auth_headers(admin),
+        )
+        assert response.status_code == 200
+        assert server.emits[-1][2] == rooms
+    assert len(server.emits) == 2
+
+def test_push_failures_are_logged_not_raised(monkeypatch, caplog):
+    monkeypatch.setattr(realtime, "sio", RecordingServer(fail=True))
+    asyncio.run(emit("notification", {}, [USERS_ROOM]))
+    assert "Failed to emit notification to 1 rooms" in caplog.text
+
+def test_no_rooms_no_push(server):
+    asyncio.run(emit("notification", {}, []))
+    assert server.emits == []
@@ -0,0 +1,155 @@
+"""Catalog snapshots, ETag revalidation and invalidation across workers"""
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from app import realtime
+
+from app.models.robot import Robot
+from app.services.robot_catalog import CATALOG_CHANGED, CatalogFilters, CatalogSnapshot, etag_matches, robot_catalog
+from app.socketio_manager import WorkerSignalMixin
+
+def make_robot(id: str, created_at) -> Robot:
+    return Robot(
+        id=id, name=f"Robot {id}", description="Trades", type="EA", price=10.0,
+        currency="USD", category="forex", features=["scalping"], created_at=created_at,
+    )
+
+def test_weak_validators_match():
+    etag = '"abc"'
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"other", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"other"', etag)
+    assert not etag_matches(None, etag)
+
+def test_robots_without_created_at_sort_oldest():
+    robots = [
+        make_robot("b", datetime(2026, 1, 2, tzinfo=timezone.utc)),
+        make_robot("a", None),
+        make_robot("c", datetime(2026, 1, 1, tzinfo=timezone.utc)),
+    ]
+    snapshot = CatalogSnapshot(0, robots)
+
+    ids, cursor = [], None
+    for _ in range(len(robots) + 1):
+        page = snapshot.page(cursor, 1, sort="newest")
+        ids += [robot["id"] for robot in json.loads(page.body)]
+        cursor = page.next_cursor
+        if not cursor:
+            break
+    assert ids == ["b", "c", "a"]
+
+def marketplace() -> CatalogSnapshot:
+    """Four robots across two categories, currencies and feature sets"""
+    robots = [
+        Robot(id="grid", name="Grid Master", description="Grid trading", type="EA", price=50.0, currency="USD",
+              category="Forex", features=["grid", "hedging"], created_at=datetime(2026, 1, 1)),
+        Robot(id="scalp", name="alpha Scalper", description="Fast scalping", type="EA", price=20.0, currency="USD",
+              category="Forex", features=["scalping"], created_at=datetime(2026, 1, 2)),
+        Robot(id="trend", name="Trend Rider", description="Follows trends", type="Indicator", price=35.0,
+              currency="EUR", category="Crypto", features=["trend", "hedging"], created_at=datetime(2026, 1, 3)),
+        Robot(id="bot", name="Crypto Bot", description="Grid for coins", type="EA", price=80.0, currency="EUR",
+              category="Crypto", features=["grid"], created_at=datetime(2026, 1, 4)),
+    ]
+    return CatalogSnapshot(0, robots)
+
+def ids(page) -> list:
+    return [robot["id"] for robot in json.loads(page.body)]
+
+def test_filters_combine_and_ignore_case():
+    snapshot = marketplace()
+    assert ids(snapshot.page(None, None, CatalogFilters(category="forex"))) == ["scalp", "grid"]
+    assert ids(snapshot.page(None, None, CatalogFilters(features=["Grid", "hedging"]))) == ["grid"]
+    assert ids(snapshot.page(None, None, CatalogFilters(min_price=30, max_price=60))) == ["trend", "grid"]
+    assert ids(snapshot.page(None, None, CatalogFilters(currency="eur", q="grid coins"))) == ["bot"]
+    assert ids(snapshot.page(None, None, CatalogFilters(category="Stocks"))) == []
+
+def test_sorts_page_with_cursors():
+    snapshot = marketplace()
+    for sort, expected in (
+        ("price_asc", ["scalp", "trend", "grid", "bot"]),
+        ("price_desc", ["bot", "grid", "trend", "scalp"]),
+        ("name", ["scalp", "bot", "grid", "trend"]),
+        ("oldest", ["grid", "scalp", "trend", "bot"]),
+    ):
+        seen, cursor = [], None
+        for _ in range(5):
+            page = snapshot.page(cursor, 1, sort=sort)
+            seen += ids(page)
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        assert seen == expected, sort
+
+def test_facets_count_every_filter_but_their_own():
+    facets = marketplace().facets(CatalogFilters(category="Forex"))
+    assert facets["total"] == 2
+    assert facets["price"] == {"min": 20.0, "max": 50.0}
+    # Picking a category still shows the other categories
+    assert facets["category"] == [{"value": "Crypto", "count": 2}, {"value": "Forex", "count": 2}]
+    assert facets["currency"] == [{"value": "USD", "count": 2}]
+    assert facets["features"] == [
+        {"value": "grid", "count": 1}, {"value": "hedging", "count": 1}, {"value": "scalping", "count": 1},
+    ]
+
+def test_etags_follow_content_and_query():
+    snapshot = marketplace()
+    page = snapshot.page(None, None, CatalogFilters(category="Forex"))
+    assert page.etag == marketplace().page(None, None, CatalogFilters(category="forex")).etag
+    assert page.etag != snapshot.page(None, None, CatalogFilters(category="Crypto")).etag
+    assert page.etag != snapshot.page(None, None, CatalogFilters(category="Forex"), sort="price_asc").etag
+
+class MemoryBus:
+    """An in-process stand-in for the message queue, shared by several managers"""
+
+    def __init__(self):
+        self.queues = []
+
+def memory_manager(bus: MemoryBus):
+    class MemoryManager(WorkerSignalMixin, AsyncPubSubManager):
+        name = "memory"
+
+        def __init__(self):
+            super().__init__(channel="test")
+            self.queue = asyncio.Queue()
+            bus.queues.append(self.queue)
+
+        async def _publish(self, data):
+            for queue in bus.queues:
+                queue.put_nowait(self.json.dumps(data))
+
+        async def _listen(self):
+            while True:
+                yield await self.queue.get()
+
+    return MemoryManager()
+
+def test_catalog_signal_reaches_a_worker_without_sockets(monkeypatch):
+    bus = MemoryBus()
+    sender = socketio.AsyncServer(async_mode="asgi", client_manager=memory_manager(bus))
+    # The receiving worker has never had a socket connect
+    receiver = socketio.AsyncServer(async_mode="asgi", client_manager=memory_manager(bus))
+    received = []
+
+    async def scenario():
+        monkeypatch.setattr(realtime, "sio", receiver)
+        realtime.start_client_manager()
+        monkeypatch.setattr(realtime, "sio", sender)
+        version = robot_catalog.version
+        # Keep the sender from handling its own signal, so only the bus can bump the version
+        monkeypatch.setattr(sender.manager, "_handle_emit", lambda message: received.append(message) or asyncio.sleep(0))
+
+        await realtime.signal_workers(CATALOG_CHANGED)
+        for _ in range(100):
+            if robot_catalog.version != version:
+                break
+            await asyncio.sleep(0.01)
+        receiver.manager.thread.cancel()
+        return robot_catalog.version - version
+
+    assert asyncio.run(scenario()) == 1
+    assert [message["event"] for message in received] == [CATALOG_CHANGED]
@@ -0,0 +1,81 @@
+"""Entitled downloads: conditional and range requests, and signed URLs"""
+import asyncio
+import hashlib
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from app.models.robot_request import RobotRequest
+from app.services.robot_downloads import stored_path
+from app.services.robot_files import robot_file_store
+
+from conftest import auth_headers, make_user
+
+BUNDLE = b"PK" + bytes(range(256)) * 8
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+@pytest.fixture
+def delivered(db):
+    """A user's delivered robot request whose bundle is in the file store"""
+    robot_file_store.prepare()
+    stored = asyncio.run(robot_file_store.save(stream(BUNDLE)))
+    user = make_user(db)
+    request = RobotRequest(
+        user_id=user.id, robot_type="EA", trading_pairs="EURUSD", timeframe="H1", risk_level="low",
+        is_delivered=True, download_url=f"/uploads/{robot_file_store.relative_path(stored.sha256)}",
+    )
+    db.add(request)
+    db.commit()
+    return user, request
+
+def test_download_revalidates_with_the_content_hash(client, delivered):
+    user, request = delivered
+    url = f"/api/robot-requests/{request.id}/download"
+    response = client.get(url, headers=auth_headers(user))
+    assert response.status_code == 200
+    assert response.content == BUNDLE
+    assert response.headers["ETag"] == f'"{hashlib.sha256(BUNDLE).hexdigest()}"'
+
+    response = client.get(url, headers={**auth_headers(user), "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.content == b""
+
+def test_download_serves_ranges(client, delivered):
+    user, request = delivered
+    response = client.get(
+        f"/api/robot-requests/{request.id}/download", headers={**auth_headers(user), "Range": "bytes=100-199"}
+    )
+    assert response.status_code == 206
+    assert response.content == BUNDLE[100:200]
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(BUNDLE)}"
+
+def test_undelivered_or_foreign_requests_are_refused(client, db, delivered):
+    user, request = delivered
+    assert client.get(f"/api/robot-requests/{request.id}/download", headers=auth_headers(make_user(db, "Other"))).status_code == 403
+    request.is_delivered = False
+    db.commit()
+    assert client.get(f"/api/robot-requests/{request.id}/download", headers=auth_headers(user)).status_code == 403
+
+def test_signed_url_works_without_login_until_tampered_or_expired(client, delivered, monkeypatch):
+    user, request = delivered
+    link = client.get(f"/api/robot-requests/{request.id}/download-url", headers=auth_headers(user)).json()
+    response = client.get(link["url"])
+    assert response.status_code == 200
+    assert response.content == BUNDLE
+
+    parts = urlsplit(link["url"])
+    params = {name: values[0] for name, values in parse_qs(parts.query).items()}
+    assert client.get(parts.path, params={**params, "name": "other.zip"}).status_code == 403
+
+    monkeypatch.setattr("app.services.robot_downloads.time.time", lambda: link["expires_at"] + 1)
+    assert client.get(link["url"]).status_code == 403
+
+def test_only_files_in_the_store_are_served():
+    robot_file_store.prepare()
+    assert stored_path("/uploads/../../etc/passwd") is None
+    assert stored_path(f"/uploads/{robot_file_store.tmp_dir.name}/upload.part") is None
+    assert stored_path("https://example.com/bot.zip") is None
+    assert stored_path("/uploads/sha256/ab/abcd") == "sha256/ab/abcd"
@@ -0,0 +1,101 @@
+"""Resumable robot uploads: ranges, resuming, locking and size limits"""
+import asyncio
+import fcntl
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.robot_files import RobotFileStore, robot_file_store
+
+from conftest import auth_headers, make_user
+
+BUNDLE = b"PK" + bytes(range(256)) * 40
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+async def unread():
+    raise AssertionError("the body should not have been read")
+    yield b""
+
+def make_store(tmp_path, max_bytes: int = 1024 * 1024) -> RobotFileStore:
+    store = RobotFileStore(str(tmp_path / "store"), chunk_size=1024, max_bytes=max_bytes, session_ttl_seconds=3600)
+    store.prepare()
+    return store
+
+def test_store_creates_no_directories_until_prepared(tmp_path):
+    store = RobotFileStore(str(tmp_path / "store"), chunk_size=1024, max_bytes=1024, session_ttl_seconds=60)
+    assert not store.root.exists()
+    store.prepare()
+    assert store.tmp_dir.is_dir()
+
+def test_upload_in_ranges_and_resume(tmp_path):
+    store = make_store(tmp_path)
+    half = len(BUNDLE) // 2
+
+    async def scenario():
+        session = await store.create_session("robot-1", "bot.zip", len(BUNDLE))
+        upload_id = session["upload_id"]
+        assert (await store.append("robot-1", upload_id, 0, stream(BUNDLE[:100], BUNDLE[100:half])))["offset"] == half
+
+        # A retried range is refused; the client resumes from the offset
+        with pytest.raises(HTTPException) as error:
+            await store.append("robot-1", upload_id, 0, stream(BUNDLE[:half]))
+        assert error.value.status_code == 409
+        assert (await store.get_session("robot-1", upload_id))["offset"] == half
+
+        await store.append("robot-1", upload_id, half, stream(BUNDLE[half:]))
+        return await store.complete("robot-1", upload_id)
+
+    stored, filename = asyncio.run(scenario())
+    assert filename == "bot.zip"
+    assert stored.sha256 == hashlib.sha256(BUNDLE).hexdigest()
+    assert stored.path.read_bytes() == BUNDLE
+    assert list(store.tmp_dir.iterdir()) == []
+
+def test_concurrent_append_is_refused(tmp_path):
+    store = make_store(tmp_path)
+
+    async def scenario():
+        session = await store.create_session("robot-1", "bot.zip", len(BUNDLE))
+        upload_id = session["upload_id"]
+        # Another worker is writing this upload
+        with open(store.tmp_dir / f"{upload_id}.part", "ab") as other:
+            fcntl.flock(other, fcntl.LOCK_EX)
+            with pytest.raises(HTTPException) as error:
+                await store.append("robot-1", upload_id, 0, unread())
+            assert error.value.status_code == 409
+        return await store.append("robot-1", upload_id, 0, stream(BUNDLE))
+
+    assert asyncio.run(scenario())["offset"] == len(BUNDLE)
+
+def test_declared_length_past_the_upload_is_refused_unread(tmp_path):
+    store = make_store(tmp_path)
+
+    async def scenario():
+        session = await store.create_session("robot-1", "bot.zip", 100)
+        with pytest.raises(HTTPException) as error:
+            await store.append("robot-1", session["upload_id"], 0, unread(), length=101)
+        return error.value.status_code
+
+    assert asyncio.run(scenario()) == 413
+
+def test_put_range_checks_content_length(client, db):
+    robot_file_store.prepare()
+    headers = auth_headers(make_user(db, "Admin", is_admin=True))
+    session = asyncio.run(robot_file_store.create_session("robot-1", "bot.zip", 10))
+    url = f"/api/robots/robot-1/uploads/{session['upload_id']}"
+
+    response = client.put(url, content=b"x" * 11, headers={**headers, "Content-Range": "bytes 0-10/10"})
+    assert response.status_code == 413
+    response = client.put(url, content=b"x" * 10, headers={**headers, "Content-Range": "bytes 0-9/10"})
+    assert response.status_code == 200
+    assert response.json()["offset"] == 10
+
+def test_oversized_single_upload_is_refused_before_the_body_is_read(client, monkeypatch):
+    monkeypatch.setattr(robot_file_store, "max_bytes", 10)
+    # No credentials either: the size check comes first
+    response = client.post("/api/robots/robot-1/upload", files={"file": ("bot.zip", b"x" * 100 * 1024)})
+    assert response.status_code == 413
@@ -0,0 +1,63 @@
+"""The SQLite full-text index keeps pointing at the right rows after VACUUM"""
+import importlib.util
+from pathlib import Path
+
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import text
+
+from app.database import engine
+from app.main import app
+from app.models.chat import Conversation, Message
+
+from conftest import auth_headers, make_user
+
+MIGRATION = Path(__file__).resolve().parents[1] / "alembic" / "versions" / "d8f2b6c4e1a9_stable_fts_keys.py"
+
+def create_fts_tables():
+    """Run the SQLite side of the FTS migration against the test database"""
+    spec = importlib.util.spec_from_file_location("stable_fts_keys", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+
+def drop_fts_tables():
+    with engine.begin() as connection:
+        for table in ("messages", "robot_requests"):
+            connection.execute(text(f"DROP TABLE IF EXISTS {table}_fts"))
+            connection.execute(text(f"DROP TABLE IF EXISTS {table}_fts_keys"))
+
+def test_message_search_survives_vacuum(client, db):
+    create_fts_tables()
+    try:
+        user = make_user(db)
+        conversation = Conversation(title="Support", user_id=user.id)
+        db.add(conversation)
+        db.commit()
+        messages = [
+            Message(content=f"filler message {index}", sender_id=user.id, conversation_id=conversation.id)
+            for index in range(5)
+        ]
+        target = Message(content="my withdrawal is stuck", sender_id=user.id, conversation_id=conversation.id)
+        db.add_all(messages + [target])
+        db.commit()
+
+        # VACUUM may renumber the rowids of tables without an INTEGER primary key;
+        # shifting them by hand makes that happen deterministically
+        for message in messages:
+            db.delete(message)
+        db.commit()
+        with engine.begin() as connection:
+            connection.exec_driver_sql("UPDATE messages SET rowid = rowid + 1000")
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+
+        response = client.get(app.url_path_for("search_messages"), params={"q": "withdrawal"},
+                              headers=auth_headers(user))
+        assert response.status_code == 200
+        assert [row["id"] for row in response.json()] == [target.id]
+        assert "<mark>" in response.json()[0]["snippet"]
+    finally:
+        drop_fts_tables()
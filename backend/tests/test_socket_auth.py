@@ -0,0 +1,111 @@
+"""Socket handshakes are authenticated once and limited per worker and user"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+import socketio
+
+from app import realtime
+from app.models.chat import Conversation
+from app.realtime import SocketTracker, conversation_room, user_room
+
+from conftest import auth_headers, make_user
+
+class FakeServer:
+    """The parts of AsyncServer the socket handlers use, without an engine.io transport"""
+
+    def __init__(self):
+        self.sessions = {}
+        self.rooms = {}
+        self.disconnected = []
+
+    async def save_session(self, sid, session):
+        self.sessions[sid] = session
+
+    async def get_session(self, sid):
+        return self.sessions[sid]
+
+    @asynccontextmanager
+    async def session(self, sid):
+        yield self.sessions[sid]
+
+    async def enter_room(self, sid, room):
+        self.rooms.setdefault(sid, set()).add(room)
+
+    async def disconnect(self, sid):
+        self.disconnected.append(sid)
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(realtime, "sio", server)
+    monkeypatch.setattr(realtime, "socket_tracker", SocketTracker(max_connections=3, max_per_user=2))
+    return server
+
+def connect(sid, user=None, token=None):
+    auth = {"token": token} if token else ({"token": auth_headers(user)["Authorization"]} if user else None)
+    return asyncio.run(realtime.connect(sid, {}, auth))
+
+def test_handshake_binds_user_and_conversations(db, server):
+    user = make_user(db)
+    conversation = Conversation(title="Support", user_id=user.id)
+    db.add(conversation)
+    db.commit()
+
+    connect("sid-1", user)
+    session = server.sessions["sid-1"]
+    assert session["user_id"] == user.id
+    assert session["is_admin"] is False
+    assert session["conversation_ids"] == {conversation.id}
+    assert server.rooms["sid-1"] == {user_room(user.id), realtime.USERS_ROOM}
+
+def test_missing_or_invalid_token_is_refused(db, server):
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError):
+        connect("sid-1")
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError):
+        connect("sid-2", token="not-a-token")
+    assert realtime.socket_tracker.snapshot()["rejected"]["unauthenticated"] == 2
+    assert server.sessions == {}
+
+def test_sockets_per_user_and_per_worker_are_capped(db, server):
+    user = make_user(db)
+    other = make_user(db, "Other")
+    connect("sid-1", user)
+    connect("sid-2", user)
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError, match="too many connections"):
+        connect("sid-3", user)
+
+    connect("sid-4", other)
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError, match="capacity"):
+        connect("sid-5", other)
+
+    asyncio.run(realtime.disconnect("sid-1"))
+    connect("sid-5", other)
+    snapshot = realtime.socket_tracker.snapshot()
+    assert snapshot["rejected"] == {"unauthenticated": 0, "capacity": 1, "user_limit": 1}
+    assert snapshot["connections"] == 3
+    assert snapshot["peak_connections"] == 3
+
+def test_join_conversation_checks_ownership(db, server):
+    user = make_user(db)
+    other = make_user(db, "Other")
+    connect("sid-1", user)
+    # Created after the handshake, so looked up on join
+    mine = Conversation(title="Mine", user_id=user.id)
+    theirs = Conversation(title="Theirs", user_id=other.id)
+    db.add_all([mine, theirs])
+    db.commit()
+
+    assert asyncio.run(realtime.join_conversation("sid-1", {"conversationId": theirs.id})) == {"ok": False, "error": "not authorized"}
+    assert asyncio.run(realtime.join_conversation("sid-1", {"conversationId": mine.id})) == {"ok": True}
+    assert conversation_room(mine.id) in server.rooms["sid-1"]
+    assert conversation_room(theirs.id) not in server.rooms["sid-1"]
+    assert mine.id in server.sessions["sid-1"]["conversation_ids"]
+
+def test_expired_session_is_disconnected(db, server):
+    connect("sid-1", make_user(db))
+    server.sessions["sid-1"]["expires_at"] = 0
+
+    assert asyncio.run(realtime.join_conversation("sid-1", {"conversationId": "any"})) == {"ok": False, "error": "session expired"}
+    assert server.disconnected == ["sid-1"]
+    assert realtime.socket_tracker.snapshot()["expired"] == 1
@@ -0,0 +1,71 @@
+"""Choosing the Socket.IO client manager and encoding NOTIFY payloads"""
+import asyncio
+import json
+import os
+
+import pytest
+import socketio
+
+from app.socketio_manager import (
+    COMPRESSED_PREFIX, NOTIFY_PAYLOAD_LIMIT, WORKERS_NAMESPACE, AsyncPostgresManager, WorkerSignalMixin,
+    asyncpg_dsn, create_client_manager, on_worker_signal,
+)
+
+def test_no_message_queue_is_in_process():
+    assert type(create_client_manager(None)) is socketio.AsyncManager
+
+def test_postgres_message_queue():
+    manager = create_client_manager("postgresql+psycopg2://u:p@db/app?sslmode=require", channel="tradewizard")
+    assert isinstance(manager, AsyncPostgresManager)
+    assert manager.channel == "tradewizard"
+    assert manager.dsn == "postgresql://u:p@db/app?sslmode=require"
+
+def test_asyncpg_url_becomes_a_libpq_dsn():
+    assert asyncpg_dsn("postgresql+asyncpg://u:p@db/app?ssl=require") == "postgresql://u:p@db/app?sslmode=require"
+
+def test_redis_message_queue():
+    pytest.importorskip("redis")
+    assert isinstance(create_client_manager("redis://cache:6379/0"), socketio.AsyncRedisManager)
+
+def test_unsupported_message_queue_is_refused():
+    with pytest.raises(ValueError):
+        create_client_manager("kafka://broker:9092")
+    # The test database is SQLite, which has no LISTEN/NOTIFY
+    with pytest.raises(ValueError):
+        create_client_manager("database")
+
+def test_notify_payloads_are_compressed_and_capped():
+    manager = AsyncPostgresManager("postgresql://u:p@db/app")
+    small = {"method": "emit", "event": "notification", "data": "hi"}
+    assert json.loads(manager._encode(small)) == small
+
+    large = {"method": "emit", "event": "notification", "data": "x" * 20000}
+    payload = manager._encode(large)
+    assert payload.startswith(COMPRESSED_PREFIX)
+    assert len(payload.encode()) <= NOTIFY_PAYLOAD_LIMIT
+    assert json.loads(manager._decode(payload)) == large
+
+    incompressible = {"method": "emit", "event": "notification", "data": os.urandom(8000).hex()}
+    assert manager._encode(incompressible) is None
+
+def test_worker_signals_are_handled_in_process():
+    delivered = []
+    signalled = []
+
+    class Base:
+        async def _handle_emit(self, message):
+            delivered.append(message["event"])
+
+    class Manager(WorkerSignalMixin, Base):
+        pass
+
+    on_worker_signal("test_socketio_manager")(signalled.append)
+
+    async def scenario():
+        manager = Manager()
+        await manager._handle_emit({"event": "test_socketio_manager", "namespace": WORKERS_NAMESPACE, "data": [{"n": 1}]})
+        await manager._handle_emit({"event": "notification", "namespace": "/", "data": [{}]})
+
+    asyncio.run(scenario())
+    assert signalled == [{"n": 1}]
+    assert delivered == ["notification"]
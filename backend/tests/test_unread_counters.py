@@ -0,0 +1,53 @@
+"""Unread counters: broadcasts, the badge read and reconciliation"""
+import asyncio
+from datetime import datetime, timedelta
+
+from app.main import app
+from app.models.notification import Notification
+from app.models.unread_counter import BroadcastTotal, UnreadCounter
+from app.services.unread_counters import reconcile_unread_counters
+
+from conftest import auth_headers, make_user, query_count
+
+def test_reconcile_repairs_and_creates_counters(db):
+    drifted = make_user(db, "Drifted")
+    missing = make_user(db, "Missing")
+    for user in (drifted, missing):
+        db.add(Notification(user_id=user.id, title="Hello", message="World"))
+    db.add(UnreadCounter(user_id=drifted.id, notifications=7, messages=3, broadcasts_seen=0))
+    db.commit()
+
+    result = asyncio.run(reconcile_unread_counters(chunk_size=1))
+    assert result == {"checked": 2, "repaired": 1, "created": 1, "skipped": False}
+
+    db.expire_all()
+    for user in (drifted, missing):
+        counter = db.get(UnreadCounter, user.id)
+        assert (counter.notifications, counter.messages, counter.broadcasts_seen) == (1, 0, 0)
+
+    # Nothing left to fix
+    assert asyncio.run(reconcile_unread_counters())["repaired"] == 0
+
+def test_broadcasts_reach_the_badge_from_the_counter_row(client, db):
+    admin = make_user(db, "Admin", is_admin=True)
+    user = make_user(db)
+    user.created_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+    headers = auth_headers(user)
+    url = app.url_path_for("get_unread_notification_count")
+
+    assert client.get(url, headers=headers).json() == {"unread_count": 0}
+    # The first broadcast to an audience creates its total; later ones add to it
+    for audience in ("users", "users", "admins", "all"):
+        response = client.post(
+            app.url_path_for("create_broadcast_notification"),
+            json={"title": "News", "message": audience, "audience": audience},
+            headers=auth_headers(admin),
+        )
+        assert response.status_code == 200
+
+    totals = {total.audience: total.total for total in db.query(BroadcastTotal)}
+    assert totals == {"users": 2, "admins": 1, "all": 1}
+    response = client.get(url, headers=headers)
+    assert response.json() == {"unread_count": 3}
+    assert query_count(response) == 1
@@ -0,0 +1,62 @@
+"""Verified tokens are cached with a user snapshot until the user changes"""
+import time
+
+from app.models.user import User
+from app.utils.user_cache import TokenUserCache, token_user_cache
+
+from conftest import auth_headers, make_user, query_count
+
+def test_update_drops_the_cached_user(client, db):
+    user = make_user(db)
+    headers = auth_headers(user)
+    client.get("/api/users/me", headers=headers)
+
+    response = client.put(f"/api/users/{user.id}", json={"name": "Renamed"}, headers=headers)
+    assert response.status_code == 200
+    assert token_user_cache.stats()["size"] == 0
+
+    response = client.get("/api/users/me", headers=headers)
+    assert response.json()["name"] == "Renamed"
+    assert query_count(response) == 1
+
+def test_write_from_another_session_drops_the_cached_user(client, db):
+    user = make_user(db)
+    headers = auth_headers(user)
+    client.get("/api/users/me", headers=headers)
+
+    user.is_admin = True
+    db.commit()
+    response = client.get("/api/users/me", headers=headers)
+    assert response.json()["is_admin"] is True
+
+def test_deleted_user_token_stops_working(client, db):
+    admin_headers = auth_headers(make_user(db, "Admin", is_admin=True))
+    user = make_user(db)
+    headers = auth_headers(user)
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+
+    assert client.delete(f"/api/users/{user.id}", headers=admin_headers).status_code == 200
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+
+def test_rolled_back_change_keeps_the_entry(db):
+    user = make_user(db)
+    token_user_cache.put("token", user)
+    user.name = "Not saved"
+    db.flush()
+    db.rollback()
+    assert token_user_cache.get("token") is not None
+
+def test_entries_expire_with_their_token_and_by_lru():
+    cache = TokenUserCache(ttl_seconds=60, max_size=2)
+    users = [User(id=f"user-{index}", name="Trader", email=f"{index}@example.com", password="x") for index in range(3)]
+
+    cache.put("expired", users[0], token_expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+
+    cache.put("a", users[0])
+    cache.put("b", users[1])
+    cache.get("a")
+    cache.put("c", users[2])
+    assert cache.get("b") is None
+    assert cache.get("a").id == "user-0"
+    assert cache.get("c").id == "user-2"
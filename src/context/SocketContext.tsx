@@ -81,7 +81,7 @@ auth: { token },
         });
 
         // Listen for new notifications
-        socketInstance.on('new_notification', (notification) => {
+        socketInstance.on('notification', (notification) => {
           console.log('New notification received via socket:', notification);
           setLastNotification(notification);
 